@@ -0,0 +1,127 @@
+#!/usr/bin/env python3
+"""
+Benchmark of exception diagnostic info formatting
+
+Diagnostic info is formatted for exceptions raised in frames with large
+local variables (webpages, parsed HTML trees, long lists of subs)
+and in deep stacks. Each scenario is run at several data scales to show
+that formatting time and output size do not grow with the size of
+local variables. The check fails if the size of a stack trace exceeds
+the budget of exception_logger module.
+
+With --baseline the unbounded formatter that was used before
+(full repr of all variables and source context of all frames)
+is measured for comparison. Requires Kodistubs and the addon dependencies
+to be installed.
+"""
+
+import argparse
+import inspect
+import statistics
+import sys
+import time
+from pathlib import Path
+from pprint import pformat
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+
+sys.path.insert(0, str(ADDON_DIR))
+# pylint: disable=wrong-import-position
+from addic7ed import exception_logger, parser  # noqa: E402
+from benchmark_parser import make_worst_case_page  # noqa: E402
+
+SCALES = [1, 10]
+# The diagnostic info header (system info, sys.path) is not a part of the trace budget
+HEADER_ALLOWANCE = 16 * 1024
+
+
+def unbounded_format(exc):
+    """The formatter without limits for comparison"""
+    frames = inspect.getinnerframes(exc.__traceback__, context=5)
+    return ''.join(
+        ''.join(frame_info.code_context or [])
+        + '\n'.join(f'{var} = {pformat(val)}' for var, val in frame_info.frame.f_locals.items())
+        for frame_info in frames
+    )
+
+
+def raise_with_large_locals(scale):
+    # pylint: disable=unused-variable
+    webpage = make_worst_case_page(20 * scale)
+    soup = parser.make_soup(webpage)
+    subs = [parser.SubsItem('English', 'KILLERS', '/updated/1/1/0', False, False)
+            for _ in range(10000 * scale)]
+    pages = {f'/serie/Show/{i}/1/addic7ed': webpage for i in range(10 * scale)}
+    raise RuntimeError('Unable to parse ' + webpage)
+
+
+def recurse(depth, payload):
+    if depth == 0:
+        raise RuntimeError('Maximum depth reached')
+    recurse(depth - 1, payload)
+
+
+def raise_in_deep_stack(scale):
+    recurse(50 * scale, 'x' * 10000 * scale)
+
+
+def trace_in_deep_stack(scale):
+    def inner(depth):
+        if depth == 0:
+            return exception_logger.format_trace()
+        return inner(depth - 1)
+    return inner(50 * scale)
+
+
+def capture(func, scale):
+    try:
+        func(scale)
+    except RuntimeError as exc:
+        return exc
+    raise AssertionError(f'{func.__name__} did not raise')
+
+
+def measure(func, rounds):
+    timings = []
+    output = ''
+    for _ in range(rounds):
+        start = time.perf_counter()
+        output = func()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), len(output)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('-r', '--rounds', type=int, default=5)
+    arg_parser.add_argument('--baseline', action='store_true',
+                            help='also measure the unbounded formatter')
+    args = arg_parser.parse_args()
+    max_size = exception_logger.MAX_TRACE_SIZE + HEADER_ALLOWANCE
+    print(f'{"Benchmark":<48} {"median":>12} {"size":>12}')
+    success = True
+    for scale in SCALES:
+        benchmarks = []
+        for func in (raise_with_large_locals, raise_in_deep_stack):
+            exc = capture(func, scale)
+            benchmarks.append((f'format_exception[{func.__name__}][x{scale}]',
+                               lambda exc=exc: exception_logger.format_exception(exc)))
+            if args.baseline:
+                benchmarks.append((f'unbounded[{func.__name__}][x{scale}]',
+                                   lambda exc=exc: unbounded_format(exc)))
+        benchmarks.append((f'format_trace[deep_stack][x{scale}]',
+                           lambda scale=scale: trace_in_deep_stack(scale)))
+        for name, func in benchmarks:
+            median, size = measure(func, args.rounds)
+            status = ''
+            if not name.startswith('unbounded') and size > max_size:
+                status = ' OVER BUDGET'
+                success = False
+            print(f'{name:<48} {median * 1000:>10.1f}ms {size // 1024:>10}KB{status}')
+    sys.exit(0 if success else 1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,272 @@
+#!/usr/bin/env python3
+"""
+Offline benchmarks for addic7ed.com page parsers
+
+The benchmarks use saved pages from "fixtures" folder, pages from
+an optional HTTP archive recorded by the addon and a synthetic worst-case
+episode page with hundreds of subtitle versions, so neither Kodi
+nor network access is needed. Requires Kodistubs and the addon dependencies
+to be installed.
+
+For each benchmark it reports time per call, items per second
+and peak memory allocated during a single call. Results can be saved
+as JSON and compared with a previous run.
+"""
+
+import argparse
+import json
+import platform
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+sys.path.insert(0, str(ADDON_DIR))
+# pylint: disable=wrong-import-position
+from addic7ed import matching, parser  # noqa: E402
+from check_parser_parity import load_archive_pages  # noqa: E402
+
+LANGUAGES = parser.get_languages([
+    'English', 'French', 'Spanish (Mexico)', 'Portuguese (Brazil)', 'Russian',
+])
+FILENAMES = [
+    'Doctor.Who.2005.S12E01.Spyfall.Part.One.1080p.AMZN.WEB-DL.DDP5.1.H.264-NTb.mkv',
+    'the.expanse.s05e03.720p.web.h264-ggez[eztv].mkv',
+    'Castle.2009.8x22.HDTV.x264-LOL.mp4',
+    'Law and Order SVU 2103 HDTV x264-SVA.avi',
+    'Bodyguard.2018.S01E06.1080p.NF.WEBRip.DDP5.1.x264-NTG.mkv',
+    'some random video.mkv',
+]
+# The number of synthetic filenames in a directory listing
+LISTING_SIZE = 10000
+SYNCED_FILENAME = 'Doctor.Who.2005.S12E01.1080p.WEB.h264-ION10.mkv'
+RELEASE_GROUPS = ['ION10', 'NTb', 'KILLERS', 'LOL', 'DIMENSION', 'AVS', 'SVA', 'GGEZ',
+                  'NTG', 'CAKES', 'MiNX', 'TBS', 'FLEET', 'DEFLATE', 'BAMBOOZLE']
+LANGUAGE_NAMES = ['English', 'French', 'Spanish (Spain)', 'Spanish (Latin America)',
+                  'Portuguese (Brazilian)', 'Russian', 'Italian', 'German', 'Greek', 'Dutch']
+
+
+def make_worst_case_page(versions=200):
+    """
+    Create a synthetic episode page with many subtitle versions
+
+    The page is assembled from the version tables of the saved episode page,
+    with each version having subs in all languages.
+    """
+    template = (FIXTURES_DIR / 'episode.html').read_text(encoding='utf-8')
+    head = template[:template.index('<table width="100%" border="0" align="center"')]
+    head = head[:head.rindex('<div id="container95m">')]
+    tail = template[template.rindex('<div id="footer">'):]
+    language_rows = []
+    for j, language in enumerate(LANGUAGE_NAMES):
+        extra = ('<img src="/images/hi.jpg" title="Hearing Impaired" />'
+                 if j % 3 == 0 else '')
+        language_rows.append(
+            '<tr>\n<td width="1%" rowspan="2" valign="top"><img src="/images/invisible.gif"></td>\n'
+            f'<td width="21%" class="language">{language}<a href="javascript:saveFavorite({{id}},{j},12)">'
+            '<img src="/images/icons/favorite.png" /></a></td>\n'
+            '<td width="19%"><b>Completed</b></td>\n'
+            f'<td colspan="3"><a class="face-button" href="/original/{{id}}/{j}">Download</a>'
+            f'<a class="face-button" href="/updated/{j}/{{id}}/{j}">most updated</a></td>\n'
+            '</tr>\n<tr>\n'
+            f'<td colspan="2" class="newsDate">{extra} 100 Downloads &middot; 700 sequences</td>\n'
+            '<td colspan="3"></td>\n</tr>\n'
+        )
+    language_rows = ''.join(language_rows)
+    tables = []
+    for i in range(versions):
+        sub_id = 200000 + i
+        group = RELEASE_GROUPS[i % len(RELEASE_GROUPS)]
+        tables.append(
+            '<div id="container95m">\n<table class="tabel95">\n<tr><td>\n'
+            '<table width="100%" border="0" align="center" class="tabel95">\n'
+            '<tr>\n<td colspan="3" align="center" class="NewsTitle">'
+            f'<img src="/images/folder_page.png" />Version {group}.{i}, 0.00 MBs&nbsp;</td>\n'
+            '<td colspan="4" align="right" class="NewsTitle"></td>\n</tr>\n'
+            f'<tr>\n<td colspan="3" class="newsDate">Works with {group}.PROPER and WEB-DL</td>\n'
+            '<td colspan="4"></td>\n</tr>\n'
+            + language_rows.replace('{id}', str(sub_id))
+            + '</table>\n</td></tr>\n</table>\n</div>\n'
+        )
+    return head + ''.join(tables) + tail
+
+
+def make_listing(size=LISTING_SIZE):
+    """
+    Create a synthetic directory listing with different filename styles
+    """
+    templates = [
+        'Show.Number.{n}.S{s:02d}E{e:02d}.1080p.WEB.h264-ION10.mkv',
+        'show.number.{n}.s{s:02d}e{e:02d}e{e2:02d}.720p.hdtv.x264-killers[eztv].mkv',
+        'Show Number {n} {s}x{e:02d} HDTV x264-LOL.avi',
+        '[Group] Show Number {n} - {a:03d} [1080p].mkv',
+        'Show.Number.{n}.{s}{e:02d}.HDTV.x264-SVA.avi',
+        'Show Number {n} behind the scenes.mkv',
+    ]
+    return [
+        templates[i % len(templates)].format(
+            n=i // 100, s=i % 10 + 1, e=i % 24 + 1, e2=i % 24 + 2, a=i % 1000)
+        for i in range(size)
+    ]
+
+
+def load_pages(worst_case_versions, archive_path=None):
+    pages = {
+        path.stem: path.read_text(encoding='utf-8')
+        for path in sorted(FIXTURES_DIR.glob('*.html'))
+    }
+    if archive_path is not None:
+        for i, (url, webpage) in enumerate(load_archive_pages(archive_path), 1):
+            pages[f'archive{i}:{url.rsplit("/", 1)[-1]}'] = webpage
+    pages['worst_case'] = make_worst_case_page(worst_case_versions)
+    return pages
+
+
+def measure(func, min_time, min_rounds=3):
+    """
+    Measure a function
+
+    :param func: a callable without arguments that returns the number
+        of produced items
+    :param min_time: min total run time in seconds
+    :param min_rounds: min number of calls
+    :return: a dict with measurement results
+    """
+    tracemalloc.start()
+    items = func()
+    _, peak_memory = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    timings = []
+    total_start = time.perf_counter()
+    while len(timings) < min_rounds or time.perf_counter() - total_start < min_time:
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    median = statistics.median(timings)
+    return {
+        'rounds': len(timings),
+        'items': items,
+        'min_s': min(timings),
+        'median_s': median,
+        'items_per_s': items / median if median else 0.0,
+        'peak_memory_kb': peak_memory / 1024,
+    }
+
+
+def get_benchmarks(pages):
+    """
+    Create benchmark functions
+
+    :return: the list of tuples (benchmark name, function)
+    """
+    benchmarks = []
+    for name, webpage in pages.items():
+        for html_parser in parser.AVAILABLE_HTML_PARSERS:
+            soup = parser.make_soup(webpage, html_parser)
+            table = soup.find('table', parser.SEARCH_TABLE_ATTRS)
+            if table is not None:
+                benchmarks.append((
+                    f'parse_search_results[{name}][{html_parser}]',
+                    lambda table=table: len(list(parser.parse_search_results(table)))
+                ))
+                continue
+            sub_cells = soup.find_all('table', parser.SUBS_TABLE_ATTRS)
+            benchmarks.append((
+                f'parse_episode[{name}][{html_parser}]',
+                lambda sub_cells=sub_cells: len(list(parser.parse_episode(sub_cells, LANGUAGES)))
+            ))
+
+            def parse_page(webpage=webpage, html_parser=html_parser):
+                sub_cells = parser.make_soup(webpage, html_parser).find_all(
+                    'table', parser.SUBS_TABLE_ATTRS)
+                return len(list(parser.parse_episode(sub_cells, LANGUAGES)))
+
+            benchmarks.append((f'make_soup+parse_episode[{name}][{html_parser}]', parse_page))
+
+    def parse_filenames():
+        count = 0
+        for filename in FILENAMES:
+            try:
+                parser.parse_filename(filename)
+            except parser.ParseError:
+                pass
+            count += 1
+        return count
+
+    benchmarks.append(('parse_filename', parse_filenames))
+    listing = make_listing()
+
+    def parse_listing():
+        parser._match_filename.cache_clear()  # pylint: disable=protected-access
+        return len(parser.parse_filenames(listing))
+
+    benchmarks.append((f'parse_filenames[{len(listing)}]', parse_listing))
+    benchmarks.append((f'parse_filenames[{len(listing)}][memoized]',
+                       lambda: len(parser.parse_filenames(listing))))
+    sub_cells = parser.make_soup(pages['worst_case']).find_all('table', parser.SUBS_TABLE_ATTRS)
+    worst_case_subs = list(parser.parse_episode(sub_cells, LANGUAGES))
+    benchmarks.append((
+        'rank_subs[worst_case]',
+        lambda: len(matching.rank_subs(worst_case_subs, SYNCED_FILENAME))
+    ))
+    return benchmarks
+
+
+def compare(results, baseline):
+    print(f'\n{"Benchmark":<60} {"baseline":>12} {"current":>12} {"change":>8}')
+    for name, result in results['benchmarks'].items():
+        base = baseline['benchmarks'].get(name)
+        if base is None:
+            continue
+        change = (result['median_s'] / base['median_s'] - 1.0) * 100
+        print(f'{name:<60} {base["median_s"] * 1000:>10.3f}ms '
+              f'{result["median_s"] * 1000:>10.3f}ms {change:>+7.1f}%')
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('-o', '--output', type=Path, help='save results to a JSON file')
+    arg_parser.add_argument('-c', '--compare', type=Path,
+                            help='compare results with a previously saved JSON file')
+    arg_parser.add_argument('-k', '--filter', default='',
+                            help='run only benchmarks matching this regular expression')
+    arg_parser.add_argument('-t', '--min-time', type=float, default=1.0,
+                            help='min run time of each benchmark in seconds')
+    arg_parser.add_argument('--versions', type=int, default=200,
+                            help='the number of subtitle versions in the worst-case page')
+    arg_parser.add_argument('-a', '--archive', type=Path,
+                            help='also benchmark pages from a recorded HTTP archive or archive folder')
+    args = arg_parser.parse_args()
+    pages = load_pages(args.versions, args.archive)
+    results = {
+        'timestamp': time.time(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'html_parsers': list(parser.AVAILABLE_HTML_PARSERS),
+        'benchmarks': {},
+    }
+    name_filter = re.compile(args.filter)
+    print(f'{"Benchmark":<60} {"median":>12} {"items/s":>12} {"peak mem":>12}')
+    for name, func in get_benchmarks(pages):
+        if not name_filter.search(name):
+            continue
+        result = measure(func, args.min_time)
+        results['benchmarks'][name] = result
+        print(f'{name:<60} {result["median_s"] * 1000:>10.3f}ms '
+              f'{result["items_per_s"]:>12.0f} {result["peak_memory_kb"]:>10.0f}KB')
+    if args.output is not None:
+        with args.output.open('w', encoding='utf-8') as fo:
+            json.dump(results, fo, indent=2)
+    if args.compare is not None:
+        with args.compare.open('r', encoding='utf-8') as fo:
+            compare(results, json.load(fo))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+End-to-end latency benchmark for the addon plugin router
+
+It runs "search", "manualsearch" and "download" actions through
+actions.router against the local addic7ed.com stand-in server
+and reports latency percentiles for each action and for the phases inside
+(HTTP requests, HTML parsing, subtitles listing). Kodi is replaced
+with Kodistubs and a canned currently played episode.
+
+By default all caches are cleared before each iteration ("cold" mode).
+In "warm" mode caches are kept between iterations.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from functools import wraps
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+
+sys.path.insert(0, str(ADDON_DIR))
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+# pylint: disable=wrong-import-position,import-outside-toplevel
+from standin_server import StandinConfig, StandinServer  # noqa: E402
+
+LANGUAGES = 'English,French'
+NOW_PLAYED = {
+    'showtitle': 'Doctor Who (2005)',
+    'season': 12,
+    'episode': 1,
+    'label': 'Doctor.Who.2005.S12E01.1080p.WEB.h264-ION10.mkv',
+}
+ACTIONS = {
+    'search': f'action=search&languages={LANGUAGES}',
+    'manualsearch': f'action=manualsearch&languages={LANGUAGES}&searchstring=who+01x01',
+    'download': ('action=download&link=/updated/1/151234/0'
+                 '&ref=/serie/Doctor_Who_(2005)/12/1/Spyfall_(1)'
+                 '&filename=Doctor.Who.2005.S12E01.1080p.WEB.h264-ION10.mkv'),
+}
+
+
+class Timings:
+    """Collects timings of named phases"""
+    def __init__(self):
+        self.timings = defaultdict(list)
+
+    def wrap(self, phase, func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return func(*args, **kwargs)
+            finally:
+                self.timings[phase].append(time.perf_counter() - start)
+        return wrapper
+
+
+class FakeDialog:
+    """xbmcgui.Dialog replacement that selects the 2nd item and counts error notifications"""
+    def __init__(self):
+        self.errors = 0
+
+    def select(self, heading, items, *args, **kwargs):  # pylint: disable=unused-argument
+        return min(1, len(items) - 1)
+
+    # pylint: disable=unused-argument,keyword-arg-before-vararg
+    def notification(self, heading, message, icon='', *args, **kwargs):
+        if icon == 'error':
+            self.errors += 1
+
+
+def setup_addon(profile_dir, site_url):
+    """
+    Prepare the addon for running outside Kodi
+
+    Kodistubs return empty addon paths, so the addon and its profile
+    are resolved relative to the current working directory.
+    The request rate limit and the daily downloads quota
+    are lifted, so that only the stand-in server limits apply.
+    """
+    language_dir = Path('resources', 'language', 'resource.language.en_gb')
+    (profile_dir / language_dir).mkdir(parents=True)
+    shutil.copy(ADDON_DIR / language_dir / 'strings.po', profile_dir / language_dir)
+    os.chdir(profile_dir)
+    sys.argv = ['plugin://service.subtitles.rvm.addic7ed/', '1', '']
+    import xbmc
+
+    def execute_jsonrpc(request):
+        method = json.loads(request)['method']
+        if method == 'Player.GetItem':
+            return json.dumps({'result': {'item': dict(NOW_PLAYED)}})
+        return json.dumps({'result': {'value': LANGUAGES.split(',')}})
+
+    xbmc.executeJSONRPC = execute_jsonrpc
+    from addic7ed import actions, parser, webclient
+    webclient.SITE = site_url
+    dialog = FakeDialog()
+    actions.get_dialog = lambda: dialog
+    parser.session.scheduler = webclient.RequestScheduler(
+        daily_limit=10 ** 6, rate=10 ** 6, burst=10 ** 6)
+    timings = Timings()
+    webclient.Session._open_url = timings.wrap(  # pylint: disable=protected-access
+        'http', webclient.Session._open_url)  # pylint: disable=protected-access
+    parser.find_tables = timings.wrap('parse', parser.find_tables)
+    actions.display_subs = timings.wrap('display_subs', actions.display_subs)
+    return actions, parser, timings
+
+
+def clear_caches(parser):
+    from addic7ed.cache import SubtitlesStore
+    parser.results_cache.clear()
+    parser.session._response_store.clear()  # pylint: disable=protected-access
+    SubtitlesStore().clear()
+
+
+def percentiles(values):
+    values = sorted(values)
+
+    def percentile(p):
+        return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+    return {
+        'count': len(values),
+        'mean_ms': statistics.mean(values) * 1000,
+        'p50_ms': percentile(50) * 1000,
+        'p90_ms': percentile(90) * 1000,
+        'p99_ms': percentile(99) * 1000,
+        'max_ms': values[-1] * 1000,
+    }
+
+
+def run(args, profile_dir):
+    config = StandinConfig(args.latency, args.jitter, args.error_rate, args.daily_limit)
+    with StandinServer(config) as server:
+        actions, parser, timings = setup_addon(profile_dir, server.url)
+        results = {}
+        for action in args.actions:
+            timings.timings.clear()
+            action_timings = []
+            for _ in range(args.iterations):
+                if args.cache == 'cold':
+                    clear_caches(parser)
+                start = time.perf_counter()
+                actions.router(ACTIONS[action])
+                action_timings.append(time.perf_counter() - start)
+            results[action] = {'total': percentiles(action_timings)}
+            for phase, values in timings.timings.items():
+                results[action][phase] = percentiles(values)
+        results['server'] = {'requests': config.requests, 'downloads': config.downloads}
+        results['errors'] = actions.get_dialog().errors
+    return results
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('-n', '--iterations', type=int, default=50)
+    arg_parser.add_argument('-a', '--actions', nargs='+', choices=list(ACTIONS),
+                            default=list(ACTIONS))
+    arg_parser.add_argument('--cache', choices=['cold', 'warm'], default='cold')
+    arg_parser.add_argument('-l', '--latency', type=float, default=0.05,
+                            help='server response delay in seconds')
+    arg_parser.add_argument('-j', '--jitter', type=float, default=0.0,
+                            help='random extra server delay in seconds')
+    arg_parser.add_argument('-e', '--error-rate', type=float, default=0.0,
+                            help='the probability of server errors')
+    arg_parser.add_argument('-d', '--daily-limit', type=int, default=0,
+                            help='max number of subtitles downloads (0 - unlimited)')
+    arg_parser.add_argument('-o', '--output', type=Path, help='save results to a JSON file')
+    args = arg_parser.parse_args()
+    if args.output is not None:
+        args.output = args.output.resolve()
+    with tempfile.TemporaryDirectory() as profile_dir:
+        results = run(args, Path(profile_dir))
+        os.chdir(BASE_DIR)
+    print(f'{"Action/phase":<28} {"count":>6} {"mean":>10} {"p50":>10} '
+          f'{"p90":>10} {"p99":>10} {"max":>10}')
+    for action in args.actions:
+        for phase, stats in results[action].items():
+            print(f'{action + "/" + phase:<28} {stats["count"]:>6} '
+                  f'{stats["mean_ms"]:>8.1f}ms {stats["p50_ms"]:>8.1f}ms '
+                  f'{stats["p90_ms"]:>8.1f}ms {stats["p99_ms"]:>8.1f}ms '
+                  f'{stats["max_ms"]:>8.1f}ms')
+    print(f'Server requests: {results["server"]["requests"]}, '
+          f'downloads: {results["server"]["downloads"]}, '
+          f'error notifications: {results["errors"]}')
+    if args.output is not None:
+        with args.output.open('w', encoding='utf-8') as fo:
+            json.dump(results, fo, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,107 @@
+#!/usr/bin/env python3
+"""
+Check plugin cold start against the import time budget
+
+Kodi starts a new Python interpreter for every plugin call, so everything
+imported by main.py is paid on each call. The check imports main.py
+in fresh interpreters and fails if:
+
+* heavy modules (HTML parsers, the HTTP client, caches) are imported
+  at startup or by actions that do not need them;
+* the median import time of main.py exceeds the budget.
+
+Requires Kodistubs and the addon dependencies to be installed.
+"""
+
+import argparse
+import json
+import re
+import statistics
+import subprocess
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+
+# Scenario name -> (modules imported after main, modules that must not be imported)
+SCENARIOS = {
+    'startup': (
+        [],
+        ['bs4', 'html5lib', 'lxml', 'sqlite3', 'http.client', 'ssl', 'concurrent.futures',
+         'addic7ed.parser', 'addic7ed.webclient', 'addic7ed.cache', 'addic7ed.episode',
+         'addic7ed.catalog', 'addic7ed.aio', 'asyncio'],
+    ),
+    'download': (
+        ['addic7ed.cache', 'addic7ed.webclient'],
+        ['bs4', 'html5lib', 'lxml', 'addic7ed.parser', 'addic7ed.episode', 'addic7ed.catalog',
+         'addic7ed.aio', 'asyncio'],
+    ),
+}
+IMPORT_TIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \| ( *)(\S+)$')
+
+
+def import_main(extra_modules, cwd):
+    """
+    Import main.py in a new interpreter
+
+    :return: a tuple (the set of imported modules, the dict of cumulative
+        import times in microseconds for top-level imports and their direct imports)
+    """
+    code = (
+        'import json, sys\n'
+        f'sys.path.insert(0, {str(ADDON_DIR)!r})\n'
+        "sys.argv = ['plugin://service.subtitles.rvm.addic7ed/', '-1', '']\n"
+        'import main\n'
+        + ''.join(f'import {module}\n' for module in extra_modules)
+        + 'print(json.dumps(sorted(sys.modules)))\n'
+    )
+    process = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=cwd,
+                             capture_output=True, text=True, check=True)
+    timings = {}
+    for line in process.stderr.splitlines():
+        match = IMPORT_TIME_RE.match(line)
+        if match is not None and len(match.group(3)) <= 2:
+            timings[match.group(4)] = int(match.group(2))
+    return set(json.loads(process.stdout)), timings
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('-b', '--budget', type=float, default=150.0,
+                            help='max median import time of main.py in milliseconds')
+    arg_parser.add_argument('-n', '--runs', type=int, default=7,
+                            help='the number of measured interpreter starts')
+    args = arg_parser.parse_args()
+    failed = False
+    with tempfile.TemporaryDirectory() as cwd:
+        for name, (extra_modules, forbidden) in SCENARIOS.items():
+            modules, _ = import_main(extra_modules, cwd)
+            imported = [module for module in forbidden if module in modules]
+            if imported:
+                failed = True
+                print(f'FAIL [{name}]: unexpected imports: {", ".join(imported)}')
+            else:
+                print(f'OK [{name}]: no unexpected imports')
+        import_times = []
+        slowest = {}
+        for _ in range(args.runs):
+            _, timings = import_main([], cwd)
+            import_times.append(timings['main'] / 1000)
+            slowest = timings
+    median = statistics.median(import_times)
+    if median > args.budget:
+        failed = True
+        print(f'FAIL: main.py import time {median:.1f}ms exceeds {args.budget:.1f}ms budget')
+        print('Slowest imports:')
+        for module, time_us in sorted(slowest.items(), key=lambda i: i[1], reverse=True)[:15]:
+            print(f'  {module:<40} {time_us / 1000:>8.1f}ms')
+    else:
+        print(f'OK: main.py import time {median:.1f}ms is within {args.budget:.1f}ms budget')
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Check that all available HTML parser backends produce identical parsing results
+
+The reference results are produced with html5lib parser from a full document
+tree, the same way as it was done before parser backends were introduced.
+Saved addic7ed.com pages are taken from "fixtures" folder or from
+HTTP archives recorded by the addon with "http_archive" setting.
+Episode filename parsing is checked against the expected results as well.
+Requires Kodistubs and the addon dependencies to be installed.
+"""
+
+import argparse
+import re
+import sys
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+
+sys.path.insert(0, str(ADDON_DIR))
+
+# pylint: disable=wrong-import-position
+from bs4 import BeautifulSoup  # noqa: E402
+
+from addic7ed import parser, recorder  # noqa: E402
+
+LANGUAGES = parser.get_languages([
+    'English', 'French', 'Spanish (Mexico)', 'Portuguese (Brazil)', 'Russian',
+])
+# The list of shows is parsed without HTML parsers
+SKIPPED_FIXTURES = {'shows.html'}
+# Season listings are loaded by AJAX as a table inside this element
+SEASON_LISTING_MARKER = '<div id="season">'
+# Recorded pages that have subtitles
+PARSED_PAGE_RE = re.compile(r'/(serie/|search\.php|ajax_loadShow\.php)')
+# Filename: (parse_filename result, parse_filenames result)
+FILENAME_CASES = {
+    'Show.Name.S01E02.mkv': (
+        ('Show Name', '01', '02'), ('Show Name', '01', ('02',))),
+    'Law and Order SVU 2103 HDTV x264-SVA.avi': (
+        ('Law and Order SVU', '21', '03'), ('Law and Order SVU', '21', ('03',))),
+    'Show Name - 101 - Title.mkv': (
+        ('Show Name -', '01', '01'), ('Show Name', None, ('101',))),
+    'Show.Name.-.102.mkv': (
+        ('Show Name -', '01', '02'), ('Show Name', None, ('102',))),
+    '[Grp] Show Name - 123 [1080p].mkv': (
+        ('[Grp] Show Name -', '01', '23'), ('Show Name', None, ('123',))),
+    'Show.Name.S01E01-E03.mkv': (
+        ('Show Name', '01', '01'), ('Show Name', '01', ('01', '02', '03'))),
+    'Show.Name.1x01-1x02.mkv': (
+        ('Show Name', '01', '01'), ('Show Name', '01', ('01', '02'))),
+    'Show.Name.S01E01-2019.mkv': (
+        ('Show Name', '01', '01'), ('Show Name', '01', ('01',))),
+    'Show.Name.S01E10-E08.mkv': (
+        ('Show Name', '01', '10'), ('Show Name', '01', ('10',))),
+}
+
+
+def parse_page(webpage, html_parser=None):
+    """
+    Parse a webpage with the given HTML parser backend
+
+    If the backend is not provided, the full document tree is built with html5lib.
+    """
+    if SEASON_LISTING_MARKER in webpage:
+        if html_parser is None:
+            soup = BeautifulSoup(webpage, 'html5lib')
+        else:
+            soup = parser.make_soup(webpage, html_parser, strainer=parser.SEASON_ROWS_STRAINER)
+        return list(parser.parse_season(soup.find_all('tr'), LANGUAGES))
+    if html_parser is None:
+        soup = BeautifulSoup(webpage, 'html5lib')
+    else:
+        soup = parser.make_soup(webpage, html_parser)
+    table = soup.find('table', parser.SEARCH_TABLE_ATTRS)
+    if table is not None:
+        return list(parser.parse_search_results(table))
+    sub_cells = soup.find_all('table', parser.SUBS_TABLE_ATTRS)
+    return list(parser.parse_episode(sub_cells, LANGUAGES))
+
+
+def load_archive_pages(archive_path):
+    """
+    Load recorded pages with subtitles
+
+    :return: the list of tuples (page name, page)
+    """
+    return [
+        (exchange.url, exchange.content.decode('utf-8', errors='replace'))
+        for exchange in recorder.read_archive(archive_path)
+        if exchange.status_code == 200 and PARSED_PAGE_RE.search(exchange.url)
+    ]
+
+
+def check_page(name, webpage, html_parsers):
+    """
+    Compare parsing results of a page against the reference parser
+
+    :return: ``True`` if all parsers produce identical results
+    """
+    reference = parse_page(webpage)
+    if not reference:
+        print(f'{name}: the reference parser returned no items')
+        return False
+    success = True
+    for html_parser in html_parsers:
+        results = parse_page(webpage, html_parser)
+        if results == reference:
+            print(f'{name}: {html_parser} OK ({len(results)} items)')
+        else:
+            success = False
+            print(f'{name}: {html_parser} MISMATCH')
+            for expected, actual in zip(reference, results):
+                if expected != actual:
+                    print(f'  expected: {expected}\n  actual:   {actual}')
+            if len(results) != len(reference):
+                print(f'  expected {len(reference)} items, got {len(results)}')
+    return success
+
+
+def check_filenames():
+    """
+    Compare episode filename parsing results against the expected ones
+
+    :return: ``True`` if all filenames are parsed as expected
+    """
+    success = True
+    for filename, (expected, expected_info) in FILENAME_CASES.items():
+        try:
+            result = parser.parse_filename(filename)
+        except parser.ParseError:
+            result = None
+        info = tuple(parser.parse_filenames([filename])[0] or ()) or None
+        if result == expected and info == expected_info:
+            print(f'{filename}: OK')
+        else:
+            success = False
+            print(f'{filename}: MISMATCH\n  expected: {expected}, {expected_info}\n'
+                  f'  actual:   {result}, {info}')
+    return success
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__)
+    arg_parser.add_argument('pages', nargs='*', type=Path,
+                            help='saved pages to check (default: all fixtures)')
+    arg_parser.add_argument('-a', '--archive', type=Path,
+                            help='check pages from a recorded HTTP archive or archive folder instead')
+    args = arg_parser.parse_args()
+    if args.archive is not None:
+        pages = load_archive_pages(args.archive)
+    else:
+        page_paths = args.pages or sorted(page for page in FIXTURES_DIR.glob('*.html')
+                                          if page.name not in SKIPPED_FIXTURES)
+        pages = [(path.name, path.read_text(encoding='utf-8')) for path in page_paths]
+    html_parsers = parser.AVAILABLE_HTML_PARSERS
+    print(f'Checking parsers: {", ".join(html_parsers)}')
+    results = [check_page(name, webpage, html_parsers) for name, webpage in pages]
+    results.append(check_filenames())
+    sys.exit(0 if all(results) else 1)
+
+
+if __name__ == '__main__':
+    main()
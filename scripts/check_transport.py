@@ -0,0 +1,203 @@
+#!/usr/bin/env python3
+"""
+Check the HTTP transport against a local HTTP server
+
+The checks cover following redirects, retrying requests over stale
+keep-alive connections, decompressing streamed responses
+and resuming TLS sessions.
+Requires Kodistubs and the addon dependencies to be installed.
+"""
+
+import gzip
+import os
+import socket
+import ssl
+import sys
+import threading
+import time
+import unittest
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+ADDON_DIR = BASE_DIR / 'service.subtitles.rvm.addic7ed'
+
+sys.path.insert(0, str(ADDON_DIR))
+
+# pylint: disable=wrong-import-position
+from addic7ed import transport  # noqa: E402
+
+BODY = os.urandom(64 * 1024).hex().encode('ascii')
+
+
+def _raw_deflate(data):
+    compressor = zlib.compressobj(wbits=-zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+class CheckHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def setup(self):
+        super().setup()
+        with self.server.lock:
+            self.server.connections += 1
+
+    def _send(self, status, body=b'', headers=None):
+        self.send_response(status)
+        self.send_header('Content-Length', str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        self.server.requests.append(('GET', self.path))
+        if self.path == '/redirect':
+            self._send(302, headers={'Location': '/target'})
+        elif self.path == '/redirect-loop':
+            self._send(302, headers={'Location': '/redirect-loop'})
+        elif self.path == '/target':
+            self._send(200, b'target')
+        elif self.path == '/stale':
+            # Close a keep-alive connection without telling the client
+            self._send(200, b'stale')
+            self.close_connection = True
+        elif self.path == '/gzip':
+            self._send(200, gzip.compress(BODY), {'Content-Encoding': 'gzip'})
+        elif self.path == '/deflate':
+            self._send(200, zlib.compress(BODY), {'Content-Encoding': 'deflate'})
+        elif self.path == '/raw-deflate':
+            self._send(200, _raw_deflate(BODY), {'Content-Encoding': 'deflate'})
+        elif self.path == '/broken-gzip':
+            self._send(200, gzip.compress(BODY)[:100] + b'garbage' * 100,
+                       {'Content-Encoding': 'gzip'})
+        else:
+            self._send(404, b'Not Found')
+
+    def do_POST(self):  # pylint: disable=invalid-name
+        self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        self.server.requests.append(('POST', self.path))
+        self._send(303, headers={'Location': '/target'})
+
+
+class CheckServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self):
+        super().__init__(('127.0.0.1', 0), CheckHandler)
+        self.lock = threading.Lock()
+        self.connections = 0
+        self.requests = []
+
+    @property
+    def url(self):
+        host, port = self.server_address[:2]
+        return f'http://{host}:{port}'
+
+
+class FakeSSLContext:
+    """Records TLS handshakes and returns plain sockets"""
+    check_hostname = False
+    verify_mode = ssl.CERT_NONE
+
+    def __init__(self):
+        self.handshakes = []
+
+    def wrap_socket(self, sock, server_hostname=None, session=None):
+        self.handshakes.append((server_hostname, session))
+        return sock
+
+
+class TransportTestCase(unittest.TestCase):
+    def setUp(self):
+        self.server = CheckServer()
+        threading.Thread(target=self.server.serve_forever, args=(0.05,), daemon=True).start()
+        self.pool = transport.ConnectionPool(timeout=5.0)
+
+    def tearDown(self):
+        self.pool.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_redirect(self):
+        response = self.pool.request('GET', self.server.url + '/redirect')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.content, b'target')
+        self.assertEqual(response.url, self.server.url + '/target')
+        # Both requests are sent over the same keep-alive connection
+        self.assertEqual(self.server.connections, 1)
+
+    def test_redirect_303_changes_method(self):
+        response = self.pool.request('POST', self.server.url + '/form')
+        self.assertEqual(response.content, b'target')
+        self.assertEqual(self.server.requests, [('POST', '/form'), ('GET', '/target')])
+
+    def test_too_many_redirects(self):
+        pool = transport.ConnectionPool(timeout=5.0, max_redirects=3)
+        with self.assertRaises(transport.RequestError):
+            pool.request('GET', self.server.url + '/redirect-loop')
+        pool.close()
+        self.assertEqual(len(self.server.requests), 4)
+
+    def test_stale_connection_retry(self):
+        self.assertEqual(self.pool.request('GET', self.server.url + '/stale').content, b'stale')
+        # Let the server close the connection that is kept in the pool
+        time.sleep(0.2)
+        response = self.pool.request('GET', self.server.url + '/target')
+        self.assertEqual(response.content, b'target')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_new_connection_error_is_not_retried(self):
+        with socket.socket() as sock:
+            sock.bind(('127.0.0.1', 0))
+            port = sock.getsockname()[1]
+        with self.assertRaises(transport.RequestError):
+            self.pool.request('GET', f'http://127.0.0.1:{port}/target')
+
+    def test_streamed_decompression(self):
+        for path in ('/gzip', '/deflate', '/raw-deflate'):
+            with self.subTest(path=path):
+                with self.pool.request('GET', self.server.url + path, stream=True) as response:
+                    self.assertIsNone(response.content)
+                    content = b''.join(response.iter_content(1024))
+                self.assertEqual(content, BODY)
+        # The connection is returned to the pool after each body is read to the end
+        self.assertEqual(self.server.connections, 1)
+
+    def test_decompression(self):
+        for path in ('/gzip', '/deflate', '/raw-deflate'):
+            with self.subTest(path=path):
+                self.assertEqual(self.pool.request('GET', self.server.url + path).content, BODY)
+
+    def test_streamed_decompression_error(self):
+        with self.pool.request('GET', self.server.url + '/broken-gzip', stream=True) as response:
+            with self.assertRaises(transport.RequestError):
+                b''.join(response.iter_content(1024))
+
+    def test_unread_stream_is_not_reused(self):
+        with self.pool.request('GET', self.server.url + '/gzip', stream=True):
+            pass
+        self.assertEqual(self.pool.request('GET', self.server.url + '/target').content,
+                         b'target')
+        self.assertEqual(self.server.connections, 2)
+
+    def test_tls_context(self):
+        context = FakeSSLContext()
+        tls_sessions = {'127.0.0.1': 'session'}
+        host, port = self.server.server_address[:2]
+        # pylint: disable=protected-access
+        connection = transport._HTTPSConnection(host, port, context=context,
+                                                tls_sessions=tls_sessions, timeout=5.0)
+        connection.request('GET', '/target')
+        self.assertEqual(connection.getresponse().read(), b'target')
+        connection.close()
+        self.assertEqual(context.handshakes, [('127.0.0.1', 'session')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,74 @@
+#!/usr/bin/env python3
+"""
+Latency report from addon metrics files
+
+The addon appends a summary of each invocation (plugin calls and pre-searches)
+to metrics.jsonl in its profile folder. The report prints latency percentiles
+of each action and of the phases inside it (JSON-RPC calls, HTTP requests,
+HTML parsing, subtitles listing), and the totals of counters.
+Metrics files from multiple devices can be passed at once.
+Rotated files (metrics.jsonl.1) are read if they exist.
+"""
+
+import argparse
+import json
+import sys
+from collections import defaultdict
+from pathlib import Path
+
+
+def read_summaries(paths):
+    for path in paths:
+        for file_path in (path.with_name(path.name + '.1'), path):
+            if not file_path.exists():
+                continue
+            with file_path.open(encoding='utf-8') as fo:
+                for line in fo:
+                    try:
+                        yield json.loads(line)
+                    except ValueError:
+                        # A line may be truncated if Kodi is killed while writing
+                        continue
+
+
+def percentile(values, p):
+    return values[min(len(values) - 1, int(round(p / 100 * (len(values) - 1))))]
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('paths', nargs='+', type=Path, help='metrics.jsonl files')
+    arg_parser.add_argument('-a', '--action', help='report only this action')
+    arg_parser.add_argument('-v', '--version', help='report only this addon version')
+    args = arg_parser.parse_args()
+    timings = defaultdict(lambda: defaultdict(list))
+    counters = defaultdict(lambda: defaultdict(int))
+    for summary in read_summaries(args.paths):
+        action = summary['action']
+        if args.action is not None and action != args.action:
+            continue
+        if args.version is not None and summary['version'] != args.version:
+            continue
+        timings[action]['total'].append(summary['total_ms'])
+        for phase, stats in summary['phases'].items():
+            timings[action][phase].append(stats['total_ms'])
+        for counter, value in summary['counters'].items():
+            counters[action][counter] += value
+    if not timings:
+        sys.exit('No metrics found')
+    print(f'{"Action/phase":<28} {"count":>6} {"p50":>10} {"p90":>10} {"p99":>10} {"max":>10}')
+    for action, phases in sorted(timings.items()):
+        for phase, values in phases.items():
+            values.sort()
+            print(f'{action + "/" + phase:<28} {len(values):>6} '
+                  f'{percentile(values, 50):>8.1f}ms {percentile(values, 90):>8.1f}ms '
+                  f'{percentile(values, 99):>8.1f}ms {values[-1]:>8.1f}ms')
+    print()
+    for action, action_counters in sorted(counters.items()):
+        for counter, value in sorted(action_counters.items()):
+            print(f'{action + "/" + counter:<40} {value:>12}')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for addic7ed.com that serves saved pages and subtitles
+
+It mimics the parts of the site that the addon uses:
+
+* /search.php redirects to an episode page if a query matches a single episode,
+  otherwise it returns search results or an empty results page.
+* /serie/... returns the saved episode page.
+* /ajax_loadShow.php returns the saved season listing.
+* /shows.php returns the saved list of shows.
+* /original/... and /updated/... return subtitles or a HTML page
+  when the daily downloads limit is exceeded.
+
+Responses can be delayed and random server errors can be injected.
+Pages are served with ETag validators, keep-alive and gzip compression.
+"""
+
+import argparse
+import gzip
+import hashlib
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from urllib.parse import parse_qs, urlsplit
+
+FIXTURES_DIR = Path(__file__).resolve().parent / 'fixtures'
+EPISODE_LINK = '/serie/Doctor_Who_(2005)/12/1/Spyfall_(1)'
+# Queries that return multiple search results
+MULTIPLE_RESULTS_RE = '01x01'
+# Queries that return no results
+NO_RESULTS_RE = 'nonexistent'
+NO_RESULTS_PAGE = """<!DOCTYPE html>
+<html><head><title>Search results - Addic7ed.com</title></head>
+<body><center><span class="titulo">Search results for: {query}</span>
+<p>Sorry, your search did not return any results.</p></center></body></html>
+"""
+DAILY_LIMIT_PAGE = """<!DOCTYPE html>
+<html><head><title>Daily Download count exceeded</title></head>
+<body><center><b>Daily Download count exceeded.</b><br>
+You can download up to {limit} subtitles per 24 hours.</center></body></html>
+"""
+
+
+def make_subtitles(cues=700):
+    lines = []
+    for i in range(1, cues + 1):
+        start = i * 3
+        lines.append(
+            f'{i}\r\n'
+            f'00:{start // 60 % 60:02d}:{start % 60:02d},000 --> '
+            f'00:{(start + 2) // 60 % 60:02d}:{(start + 2) % 60:02d},500\r\n'
+            f'This is the subtitle line number {i}.\r\n\r\n'
+        )
+    return ''.join(lines).encode('utf-8')
+
+
+class StandinConfig:
+    """
+    Stand-in server behavior
+
+    :param latency: response delay in seconds
+    :param jitter: random extra delay in seconds
+    :param error_rate: the probability of "500 Internal Server Error" response
+    :param daily_limit: max number of subtitles downloads, 0 means unlimited
+    """
+    def __init__(self, latency=0.0, jitter=0.0, error_rate=0.0, daily_limit=0):
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.daily_limit = daily_limit
+        self.downloads = 0
+        self.requests = 0
+        self.lock = threading.Lock()
+        self.episode_page = (FIXTURES_DIR / 'episode.html').read_bytes()
+        self.search_results_page = (FIXTURES_DIR / 'search_results.html').read_bytes()
+        self.season_page = (FIXTURES_DIR / 'season.html').read_bytes()
+        self.shows_page = (FIXTURES_DIR / 'shows.html').read_bytes()
+        self.subtitles = make_subtitles()
+
+
+class StandinHandler(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+    config = None  # type: StandinConfig
+
+    def log_message(self, format, *args):  # pylint: disable=redefined-builtin
+        pass
+
+    def _send(self, status, body=b'', content_type='text/html; charset=utf-8',
+              headers=None):
+        etag = None
+        if status == 200 and content_type.startswith('text/html'):
+            etag = '"' + hashlib.md5(body).hexdigest() + '"'
+            if self.headers.get('If-None-Match') == etag:
+                status, body = 304, b''
+        compressed = (body and 'gzip' in self.headers.get('Accept-Encoding', ''))
+        if compressed:
+            body = gzip.compress(body, compresslevel=5)
+        self.send_response(status)
+        self.send_header('Content-Type', content_type)
+        self.send_header('Content-Length', str(len(body)))
+        if etag is not None:
+            self.send_header('ETag', etag)
+        if compressed:
+            self.send_header('Content-Encoding', 'gzip')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):  # pylint: disable=invalid-name
+        config = self.config
+        with config.lock:
+            config.requests += 1
+        delay = config.latency + random.uniform(0, config.jitter)
+        if delay:
+            time.sleep(delay)
+        if random.random() < config.error_rate:
+            self._send(500, b'Internal Server Error', 'text/plain')
+            return
+        url = urlsplit(self.path)
+        if url.path == '/search.php':
+            query = parse_qs(url.query).get('search', [''])[0].lower()
+            if NO_RESULTS_RE in query:
+                self._send(200, NO_RESULTS_PAGE.format(query=query).encode('utf-8'))
+            elif MULTIPLE_RESULTS_RE in query:
+                self._send(200, config.search_results_page)
+            else:
+                self._send(302, headers={'Location': EPISODE_LINK})
+        elif url.path.startswith('/serie/'):
+            self._send(200, config.episode_page)
+        elif url.path == '/ajax_loadShow.php':
+            self._send(200, config.season_page)
+        elif url.path == '/shows.php':
+            self._send(200, config.shows_page)
+        elif url.path.startswith(('/original/', '/updated/')):
+            with config.lock:
+                config.downloads += 1
+                limit_exceeded = 0 < config.daily_limit < config.downloads
+            if limit_exceeded:
+                page = DAILY_LIMIT_PAGE.format(limit=config.daily_limit)
+                self._send(200, page.encode('utf-8'))
+            else:
+                self._send(200, config.subtitles, 'text/srt',
+                           {'Content-Disposition': 'attachment; filename="subtitles.srt"'})
+        else:
+            self._send(404, b'Not Found', 'text/plain')
+
+
+class StandinServer:
+    """
+    Stand-in server running in a background thread
+
+    :param config: :class:`StandinConfig` instance
+    :param port: TCP port, 0 means an arbitrary free port
+    """
+    def __init__(self, config=None, host='127.0.0.1', port=0):
+        self.config = config or StandinConfig()
+        handler = type('Handler', (StandinHandler,), {'config': self.config})
+        self._server = ThreadingHTTPServer((host, port), handler)
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self):
+        host, port = self._server.server_address[:2]
+        return f'http://{host}:{port}'
+
+    def start(self):
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *args):
+        self.stop()
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(
+        description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('-p', '--port', type=int, default=8000)
+    arg_parser.add_argument('-l', '--latency', type=float, default=0.0,
+                            help='response delay in seconds')
+    arg_parser.add_argument('-j', '--jitter', type=float, default=0.0,
+                            help='random extra delay in seconds')
+    arg_parser.add_argument('-e', '--error-rate', type=float, default=0.0,
+                            help='the probability of server errors')
+    arg_parser.add_argument('-d', '--daily-limit', type=int, default=0,
+                            help='max number of subtitles downloads (0 - unlimited)')
+    args = arg_parser.parse_args()
+    config = StandinConfig(args.latency, args.jitter, args.error_rate, args.daily_limit)
+    server = StandinServer(config, port=args.port).start()
+    print(f'Serving addic7ed.com stand-in at {server.url}. Press Ctrl+C to stop.')
+    try:
+        while True:
+            time.sleep(1.0)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == '__main__':
+    main()
@@ -13,76 +13,110 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+# Every plugin call starts a new Python interpreter, so modules that are needed
+# only for some actions (HTML parsers, the HTTP client, caches) are imported
+# inside functions to keep plugin startup fast.
+# See scripts/check_import_time.py
+# pylint: disable=import-outside-toplevel
+
 import logging
 import os
-import re
-import shutil
 import sys
 from collections import namedtuple
+from functools import lru_cache, partial
 from urllib import parse as urlparse
 
 import xbmc
 import xbmcgui
 import xbmcplugin
 
-from addic7ed import parser
+from addic7ed import metrics
 from addic7ed.addon import ADDON, PROFILE, ICON, GettextEmulator
 from addic7ed.exceptions import NoSubtitlesReturned, ParseError, SubsSearchError, \
     Add7ConnectionError
-from addic7ed.parser import parse_filename, normalize_showname, get_languages
-from addic7ed.utils import get_now_played
-from addic7ed.webclient import Session
+from addic7ed.matching import rank_subs
 
-__all__ = ['router']
+__all__ = ['DirectoryItem', 'PluginDirectory', 'router']
 
 _ = GettextEmulator.gettext
 
 logger = logging.getLogger(__name__)
 
 TEMP_DIR = PROFILE / 'temp'
-HANDLE = int(sys.argv[1])
 
+# Max time in seconds to wait for episode pages before showing the selection dialog.
+# The wait is short, so that the dialog is not delayed on slow connections.
+PREFETCH_TIMEOUT = 1.0
+# "listing_max_age" setting values -> max age of a stored listing in seconds.
+# Stored listings are not displayed if the age is 0.
+LISTING_MAX_AGES = {
+    '0': 0,
+    '1': 24 * 60 * 60,
+    '2': 7 * 24 * 60 * 60,
+    '3': 30 * 24 * 60 * 60,
+}
+
+
+DirectoryItem = namedtuple('DirectoryItem', ['url', 'label', 'label2', 'thumb', 'properties'])
 
-VIDEOFILE_EXTENSIONS = {'.avi', '.mkv', '.mp4', '.ts', '.m2ts', '.mov'}
-DIALOG = xbmcgui.Dialog()
-RELEASE_RE = re.compile(r'-(.*?)(?:\[.*?\])?\.')
 
-EpisodeData = namedtuple('EpisodeData',
-                         ['showname', 'season', 'episode', 'filename'])
+@lru_cache(maxsize=None)
+def get_dialog():
+    """Get xbmcgui.Dialog instance that is created on first use"""
+    return xbmcgui.Dialog()
 
 
-def _detect_synced_subs(subs_list, filename):
+class PluginDirectory:
     """
-    Try to detect if subs from Addic7ed.com match the file being played
+    Kodi directory for the items of a plugin call
 
-    :param subs_list: list or generator of subtitle items
-    :param filename: the name of an episode videofile being played
-    :return: the generator of subtitles  "sync" property
+    :param base_url: the plugin base URL (sys.argv[0])
+    :param handle: the plugin call handle (sys.argv[1])
     """
-    listing = []
-    for item in subs_list:
-        release_match = RELEASE_RE.search(filename)
-        if release_match is not None:
-            release = release_match.group(1).lower()
-        else:
-            release = ''
-        lowercase_version = item.version.lower()
-        resync_pattern = rf'sync.+?{release}'
-        synced = (release and
-                  release in lowercase_version and
-                  re.search(resync_pattern, lowercase_version, re.I) is None)
-        listing.append((item, synced))
-    return listing
+    def __init__(self, base_url, handle):
+        self.base_url = base_url
+        self.handle = handle
+
+    @classmethod
+    def from_argv(cls, argv):
+        """
+        Create a directory for a plugin call
+
+        :param argv: plugin call arguments (sys.argv)
+        """
+        return cls(argv[0], int(argv[1]))
+
+    def add_item(self, item):
+        """
+        Add an item to the directory
+
+        :param item: :class:`DirectoryItem` instance
+        """
+        list_item = xbmcgui.ListItem(label=item.label, label2=item.label2)
+        if item.thumb:
+            list_item.setArt({'thumb': item.thumb})
+        for name, value in item.properties.items():
+            list_item.setProperty(name, value)
+        xbmcplugin.addDirectoryItem(handle=self.handle, url=item.url, listitem=list_item,
+                                    isFolder=False)
 
+    def end(self):
+        """End the directory so that Kodi displays its items"""
+        # The handle is -1 if the addon is called via RunScript, e.g. from settings
+        if self.handle >= 0:
+            xbmcplugin.endOfDirectory(self.handle)
 
-def display_subs(subs_list, episode_url, filename):
+
+@metrics.timed('display_subs')
+def display_subs(subs_list, episode_url, filename, directory):
     """
     Display the list of found subtitles
 
-    :param subs_list: the list or generator of tuples (subs item, synced)
+    :param subs_list: the list or generator of subs items
     :param episode_url: the URL for the episode page on addic7ed.com.
         It is needed for downloading subs as 'Referer' HTTP header.
     :param filename: the name of the video-file being played.
+    :param directory: :class:`PluginDirectory` of the plugin call
 
     Each item in the displayed list is a ListItem instance with the following
     properties:
@@ -94,25 +128,19 @@ def display_subs(subs_list, episode_url, filename):
     - 'hearing_imp': if 'true' then 'CC' icon is displayed for the list item.
     - 'sync': if 'true' then 'SYNC' icon is displayed for the list item.
     - url: a plugin call URL for downloading selected subs.
+
+    Subs are listed from the best to the worst match for the video-file release.
     """
-    subs_list = sorted(
-        _detect_synced_subs(subs_list, filename),
-        key=lambda i: i[1],
-        reverse=True
-    )
-    for item, synced in subs_list:
+    for item, match in rank_subs(subs_list, filename):
         if item.unfinished:
             continue
-        list_item = xbmcgui.ListItem(label=item.language, label2=item.version)
-        list_item.setArt(
-            {'thumb': xbmc.convertLanguage(item.language, xbmc.ISO_639_1)}
-        )
+        properties = {}
         if item.hi:
-            list_item.setProperty('hearing_imp', 'true')
-        if synced:
-            list_item.setProperty('sync', 'true')
+            properties['hearing_imp'] = 'true'
+        if match.synced:
+            properties['sync'] = 'true'
         url = '{}?{}'.format(  # pylint: disable=consider-using-f-string
-            sys.argv[0],
+            directory.base_url,
             urlparse.urlencode(
                 {'action': 'download',
                  'link': item.link,
@@ -120,11 +148,17 @@ def display_subs(subs_list, episode_url, filename):
                  'filename': filename}
             )
         )
-        xbmcplugin.addDirectoryItem(handle=HANDLE, url=url, listitem=list_item,
-                                    isFolder=False)
+        directory.add_item(DirectoryItem(
+            url=url,
+            label=item.language,
+            label2=item.version,
+            thumb=xbmc.convertLanguage(item.language, xbmc.ISO_639_1),
+            properties=properties
+        ))
+        metrics.increment('subs_listed')
 
 
-def download_subs(link, referrer, filename):
+def download_subs(link, referrer, filename, directory):
     """
     Download selected subs
 
@@ -132,28 +166,36 @@ def download_subs(link, referrer, filename):
     :param referrer: str - a referer URL for the episode page
         (required by addic7ed.com).
     :param filename: str - the name of the video-file being played.
+    :param directory: :class:`PluginDirectory` of the plugin call
 
     The function must add a single ListItem instance with one property:
         label - the download location for subs.
     """
-    # Re-create a download location in a temporary folder
-    if not PROFILE.exists():
-        PROFILE.mkdir()
-    if TEMP_DIR.exists():
-        shutil.rmtree(str(TEMP_DIR))
-    TEMP_DIR.mkdir()
-    # Combine a path where to download the subs
+    # Combine a path where to download the subs in a temporary folder
+    TEMP_DIR.mkdir(parents=True, exist_ok=True)
     filename = os.path.splitext(filename)[0] + '.srt'
     subspath = str(TEMP_DIR / filename)
-    # Download the subs from addic7ed.com
+    # Kodi has already copied subs from previous downloads to their location
+    for entry in os.scandir(TEMP_DIR):
+        if entry.is_file() and entry.path != subspath:
+            os.remove(entry.path)
+    # Download the subs from addic7ed.com unless they have been downloaded before
+    from addic7ed.cache import SubtitlesStore
+    from addic7ed.webclient import Session
+    subs_store = SubtitlesStore()
     try:
-        Session().download_subs(link, referrer, subspath)
+        if subs_store.get(link, subspath):
+            metrics.increment('subtitles_store_hits')
+        else:
+            Session().download_subs(link, referrer, subspath, normalize_encoding=True)
+            subs_store.put(link, subspath)
     except Add7ConnectionError:
         logger.error('Unable to connect to addic7ed.com')
-        DIALOG.notification(_('Error!'), _('Unable to connect to addic7ed.com.'), 'error')
+        get_dialog().notification(_('Error!'), _('Unable to connect to addic7ed.com.'),
+                                  'error')
     except NoSubtitlesReturned:
-        DIALOG.notification(_('Error!'), _('Exceeded daily limit for subs downloads.'), 'error',
-                            3000)
+        get_dialog().notification(_('Error!'), _('Exceeded daily limit for subs downloads.'),
+                                  'error', 3000)
         logger.error('A HTML page returned instead of subtitles for link: %s', link)
     else:
         # Create a ListItem for downloaded subs and pass it
@@ -162,64 +204,137 @@ def download_subs(link, referrer, filename):
         # location selected by 'Subtitle storage location' option
         # in 'Settings > Video > Subtitles' section.
         # A 2-letter language code will be added to subs filename.
-        list_item = xbmcgui.ListItem(label=subspath)
-        xbmcplugin.addDirectoryItem(handle=HANDLE,
-                                    url=subspath,
-                                    listitem=list_item,
-                                    isFolder=False)
-        DIALOG.notification(_('Success!'), _('Subtitles downloaded.'), ICON, 3000, False)
+        directory.add_item(DirectoryItem(url=subspath, label=subspath, label2='', thumb='',
+                                         properties={}))
+        get_dialog().notification(_('Success!'), _('Subtitles downloaded.'), ICON, 3000, False)
         logger.info('Subs downloaded.')
 
 
-def extract_episode_data():
+def get_listing_max_age():
     """
-    Extract episode data for searching
+    Get the max age of a stored subs listing from the addon settings
 
-    :return: named tuple (showname, season, episode, filename)
-    :raises ParseError: if cannot determine episode data
+    :return: the max age in seconds or 0 if stored listings are disabled
     """
-    now_played = get_now_played()
-    logger.debug('Played file info: %s', now_played)
-    showname = now_played['showtitle'] or xbmc.getInfoLabel('VideoPlayer.TVshowtitle')
-    parsed = urlparse.urlparse(now_played['file'])
-    filename = os.path.basename(parsed.path)
-    if ADDON.getSetting('use_filename') == 'true' or not showname:
-        # Try to get showname/season/episode data from
-        # the filename if 'use_filename' setting is true
-        # or if the video-file does not have library metadata.
-        try:
-            logger.debug('Using filename: %s', filename)
-            showname, season, episode = parse_filename(filename)
-        except ParseError:
-            logger.debug('Filename %s failed. Trying ListItem.Label...', filename)
-            try:
-                filename = now_played['label']
-                logger.debug('Using filename: %s', filename)
-                showname, season, episode = parse_filename(filename)
-            except ParseError:
-                logger.error('Unable to determine episode data for %s', filename)
-                DIALOG.notification(_('Error!'), _('Unable to determine episode data.'),
-                                    'error', 3000)
-                raise
-    else:
-        # Get get showname/season/episode data from
-        # Kodi if the video-file is being played from
-        # the TV-Shows library.
-        season = str(now_played['season'] if now_played['season'] > -1
-                     else xbmc.getInfoLabel('VideoPlayer.Season'))
-        season = season.zfill(2)
-        episode = str(now_played['episode'] if now_played['episode'] > -1
-                      else xbmc.getInfoLabel('VideoPlayer.Episode'))
-        episode = episode.zfill(2)
-        if not os.path.splitext(filename)[1].lower() in VIDEOFILE_EXTENSIONS:
-            filename = f'{showname}.{season}x{episode}.foo'
-        logger.debug('Using library metadata: %s - %sx%s', showname, season, episode)
-    return EpisodeData(showname, season, episode, filename)
-
-
-def search_subs(params):
+    return LISTING_MAX_AGES.get(ADDON.getSetting('listing_max_age'), 0)
+
+
+def _get_episode_label(episode_item, future):
+    """
+    Create a label for an episode in the selection list
+
+    If the episode page has been already fetched, the label includes
+    the number of subs found in the requested languages.
+    """
+    if future is None or not future.done() or future.exception() is not None:
+        return episode_item.title
+    subs_count = sum(1 for item in future.result().subtitles if not item.unfinished)
+    return f'{episode_item.title} [{subs_count}]'
+
+
+def select_episode(episodes, languages):
+    """
+    Select an episode from multiple search results
+
+    Episode pages are fetched concurrently while the selection dialog
+    is displayed, so that the selected episode is usually available immediately.
+    Labels of episodes that have been fetched within :data:`PREFETCH_TIMEOUT`
+    include the number of found subs.
+
+    :param episodes: the list of :class:`EpisodeItem`
+    :param languages: the list of languages to search
+    :return: :class:`SubsSearchResult` for the selected episode
+        or ``None`` if the selection is cancelled
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if the selected episode has no subs
+    """
+    from concurrent.futures import ThreadPoolExecutor, wait
+    from addic7ed import parser
+    executor = ThreadPoolExecutor(max_workers=parser.MAX_PREFETCHED_EPISODES)
+    futures = parser.prefetch_episodes(executor, episodes, languages)
+    try:
+        wait([future for future in futures if future is not None],
+             timeout=PREFETCH_TIMEOUT)
+        i = get_dialog().select(
+            _('Select episode'),
+            [_get_episode_label(item, future) for item, future in zip(episodes, futures)]
+        )
+        if i < 0:
+            return None
+        if futures[i] is not None:
+            return futures[i].result()
+        return parser.get_episode(episodes[i].link, languages)
+    finally:
+        for future in futures:
+            if future is not None:
+                future.cancel()
+        executor.shutdown(wait=False)
+
+
+def cache_results(listing_query, query, results, languages, store_listing):
+    """
+    Store the displayed listing and cache subs for the rest of the season
+
+    :param listing_query: the preferred search query for the episode
+    :param query: the search query that has found the episode
+    :param results: :class:`SubsSearchResult` for the found episode
+    :param languages: the list of languages to search
+    :param store_listing: if ``True``, the listing is stored for displaying
+        on the next search
+    """
+    from addic7ed import parser
+    if store_listing:
+        parser.store_listing(listing_query, languages, results)
+    parser.cache_season(query, results, languages)
+
+
+def revalidate_listing(query, languages, listing):
+    """
+    Reload the episode page of a displayed stored listing
+
+    The page is loaded bypassing the results cache. If the listing
+    has been parsed from the episode page as well and the set of subs versions
+    has changed, a user is notified. The stored listing is updated
+    for the next search.
+
+    :param query: the preferred search query for the episode
+    :param languages: the list of languages to search
+    :param listing: the displayed :class:`parser.StoredListing`
+    """
+    from addic7ed import parser
+    episode_url = listing.results.episode_url
+    try:
+        results = parser.revalidate_episode(episode_url, languages)
+    except Add7ConnectionError:
+        logger.error('Unable to connect to addic7ed.com to revalidate the listing')
+        return
+    except SubsSearchError:
+        logger.info('No subs found on the episode page %s on revalidation', episode_url)
+        return
+    if (listing.from_episode_page
+            and parser.get_versions(results) != parser.get_versions(listing.results)):
+        logger.info('Subs for "%s" have changed since the listing was stored', query)
+        metrics.increment('listings_changed')
+        get_dialog().notification(_('Subtitles list has been updated.'),
+                                  _('Search again to see the new subtitles.'),
+                                  ICON, 3000, False)
+    parser.store_listing(query, languages, results, from_episode_page=True)
+
+
+def search_subs(params, directory):
+    """
+    Search subs and display the found subs
+
+    :param params: plugin call params
+    :param directory: :class:`PluginDirectory` of the plugin call
+    :return: a function that caches subs for the rest of the season
+        of the found episode or revalidates a displayed stored listing,
+        or ``None``. It should be called after the found subs are displayed.
+    """
+    from addic7ed import parser
+    from addic7ed.episode import extract_episode_data, get_search_queries
     logger.info('Searching for subs...')
-    languages = get_languages(
+    languages = parser.get_languages(
         urlparse.unquote_plus(params['languages']).split(',')
     )
     # Search subtitles in Addic7ed.com.
@@ -227,63 +342,110 @@ def search_subs(params):
         try:
             episode_data = extract_episode_data()
         except ParseError:
-            return
-        # Create a search query string
-        showname = normalize_showname(episode_data.showname)
-        query = f'{showname} {episode_data.season}x{episode_data.episode}'
+            get_dialog().notification(_('Error!'), _('Unable to determine episode data.'),
+                                      'error', 3000)
+            return None
+        queries = get_search_queries(episode_data)
         filename = episode_data.filename
     else:
         # Get the query string typed on the on-screen keyboard
-        query = params['searchstring']
-        filename = query
-    if query:
-        logger.debug('Search query: %s', query)
-        try:
-            results = parser.search_episode(query, languages)
-        except Add7ConnectionError:
-            logger.error('Unable to connect to addic7ed.com')
-            DIALOG.notification(_('Error!'), _('Unable to connect to addic7ed.com.'), 'error')
-        except SubsSearchError:
-            logger.info('No subs for "%s" found.', query)
+        queries = [params['searchstring']] if params['searchstring'] else []
+        filename = params['searchstring']
+    if queries:
+        logger.debug('Search queries: %s', queries)
+        return find_subs(queries, filename, languages, directory)
+    return None
+
+
+def find_subs(queries, filename, languages, directory):
+    """
+    Find subs for search queries and display them
+
+    If stored listings are enabled and the episode has a stored listing
+    that is not too old, the listing is displayed without searching.
+
+    :param queries: search queries in the order of preference
+    :param filename: the name of the video-file being played
+    :param languages: the list of languages to search
+    :param directory: :class:`PluginDirectory` of the plugin call
+    :return: a follow-up function or ``None``. See :func:`search_subs`.
+    """
+    from addic7ed import parser
+    listing_max_age = get_listing_max_age()
+    if listing_max_age:
+        listing = parser.get_listing(queries[0], languages, listing_max_age)
+        if listing is not None:
+            logger.info('Displaying the stored listing for "%s"', queries[0])
+            metrics.increment('stored_listings_displayed')
+            display_subs(listing.results.subtitles, listing.results.episode_url, filename,
+                         directory)
+            return partial(revalidate_listing, queries[0], languages, listing)
+    try:
+        query, results = parser.search_any(queries, languages)
+    except Add7ConnectionError:
+        logger.error('Unable to connect to addic7ed.com')
+        get_dialog().notification(_('Error!'), _('Unable to connect to addic7ed.com.'),
+                                  'error')
+    except SubsSearchError:
+        logger.info('No subs for %s found.', queries)
+    else:
+        if isinstance(results, list):
+            logger.info('Multiple episodes found:\n%s', results)
+            try:
+                results = select_episode(results, languages)
+            except Add7ConnectionError:
+                logger.error('Unable to connect to addic7ed.com')
+                get_dialog().notification(_('Error!'),
+                                          _('Unable to connect to addic7ed.com.'), 'error')
+                return None
+            except SubsSearchError:
+                logger.info('No subs found.')
+                return None
+            if results is None:
+                logger.info('Episode selection cancelled.')
+                return None
+            follow_up = None
         else:
-            if isinstance(results, list):
-                logger.info('Multiple episodes found:\n%s', results)
-                i = DIALOG.select(
-                    _('Select episode'), [item.title for item in results]
-                )
-                if i >= 0:
-                    try:
-                        results = parser.get_episode(results[i].link, languages)
-                    except Add7ConnectionError:
-                        logger.error('Unable to connect to addic7ed.com')
-                        DIALOG.notification(_('Error!'),
-                                            _('Unable to connect to addic7ed.com.'), 'error')
-                        return
-                    except SubsSearchError:
-                        logger.info('No subs found.')
-                        return
-                else:
-                    logger.info('Episode selection cancelled.')
-                    return
-            logger.info('Found subs for "%s"', query)
-            display_subs(results.subtitles, results.episode_url, filename)
-
-
-def router(paramstring):
+            follow_up = partial(cache_results, queries[0], query, results, languages,
+                                bool(listing_max_age))
+        logger.info('Found subs for "%s"', query)
+        display_subs(results.subtitles, results.episode_url, filename, directory)
+        return follow_up
+    return None
+
+
+def router(paramstring, directory=None):
     """
     Dispatch plugin functions depending on the call paramstring
 
     :param paramstring: URL-encoded plugin call parameters
     :type paramstring: str
+    :param directory: :class:`PluginDirectory` for found items.
+        By default, the directory of the current plugin call (sys.argv) is used.
     """
+    if directory is None:
+        directory = PluginDirectory.from_argv(sys.argv)
     # Get plugin call params
     params = dict(urlparse.parse_qsl(paramstring))
-    if params['action'] in ('search', 'manualsearch'):
-        # Search and display subs.
-        search_subs(params)
-    elif params['action'] == 'download':
-        download_subs(
-            params['link'], params['ref'],
-            urlparse.unquote(params['filename'])
-        )
-    xbmcplugin.endOfDirectory(HANDLE)
+    with metrics.invocation(params['action']):
+        follow_up = None
+        if params['action'] in ('search', 'manualsearch'):
+            # Search and display subs.
+            follow_up = search_subs(params, directory)
+        elif params['action'] == 'download':
+            download_subs(
+                params['link'], params['ref'],
+                urlparse.unquote(params['filename']),
+                directory
+            )
+        elif params['action'] == 'fetch_missing':
+            # Download missing subs for the video library
+            from addic7ed.batch import fetch_missing_subs
+            fetch_missing_subs()
+        directory.end()
+        # Kodi displays the found subs when the directory is ended,
+        # so work that is not needed for displaying is done afterwards
+        # and timed separately
+        if follow_up is not None:
+            with metrics.timer('follow_up'):
+                follow_up()
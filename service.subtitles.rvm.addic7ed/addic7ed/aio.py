@@ -0,0 +1,198 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+asyncio counterparts of the webclient session and parser entry points
+
+Independent fetches (alternative search queries, candidate episode pages,
+season listings) can be awaited concurrently. The synchronous parser functions
+are run in a thread pool, so they do not block the event loop and use
+the same results cache, connection pool and request scheduler
+as synchronous calls. Errors are the same as for the synchronous functions.
+"""
+
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+
+from addic7ed import metrics, parser
+from addic7ed.exceptions import Add7ConnectionError, SubsSearchError
+from addic7ed.webclient import Session
+
+__all__ = [
+    'AsyncSession',
+    'search_episode',
+    'search_any',
+    'get_episode',
+    'get_episodes',
+    'cache_season',
+]
+
+logger = logging.getLogger(__name__)
+
+# Enough for fetching all prefetched episodes and parsing a page at the same time
+MAX_WORKERS = parser.MAX_PREFETCHED_EPISODES + 1
+
+
+class AsyncSession:
+    """
+    asyncio interface to :class:`webclient.Session`
+
+    Blocking requests of the session are run in a thread pool.
+    The session can be used from multiple event loops.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_session'):
+            return
+        self._session = Session()
+        self._executor = ThreadPoolExecutor(max_workers=MAX_WORKERS,
+                                            thread_name_prefix='addic7ed-aio')
+
+    async def run(self, func, *args):
+        """
+        Run a blocking function in the thread pool
+
+        :param func: a function to run
+        :param args: function arguments
+        :return: function result
+        """
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor,
+                                          metrics.propagate(partial(func, *args)))
+
+    def _load_page(self, path, params):
+        webpage = self._session.load_page(path, params)
+        return webpage, self._session.last_url
+
+    async def load_page(self, path, params=None):
+        """
+        Load webpage by its relative path on the site
+
+        :param path: relative path starting from '/'
+        :param params: URL query params
+        :return: a tuple (webpage content, the final page URL)
+        :raises Add7ConnectionError: if unable to connect to the server
+        """
+        return await self.run(self._load_page, path, params)
+
+    async def download_subs(self, path, referer, filename='subtitles.srt',
+                            normalize_encoding=False):
+        """
+        Download subtitles by their URL
+
+        See :meth:`webclient.Session.download_subs`.
+
+        :raises Add7ConnectionError: if unable to connect to the server
+        :raises DailyLimitExceeded: if the daily downloads quota is exceeded
+        """
+        await self.run(self._session.download_subs, path, referer, filename,
+                       normalize_encoding)
+
+    async def get_quota_stats(self):
+        """
+        Get the daily downloads quota
+
+        :return: :class:`webclient.QuotaStats` instance
+        """
+        return await self.run(self._session.get_quota_stats)
+
+
+async def search_episode(query, languages=None):
+    """
+    Search subs for an episode
+
+    See :func:`parser.search_episode`.
+
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if search returns no results
+    """
+    return await AsyncSession().run(parser.search_episode, query, languages)
+
+
+async def search_any(queries, languages=None):
+    """
+    Search alternative queries for an episode concurrently
+
+    Searches that are not needed are cancelled as soon as the results
+    of a more preferable query are available. Searches that are already
+    running in the thread pool are completed and their results are cached.
+
+    :param queries: search queries in the order of preference
+    :param languages: the list of languages to search
+    :return: a tuple (query, search results) for the 1st query with results
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened for all queries
+    :raises SubsSearchError: if no query has results
+    """
+    tasks = [asyncio.ensure_future(search_episode(query, languages)) for query in queries]
+    connection_error = None
+    try:
+        for query, task in zip(queries, tasks):
+            try:
+                return query, await task
+            except SubsSearchError:
+                logger.debug('No results for "%s"', query)
+            except Add7ConnectionError as exc:
+                connection_error = exc
+    finally:
+        for task in tasks:
+            if not task.done():
+                task.cancel()
+            elif not task.cancelled():
+                # Prevent "Task exception was never retrieved" warnings
+                task.exception()
+    if connection_error is not None:
+        raise connection_error
+    raise SubsSearchError
+
+
+async def get_episode(link, languages=None):
+    """
+    Get subs from an episode page
+
+    See :func:`parser.get_episode`.
+
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if the episode has no subs
+    """
+    return await AsyncSession().run(parser.get_episode, link, languages)
+
+
+async def get_episodes(episodes, languages=None):
+    """
+    Get subs for multiple candidate episodes concurrently
+
+    :param episodes: the list of :class:`parser.EpisodeItem`
+    :param languages: the list of languages to search
+    :return: the list of :class:`parser.SubsSearchResult` or exceptions
+        in the same order as episodes
+    """
+    return await asyncio.gather(*(get_episode(item.link, languages) for item in episodes),
+                                return_exceptions=True)
+
+
+async def cache_season(query, results, languages=None):
+    """
+    Cache subs for the other episodes of the season of a found episode
+
+    See :func:`parser.cache_season`.
+    """
+    await AsyncSession().run(parser.cache_season, query, results, languages)
@@ -0,0 +1,416 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Downloading missing subtitles for the whole video library"""
+
+import json
+import logging
+import os
+import threading
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+import xbmc
+import xbmcgui
+import xbmcvfs
+
+from addic7ed import metrics, parser
+from addic7ed.addon import PROFILE, ICON, GettextEmulator
+from addic7ed.cache import SubtitlesStore
+from addic7ed.episode import EpisodeData, get_search_query
+from addic7ed.exceptions import Add7ConnectionError, NoSubtitlesReturned, SubsSearchError
+from addic7ed.matching import rank_subs
+from addic7ed.utils import get_subtitle_languages
+from addic7ed.webclient import Session
+
+__all__ = ['fetch_missing_subs']
+
+_ = GettextEmulator.gettext
+
+logger = logging.getLogger(__name__)
+
+LibraryEpisode = namedtuple('LibraryEpisode',
+                            ['episodeid', 'showtitle', 'season', 'episode', 'file'])
+
+CHECKPOINT_PATH = PROFILE / 'batch-checkpoint.json'
+BATCH_TEMP_DIR = PROFILE / 'batch'
+# Max number of episodes processed concurrently. Requests to the site
+# are rate-limited by the session scheduler.
+BATCH_WORKERS = 3
+# Save the checkpoint after this number of processed episodes
+CHECKPOINT_INTERVAL = 20
+# The number of episodes requested from the library at once
+LIBRARY_PAGE_SIZE = 500
+SUBTITLE_EXTENSIONS = {'.srt', '.ass', '.ssa', '.sub', '.smi', '.vtt'}
+# The language of subs if no subtitle languages are set in Kodi settings,
+# the same as parser uses by default
+DEFAULT_LANGUAGE = 'English'
+# Video paths that cannot have subtitles next to them
+UNSUPPORTED_PATH_PREFIXES = ('stack://', 'plugin://', 'http://', 'https://', 'rar://', 'zip://')
+
+
+def get_library_episodes():
+    """
+    Get all episodes from the Kodi video library via JSON-RPC
+
+    :return: the generator of :class:`LibraryEpisode` items
+    """
+    start = 0
+    while True:
+        request = json.dumps({
+            'jsonrpc': '2.0',
+            'method': 'VideoLibrary.GetEpisodes',
+            'params': {
+                'properties': ['showtitle', 'season', 'episode', 'file'],
+                'limits': {'start': start, 'end': start + LIBRARY_PAGE_SIZE},
+            },
+            'id': '1'
+        })
+        result = json.loads(xbmc.executeJSONRPC(request)).get('result', {})
+        episodes = result.get('episodes', [])
+        for item in episodes:
+            yield LibraryEpisode(item['episodeid'], item['showtitle'], item['season'],
+                                 item['episode'], item['file'])
+        start += LIBRARY_PAGE_SIZE
+        if not episodes or start >= result.get('limits', {}).get('total', 0):
+            break
+
+
+def get_language_code(language):
+    """
+    Get a language code that Kodi adds to downloaded subs filenames
+
+    :param language: Kodi language name
+    :return: ISO 639-1 code or the language name if the code is not available
+    """
+    return xbmc.convertLanguage(language, xbmc.ISO_639_1) or language
+
+
+class LocalSubsFinder:  # pylint: disable=too-few-public-methods
+    """
+    Finds subtitles files next to video files
+
+    Subs filenames must start with the video filename without extension
+    optionally followed by language codes or names, e.g. "episode.en.srt"
+    or "episode.English.forced.srt". Subs without a language are considered
+    to be in the 1st requested language. Directory listings are cached,
+    so each directory is listed only once.
+
+    :param languages: the list of Kodi language names
+    """
+    def __init__(self, languages):
+        self._languages = languages
+        self._language_tags = {}
+        for language in languages:
+            for tag in (language, get_language_code(language),
+                        xbmc.convertLanguage(language, xbmc.ISO_639_2)):
+                if tag:
+                    self._language_tags.setdefault(tag.lower(), language)
+        self._listings = {}
+
+    def _list_dir(self, directory):
+        listing = self._listings.get(directory)
+        if listing is None:
+            _, files = xbmcvfs.listdir(directory)
+            listing = self._listings[directory] = [
+                filename for filename in files
+                if os.path.splitext(filename)[1].lower() in SUBTITLE_EXTENSIONS
+            ]
+        return listing
+
+    def get_missing_languages(self, video_file):
+        """
+        Get requested languages that do not have subs for a video file
+
+        :param video_file: full video file path
+        :return: the list of Kodi language names
+        """
+        directory, filename = os.path.split(video_file)
+        stem = os.path.splitext(filename)[0].lower()
+        found = set()
+        for subs_filename in self._list_dir(directory + '/'):
+            subs_stem = os.path.splitext(subs_filename)[0].lower()
+            if subs_stem == stem and self._languages:
+                found.add(self._languages[0])
+            elif subs_stem.startswith(stem + '.'):
+                for tag in subs_stem[len(stem) + 1:].split('.'):
+                    if tag in self._language_tags:
+                        found.add(self._language_tags[tag])
+        return [language for language in self._languages if language not in found]
+
+
+class Checkpoint:
+    """
+    The progress of an interrupted batch download
+
+    The checkpoint stores the IDs of processed library episodes, so that
+    the next run with the same languages skips them.
+
+    :param languages: the list of Kodi language names
+    """
+    def __init__(self, languages):
+        self._languages = languages
+        self.done = set()
+        try:
+            with CHECKPOINT_PATH.open('r', encoding='utf-8') as fo:
+                data = json.load(fo)
+        except (OSError, ValueError):
+            return
+        if data.get('languages') == languages:
+            self.done = set(data['done'])
+            logger.info('Resuming batch download: %s episodes processed before',
+                        len(self.done))
+
+    def save(self):
+        """Save the checkpoint atomically"""
+        temp_path = CHECKPOINT_PATH.with_suffix('.tmp')
+        with temp_path.open('w', encoding='utf-8') as fo:
+            json.dump({'languages': self._languages, 'done': sorted(self.done)}, fo)
+        os.replace(temp_path, CHECKPOINT_PATH)
+
+    @staticmethod
+    def clear():
+        """Delete the checkpoint after successful completion"""
+        if CHECKPOINT_PATH.exists():
+            CHECKPOINT_PATH.unlink()
+
+
+def find_episode_subs(episode, languages):
+    """
+    Find subs on addic7ed.com for a library episode
+
+    If search returns multiple episodes, the one from the show with exactly
+    the same title is selected. Subs for the rest of the season of a found
+    episode are cached, so other episodes of the season are found
+    without accessing the site.
+
+    :param episode: :class:`LibraryEpisode` instance
+    :param languages: the list of :class:`parser.LanguageData`
+    :return: :class:`parser.SubsSearchResult` or ``None`` if the episode
+        cannot be identified unambiguously
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if no subs are found
+    """
+    episode_data = EpisodeData(episode.showtitle, str(episode.season).zfill(2),
+                               str(episode.episode).zfill(2), episode.file)
+    query = get_search_query(episode_data)
+    results = parser.search_episode(query, languages)
+    if not isinstance(results, list):
+        parser.cache_season(query, results, languages)
+        return results
+    showtitle = episode.showtitle.lower()
+    matches = [item for item in results
+               if item.title.split(' - ')[0].strip().lower() == showtitle]
+    if len(matches) != 1:
+        logger.info('Unable to select "%s" %sx%s from %s search results',
+                    episode.showtitle, episode.season, episode.episode, len(results))
+        return None
+    return parser.get_episode(matches[0].link, languages)
+
+
+def download_episode_subs(episode, languages, stop_event):
+    """
+    Download the best matching subs for missing languages of a library episode
+
+    :param episode: :class:`LibraryEpisode` instance
+    :param languages: the list of missing :class:`parser.LanguageData`
+    :param stop_event: :class:`threading.Event` that is set when the batch is stopped
+    :return: the number of downloaded subs
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises NoSubtitlesReturned: if the daily downloads limit is exceeded
+    """
+    if stop_event.is_set():
+        return 0
+    try:
+        results = find_episode_subs(episode, languages)
+    except SubsSearchError:
+        results = None
+    if results is None:
+        return 0
+    filename = os.path.basename(episode.file)
+    subs_store = SubtitlesStore()
+    downloaded = 0
+    for language in languages:
+        ranked = [(item, match) for item, match in rank_subs(results.subtitles, filename)
+                  if item.language == language.kodi_lang and not item.unfinished]
+        if not ranked or stop_event.is_set():
+            continue
+        item = ranked[0][0]
+        temp_path = str(BATCH_TEMP_DIR / f'{episode.episodeid}.{language.kodi_lang}.srt')
+        if not subs_store.get(item.link, temp_path):
+            Session().download_subs(item.link, results.episode_url, temp_path,
+                                    normalize_encoding=True)
+            subs_store.put(item.link, temp_path)
+        subs_path = (os.path.splitext(episode.file)[0] + '.' +
+                     get_language_code(language.kodi_lang) + '.srt')
+        if xbmcvfs.copy(temp_path, subs_path):
+            downloaded += 1
+            logger.info('Subs downloaded: %s', subs_path)
+        else:
+            logger.error('Unable to save subs: %s', subs_path)
+        xbmcvfs.delete(temp_path)
+    return downloaded
+
+
+def find_missing_subs(checkpoint, languages):
+    """
+    Find library episodes without local subs in the requested languages
+
+    Episodes with all subs present are added to the checkpoint.
+
+    :param checkpoint: :class:`Checkpoint` instance
+    :param languages: the dict of Kodi language names to :class:`parser.LanguageData`
+    :return: the list of tuples (:class:`LibraryEpisode`, the list of missing languages)
+    """
+    local_subs = LocalSubsFinder(list(languages))
+    episodes = []
+    for episode in get_library_episodes():
+        if (episode.episodeid in checkpoint.done or
+                episode.file.startswith(UNSUPPORTED_PATH_PREFIXES)):
+            continue
+        missing = local_subs.get_missing_languages(episode.file)
+        if missing:
+            episodes.append((episode, [languages[language] for language in missing]))
+        else:
+            checkpoint.done.add(episode.episodeid)
+    return episodes
+
+
+class BatchDownload:
+    """
+    Downloads subs for multiple episodes concurrently
+
+    The download stops on connection errors, on exceeding the daily downloads limit
+    or on Kodi shutdown. Processed episodes are saved to the checkpoint.
+    Episodes that fail with other errors are logged and skipped.
+
+    :param episodes: the list of tuples (:class:`LibraryEpisode`,
+        the list of missing :class:`parser.LanguageData`)
+    :param checkpoint: :class:`Checkpoint` instance
+    """
+    def __init__(self, episodes, checkpoint):
+        self._episodes = episodes
+        self._checkpoint = checkpoint
+        self._stop_event = threading.Event()
+        self.processed = 0
+        self.downloaded = 0
+        self.failed = 0
+        self.error_message = None
+
+    @property
+    def stopped(self):
+        return self._stop_event.is_set()
+
+    def _handle_result(self, episode, future):
+        try:
+            self.downloaded += future.result()
+        except Add7ConnectionError:
+            logger.error('Unable to connect to addic7ed.com')
+            self.error_message = _('Unable to connect to addic7ed.com.')
+            self._stop_event.set()
+        except NoSubtitlesReturned:
+            logger.error('Exceeded daily limit for subs downloads')
+            self.error_message = _('Exceeded daily limit for subs downloads.')
+            self._stop_event.set()
+        except Exception:  # pylint: disable=broad-except
+            # An unexpected error with one episode does not stop the batch
+            logger.exception('Unable to download subs for %s', episode)
+            self.failed += 1
+        else:
+            if not self.stopped:
+                self._checkpoint.done.add(episode.episodeid)
+
+    def run(self, progress, monitor):
+        """
+        Run the download
+
+        :param progress: :class:`xbmcgui.DialogProgressBG` instance
+        :param monitor: :class:`xbmc.Monitor` instance
+        """
+        download = metrics.propagate(download_episode_subs)
+        completed = False
+        try:
+            with ThreadPoolExecutor(max_workers=BATCH_WORKERS) as executor:
+                futures = {
+                    executor.submit(download, episode, missing,
+                                    self._stop_event): episode
+                    for episode, missing in self._episodes
+                }
+                for future in as_completed(futures):
+                    if future.cancelled():
+                        continue
+                    episode = futures[future]
+                    self.processed += 1
+                    self._handle_result(episode, future)
+                    if self.processed % CHECKPOINT_INTERVAL == 0:
+                        self._checkpoint.save()
+                    progress.update(
+                        self.processed * 100 // len(futures),
+                        message=f'{episode.showtitle} {episode.season}x{episode.episode}'
+                    )
+                    if monitor.abortRequested():
+                        self._stop_event.set()
+                    if self.stopped:
+                        for pending in futures:
+                            pending.cancel()
+            completed = not self.stopped
+        finally:
+            # Processed episodes are not lost if the download is interrupted
+            # by an unexpected error
+            if completed:
+                self._checkpoint.clear()
+            else:
+                self._checkpoint.save()
+
+
+def fetch_missing_subs():
+    """
+    Download missing subs for all episodes in the video library
+
+    Subs are downloaded in the languages configured for subs download
+    in Kodi settings. The download can be interrupted by Kodi shutdown,
+    connection errors or exceeding the daily downloads limit. In that case,
+    the next run continues from where the previous one has stopped.
+    The download does not start if the daily downloads quota is exhausted.
+    """
+    quota = Session().get_quota_stats()
+    if quota.remaining == 0:
+        logger.warning('Daily downloads quota is exhausted: %s', quota)
+        xbmcgui.Dialog().notification(_('Error!'),
+                                      _('Exceeded daily limit for subs downloads.'), 'error')
+        return
+    kodi_languages = get_subtitle_languages() or [DEFAULT_LANGUAGE]
+    languages = {language.kodi_lang: language
+                 for language in parser.get_languages(kodi_languages)}
+    checkpoint = Checkpoint(kodi_languages)
+    episodes = find_missing_subs(checkpoint, languages)
+    logger.info('Episodes with missing subs: %s, downloads quota: %s',
+                len(episodes), quota)
+    if not BATCH_TEMP_DIR.exists():
+        BATCH_TEMP_DIR.mkdir(parents=True)
+    progress = xbmcgui.DialogProgressBG()
+    progress.create(_('Downloading missing subtitles'))
+    batch = BatchDownload(episodes, checkpoint)
+    try:
+        batch.run(progress, xbmc.Monitor())
+    finally:
+        progress.close()
+    logger.info('Batch download finished: %s episodes processed, %s subs downloaded, '
+                '%s episodes failed', batch.processed, batch.downloaded, batch.failed)
+    if batch.error_message is not None:
+        xbmcgui.Dialog().notification(_('Error!'), batch.error_message, 'error')
+    else:
+        xbmcgui.Dialog().notification(
+            _('Success!'), _('Subtitles downloaded: {0}').format(batch.downloaded),
+            ICON, 3000, False)
@@ -0,0 +1,411 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Persistent caches for addic7ed.com search results and webpages"""
+
+import gzip
+import hashlib
+import json
+import logging
+import os
+import shutil
+import sqlite3
+import threading
+import time
+import zlib
+from collections import namedtuple
+
+from addic7ed.addon import PROFILE
+
+__all__ = ['ResultsCache', 'ResponseStore', 'StoredResponse', 'SubtitlesStore', 'DownloadsLog']
+
+logger = logging.getLogger(__name__)
+
+StoredResponse = namedtuple('StoredResponse', ['url', 'etag', 'last_modified', 'body'])
+
+
+class _SqliteStore:
+    """
+    Base class for SQLite-backed stores in the addon profile
+
+    The database is opened lazily on the first access, so creating an instance
+    is cheap. If the database cannot be opened or becomes corrupted,
+    the store silently degrades to a no-op.
+    """
+    SCHEMA_VERSION = 1
+    TABLE = ''
+    COLUMNS = ''
+
+    def __init__(self, db_path, max_entries):
+        """
+        :param db_path: path to the SQLite database file
+        :param max_entries: the max number of entries kept in the store
+        """
+        self._db_path = db_path
+        self._max_entries = max_entries
+        self._connection = None
+        self._disabled = False
+        self._lock = threading.RLock()
+
+    def _connect(self):
+        if self._connection is None and not self._disabled:
+            try:
+                if not self._db_path.parent.exists():
+                    self._db_path.parent.mkdir(parents=True)
+                connection = sqlite3.connect(str(self._db_path), timeout=5.0,
+                                             check_same_thread=False)
+                version = connection.execute('PRAGMA user_version').fetchone()[0]
+                if version != self.SCHEMA_VERSION:
+                    connection.execute(f'DROP TABLE IF EXISTS {self.TABLE}')
+                    connection.execute(f'PRAGMA user_version = {self.SCHEMA_VERSION}')
+                connection.execute(
+                    f'CREATE TABLE IF NOT EXISTS {self.TABLE} ('
+                    f'key TEXT PRIMARY KEY, {self.COLUMNS}, accessed REAL NOT NULL)'
+                )
+                connection.execute(
+                    f'CREATE INDEX IF NOT EXISTS {self.TABLE}_accessed '
+                    f'ON {self.TABLE} (accessed)'
+                )
+                connection.commit()
+            except (OSError, sqlite3.Error):
+                logger.exception('Unable to open %s', self._db_path)
+                self._disabled = True
+            else:
+                self._connection = connection
+        return self._connection
+
+    def _execute(self, *statements):
+        """
+        Execute SQL statements in a single transaction
+
+        :param statements: tuples of (SQL statement, parameters)
+        :return: the cursor of the last statement or ``None`` on error
+        """
+        with self._lock:
+            connection = self._connect()
+            if connection is None:
+                return None
+            try:
+                cursor = None
+                for sql, params in statements:
+                    cursor = connection.execute(sql, params)
+                connection.commit()
+                return cursor
+            except sqlite3.Error:
+                logger.exception('Unable to access %s', self._db_path)
+                return None
+
+    def _fetch(self, columns, key):
+        """
+        Fetch an entry and update its access time
+
+        :param columns: comma-separated columns to fetch
+        :param key: entry key
+        :return: a row tuple or ``None``
+        """
+        with self._lock:
+            cursor = self._execute(
+                (f'SELECT {columns} FROM {self.TABLE} WHERE key = ?', (key,))
+            )
+            row = cursor.fetchone() if cursor is not None else None
+            if row is not None:
+                self._execute(
+                    (f'UPDATE {self.TABLE} SET accessed = ? WHERE key = ?', (time.time(), key))
+                )
+            return row
+
+    def _store(self, key, values):
+        """
+        Insert or replace an entry and evict the least recently used entries
+
+        :param key: entry key
+        :param values: a dict of column values
+        """
+        columns = ', '.join(['key', *values, 'accessed'])
+        placeholders = ', '.join('?' * (len(values) + 2))
+        with self._lock:
+            self._execute(
+                (f'INSERT OR REPLACE INTO {self.TABLE} ({columns}) VALUES ({placeholders})',
+                 (key, *values.values(), time.time()))
+            )
+            self._evict()
+
+    def _evict(self):
+        """Evict the least recently used entries above the max number of entries"""
+        self._execute(
+            (f'DELETE FROM {self.TABLE} WHERE key IN ('
+             f'SELECT key FROM {self.TABLE} ORDER BY accessed DESC LIMIT -1 OFFSET ?)',
+             (self._max_entries,))
+        )
+
+    def delete(self, key):
+        """
+        Remove an entry
+
+        :param key: entry key
+        """
+        self._execute((f'DELETE FROM {self.TABLE} WHERE key = ?', (key,)))
+
+    def clear(self):
+        """Remove all entries"""
+        self._execute((f'DELETE FROM {self.TABLE}', ()))
+
+
+class ResultsCache(_SqliteStore):
+    """
+    Disk-backed key-value cache with per-entry TTL and LRU eviction
+
+    Values are arbitrary JSON-serializable objects.
+    """
+    TABLE = 'results'
+    COLUMNS = 'value TEXT NOT NULL, expires REAL NOT NULL'
+
+    def __init__(self, db_path=None, max_entries=500):
+        super().__init__(db_path or PROFILE / 'cache.sqlite', max_entries)
+
+    def get(self, key):
+        """
+        Get a cached value
+
+        :param key: cache key
+        :return: cached value or ``None`` if the key is missing or expired
+        """
+        row = self._fetch('value, expires', key)
+        if row is None:
+            return None
+        value, expires = row
+        if expires <= time.time():
+            self.delete(key)
+            return None
+        logger.debug('Results cache hit: %s', key)
+        return json.loads(value)
+
+    def set(self, key, value, ttl):
+        """
+        Store a value in the cache
+
+        If the number of entries exceeds the cache size, the least recently
+        used entries are evicted.
+
+        :param key: cache key
+        :param value: JSON-serializable value
+        :param ttl: entry time-to-live in seconds
+        """
+        self._store(key, {'value': json.dumps(value), 'expires': time.time() + ttl})
+
+
+class ResponseStore(_SqliteStore):
+    """
+    Disk-backed store of HTTP responses for conditional revalidation
+
+    It keeps ``ETag``/``Last-Modified`` validators and compressed page
+    contents keyed by request URL.
+    """
+    TABLE = 'responses'
+    COLUMNS = ('url TEXT NOT NULL, etag TEXT, last_modified TEXT, '
+               'body BLOB NOT NULL')
+
+    def __init__(self, db_path=None, max_entries=200):
+        super().__init__(db_path or PROFILE / 'http-cache.sqlite', max_entries)
+
+    def get(self, key):
+        """
+        Get a stored response
+
+        :param key: request URL including query params
+        :return: :class:`StoredResponse` instance or ``None``
+        """
+        row = self._fetch('url, etag, last_modified, body', key)
+        if row is None:
+            return None
+        url, etag, last_modified, body = row
+        return StoredResponse(url, etag, last_modified, zlib.decompress(body))
+
+    def set(self, key, response):
+        """
+        Store a response
+
+        :param key: request URL including query params
+        :param response: :class:`StoredResponse` instance
+        """
+        self._store(key, {
+            'url': response.url,
+            'etag': response.etag,
+            'last_modified': response.last_modified,
+            'body': zlib.compress(response.body),
+        })
+
+
+class DownloadsLog(_SqliteStore):
+    """
+    Disk-backed log of subtitles downloads from the site
+
+    Each entry is a download attempt with its time. Attempts that have been
+    rejected by the site because of the daily downloads limit are marked
+    as limited.
+    """
+    TABLE = 'downloads'
+    COLUMNS = 'link TEXT NOT NULL, limited INTEGER NOT NULL'
+
+    def __init__(self, db_path=None, max_entries=1000):
+        super().__init__(db_path or PROFILE / 'downloads.sqlite', max_entries)
+
+    def add(self, key, link):
+        """
+        Add a download attempt with the current time
+
+        :param key: unique attempt ID
+        :param link: subtitles download link
+        """
+        self._store(key, {'link': link, 'limited': 0})
+
+    def set_limited(self, key):
+        """
+        Mark a download attempt as rejected because of the daily limit
+
+        :param key: attempt ID
+        """
+        self._execute((f'UPDATE {self.TABLE} SET limited = 1 WHERE key = ?', (key,)))
+
+    def get_since(self, timestamp):
+        """
+        Get download attempts made after the given time
+
+        :param timestamp: Unix time
+        :return: the list of tuples (attempt time, limited flag) from the oldest
+            to the newest
+        """
+        cursor = self._execute(
+            (f'SELECT accessed, limited FROM {self.TABLE} WHERE accessed > ? '
+             f'ORDER BY accessed', (timestamp,))
+        )
+        if cursor is None:
+            return []
+        return [(accessed, bool(limited)) for accessed, limited in cursor.fetchall()]
+
+
+class SubtitlesStore(_SqliteStore):
+    """
+    Content-addressed store of downloaded subtitles
+
+    Subtitle files are stored compressed under names derived from their
+    SHA-256 hashes, so identical files downloaded by different links
+    are stored only once. The index maps download links to file hashes.
+    When the total size of stored files exceeds the limit,
+    the least recently used links are evicted along with unreferenced files.
+    """
+    TABLE = 'subtitles'
+    COLUMNS = 'hash TEXT NOT NULL, size INTEGER NOT NULL'
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(self, store_dir=None, max_size=20 * 1024 * 1024):
+        """
+        :param store_dir: the directory for stored files
+        :param max_size: the max total size of compressed files in bytes
+        """
+        self._store_dir = store_dir or PROFILE / 'subtitles'
+        super().__init__(self._store_dir / 'index.sqlite', max_entries=None)
+        self._max_size = max_size
+
+    def _blob_path(self, content_hash):
+        return self._store_dir / f'{content_hash}.gz'
+
+    def get(self, link, filename):
+        """
+        Copy stored subtitles for a download link to a file
+
+        :param link: subtitles download link
+        :param filename: destination file path
+        :return: ``True`` if subtitles are found in the store, else ``False``
+        """
+        row = self._fetch('hash', link)
+        if row is None:
+            return False
+        blob_path = self._blob_path(row[0])
+        try:
+            with gzip.open(blob_path, 'rb') as src, open(filename, 'wb') as dst:
+                shutil.copyfileobj(src, dst, self.CHUNK_SIZE)
+        except (OSError, EOFError):
+            logger.exception('Unable to read stored subtitles %s', blob_path)
+            self.delete(link)
+            return False
+        logger.debug('Subtitles store hit: %s', link)
+        return True
+
+    def put(self, link, filename):
+        """
+        Add a downloaded subtitles file to the store
+
+        :param link: subtitles download link
+        :param filename: downloaded subtitles file path
+        """
+        if not self._store_dir.exists():
+            self._store_dir.mkdir(parents=True)
+        content_hash = hashlib.sha256()
+        temp_path = self._store_dir / f'{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with open(filename, 'rb') as src, gzip.open(temp_path, 'wb') as dst:
+                for chunk in iter(lambda: src.read(self.CHUNK_SIZE), b''):
+                    content_hash.update(chunk)
+                    dst.write(chunk)
+            blob_path = self._blob_path(content_hash.hexdigest())
+            size = temp_path.stat().st_size
+            if blob_path.exists():
+                temp_path.unlink()
+            else:
+                os.replace(temp_path, blob_path)
+        except OSError:
+            logger.exception('Unable to store subtitles %s', filename)
+            if temp_path.exists():
+                temp_path.unlink()
+            return
+        self._store(link, {'hash': content_hash.hexdigest(), 'size': size})
+
+    def _evict(self):
+        """
+        Evict the least recently used links above the max size of stored files
+        and delete files that are no longer referenced
+        """
+        with self._lock:
+            cursor = self._execute(
+                (f'SELECT key, hash, size FROM {self.TABLE} ORDER BY accessed DESC', ())
+            )
+            if cursor is None:
+                return
+            total_size = 0
+            kept_hashes = set()
+            evicted_keys = []
+            for key, content_hash, size in cursor.fetchall():
+                if content_hash not in kept_hashes:
+                    total_size += size
+                    if total_size > self._max_size:
+                        evicted_keys.append(key)
+                        continue
+                kept_hashes.add(content_hash)
+            if not evicted_keys:
+                return
+            self._execute(*(
+                (f'DELETE FROM {self.TABLE} WHERE key = ?', (key,)) for key in evicted_keys
+            ))
+            for blob_path in self._store_dir.glob('*.gz'):
+                if blob_path.stem not in kept_hashes:
+                    logger.debug('Evicting stored subtitles %s', blob_path.name)
+                    blob_path.unlink()
+
+    def clear(self):
+        """Remove all stored subtitles"""
+        with self._lock:
+            super().clear()
+            for blob_path in self._store_dir.glob('*.gz'):
+                blob_path.unlink()
@@ -0,0 +1,238 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Cached catalog of addic7ed.com shows with a fuzzy name index"""
+
+import html
+import logging
+import re
+import threading
+import time
+from collections import Counter, defaultdict, namedtuple
+from urllib.parse import quote
+
+from addic7ed.addon import PROFILE
+from addic7ed.cache import ResultsCache
+from addic7ed.exceptions import Add7ConnectionError
+from addic7ed.webclient import Session
+
+__all__ = ['ShowItem', 'ShowCatalog', 'normalize_title']
+
+logger = logging.getLogger(__name__)
+
+ShowItem = namedtuple('ShowItem', ['show_id', 'name'])
+
+SHOW_LINK_RE = re.compile(r'<a href="/show/(\d+)"[^>]*>([^<]+)</a>')
+# Punctuation inside words, e.g. "Grey's" or "S.H.I.E.L.D."
+INNER_PUNCTUATION_RE = re.compile(r"['\u2019.]")
+NON_ALNUM_RE = re.compile(r'[^a-z0-9]+')
+YEAR_RE = re.compile(r' (?:19|20)\d\d$')
+# Characters that are not escaped in episode links on the site
+EPISODE_LINK_SAFE_CHARS = "()'!,&:"
+CATALOG_KEY = 'shows'
+# The catalog is refreshed weekly to get new shows
+CATALOG_TTL = 7 * 24 * 60 * 60
+# A loaded catalog is checked against the cache at this interval,
+# so that the long-running service gets new shows as well
+CATALOG_CHECK_INTERVAL = 60 * 60
+# Min Dice coefficient of name trigrams for a fuzzy match
+MIN_SIMILARITY = 0.75
+
+
+def normalize_title(title):
+    """
+    Normalize a show title for matching
+
+    The title is lowercased, "&" is replaced with "and", and punctuation
+    is removed, e.g. "Law & Order: SVU" becomes "law and order svu",
+    "Doctor Who (2005)" becomes "doctor who 2005" and "Marvel's Agents
+    of S.H.I.E.L.D." becomes "marvels agents of shield".
+
+    :param title: show title
+    :return: normalized title
+    """
+    title = INNER_PUNCTUATION_RE.sub('', title.lower().replace('&', ' and '))
+    return NON_ALNUM_RE.sub(' ', title).strip()
+
+
+def get_trigrams(text):
+    """
+    Get the set of character trigrams of a normalized title
+
+    :param text: normalized title
+    :return: the set of trigrams
+    """
+    text = f'  {text} '
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+
+class ShowCatalog:  # pylint: disable=too-many-instance-attributes
+    """
+    Catalog of addic7ed.com show names and IDs
+
+    The list of shows is loaded from the site on first use and cached
+    in the addon profile for :data:`CATALOG_TTL`. Show titles are resolved
+    to catalog shows by a normalized name, by a name without a year
+    if only one show has that name, and by a trigram index for fuzzy matching,
+    in that order. Titles that match several shows by a name without a year
+    are not resolved, so that the site search decides.
+    The catalog can be used from multiple threads. A loaded catalog is reloaded
+    when its cache entry expires or is updated by another process.
+    """
+    _instance = None
+
+    def __new__(cls):
+        if cls._instance is None:
+            cls._instance = super().__new__(cls)
+        return cls._instance
+
+    def __init__(self):
+        if hasattr(self, '_lock'):
+            return
+        self._lock = threading.Lock()
+        self._cache = ResultsCache(PROFILE / 'catalog.sqlite', max_entries=1)
+        self._shows = None
+        self._next_check = 0.0
+        self._names = {}
+        self._base_names = defaultdict(list)
+        self._trigrams = []
+        self._index = defaultdict(list)
+
+    @staticmethod
+    def _fetch_shows():
+        """
+        Load the list of shows from the site
+
+        :return: the list of :class:`ShowItem`
+        :raises Add7ConnectionError: if addic7ed.com cannot be opened
+        """
+        webpage = Session().load_page('/shows.php')
+        shows = {}
+        for show_id, name in SHOW_LINK_RE.findall(webpage):
+            shows.setdefault(int(show_id), html.unescape(name).strip())
+        logger.info('Loaded %s shows from addic7ed.com', len(shows))
+        return [ShowItem(show_id, name) for show_id, name in shows.items()]
+
+    def _build_index(self, shows):
+        self._shows = shows
+        self._names = {}
+        self._base_names = defaultdict(list)
+        self._trigrams = []
+        self._index = defaultdict(list)
+        for i, show in enumerate(shows):
+            name = normalize_title(show.name)
+            self._names.setdefault(name, show)
+            self._base_names[YEAR_RE.sub('', name)].append(show)
+            trigrams = get_trigrams(name)
+            self._trigrams.append(len(trigrams))
+            for trigram in trigrams:
+                self._index[trigram].append(i)
+
+    def _load(self):
+        """
+        Load the catalog from the cache or from the site and index show names
+
+        :raises Add7ConnectionError: if addic7ed.com cannot be opened
+        """
+        with self._lock:
+            now = time.monotonic()
+            if self._shows is not None and now < self._next_check:
+                return
+            cached = self._cache.get(CATALOG_KEY)
+            if cached is not None:
+                shows = [ShowItem(*item) for item in cached]
+            else:
+                try:
+                    shows = self._fetch_shows()
+                except Add7ConnectionError:
+                    if self._shows is None:
+                        raise
+                    logger.error('Unable to refresh the show catalog')
+                    shows = self._shows
+                else:
+                    if shows:
+                        self._cache.set(CATALOG_KEY, [list(show) for show in shows],
+                                        CATALOG_TTL)
+            if shows != self._shows:
+                self._build_index(shows)
+            self._next_check = now + CATALOG_CHECK_INTERVAL
+
+    def _find_similar(self, name):
+        """
+        Find the show with the most similar name by trigrams
+
+        :param name: normalized title
+        :return: :class:`ShowItem` or ``None`` if there is no single best match
+        """
+        trigrams = get_trigrams(name)
+        shared = Counter()
+        for trigram in trigrams:
+            shared.update(self._index.get(trigram, ()))
+        best = None
+        best_score = second_score = 0.0
+        for i, count in shared.items():
+            score = 2 * count / (len(trigrams) + self._trigrams[i])
+            if score > best_score:
+                best, best_score, second_score = i, score, best_score
+            elif score > second_score:
+                second_score = score
+        if best is None or best_score < MIN_SIMILARITY or best_score == second_score:
+            return None
+        logger.debug('Fuzzy match for "%s": "%s" (%.2f)', name, self._shows[best].name,
+                     best_score)
+        return self._shows[best]
+
+    def find_show(self, title):
+        """
+        Find a show by its title, e.g. Kodi ``showtitle``
+
+        :param title: show title
+        :return: :class:`ShowItem` or ``None`` if the show is not found
+            or the title matches several shows equally
+        :raises Add7ConnectionError: if the catalog cannot be loaded
+        """
+        self._load()
+        name = normalize_title(title)
+        show = self._names.get(name)
+        if show is not None:
+            return show
+        # A title with a year matches a show without the year or with another year
+        # only if it is the single show with that name, e.g. "Doctor Who (2023)"
+        # must not resolve to "Doctor Who" if "Doctor Who (2005)" exists as well.
+        candidates = self._base_names.get(YEAR_RE.sub('', name), ())
+        if len(candidates) == 1:
+            return candidates[0]
+        if candidates:
+            return None
+        return self._find_similar(name)
+
+    def get_episode_link(self, title, season, episode):
+        """
+        Get the episode page link of a show
+
+        :param title: show title
+        :param season: season #
+        :param episode: episode #
+        :return: a relative episode page link or ``None`` if the show is not found
+        """
+        try:
+            show = self.find_show(title)
+        except Add7ConnectionError:
+            logger.error('Unable to load the show catalog')
+            return None
+        if show is None:
+            logger.debug('Show "%s" is not found in the catalog', title)
+            return None
+        name = quote(show.name.replace(' ', '_'), safe=EPISODE_LINK_SAFE_CHARS)
+        return f'serie/{name}/{int(season)}/{int(episode)}/addic7ed'
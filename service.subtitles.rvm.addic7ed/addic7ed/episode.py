@@ -0,0 +1,113 @@
+# Copyright (C) 2016, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Episode data of the currently played video"""
+
+import logging
+import os
+import re
+from collections import namedtuple
+from urllib import parse as urlparse
+
+import xbmc
+
+from addic7ed.addon import ADDON
+from addic7ed.exceptions import ParseError
+from addic7ed.parser import parse_filename, normalize_showname
+from addic7ed.utils import get_now_played
+
+__all__ = ['EpisodeData', 'extract_episode_data', 'get_search_query', 'get_search_queries']
+
+logger = logging.getLogger(__name__)
+
+VIDEOFILE_EXTENSIONS = {'.avi', '.mkv', '.mp4', '.ts', '.m2ts', '.mov'}
+# A year that distinguishes shows with the same name, e.g. "Doctor Who (2005)"
+SHOW_YEAR_RE = re.compile(r'\s*\(\d{4}\)$')
+
+EpisodeData = namedtuple('EpisodeData',
+                         ['showname', 'season', 'episode', 'filename'])
+
+
+def extract_episode_data():
+    """
+    Extract episode data for searching
+
+    :return: named tuple (showname, season, episode, filename)
+    :raises ParseError: if cannot determine episode data
+    """
+    now_played = get_now_played()
+    logger.debug('Played file info: %s', now_played)
+    showname = now_played['showtitle'] or xbmc.getInfoLabel('VideoPlayer.TVshowtitle')
+    parsed = urlparse.urlparse(now_played['file'])
+    filename = os.path.basename(parsed.path)
+    if ADDON.getSetting('use_filename') == 'true' or not showname:
+        # Try to get showname/season/episode data from
+        # the filename if 'use_filename' setting is true
+        # or if the video-file does not have library metadata.
+        try:
+            logger.debug('Using filename: %s', filename)
+            showname, season, episode = parse_filename(filename)
+        except ParseError:
+            logger.debug('Filename %s failed. Trying ListItem.Label...', filename)
+            try:
+                filename = now_played['label']
+                logger.debug('Using filename: %s', filename)
+                showname, season, episode = parse_filename(filename)
+            except ParseError:
+                logger.error('Unable to determine episode data for %s', filename)
+                raise
+    else:
+        # Get get showname/season/episode data from
+        # Kodi if the video-file is being played from
+        # the TV-Shows library.
+        season = str(now_played['season'] if now_played['season'] > -1
+                     else xbmc.getInfoLabel('VideoPlayer.Season'))
+        season = season.zfill(2)
+        episode = str(now_played['episode'] if now_played['episode'] > -1
+                      else xbmc.getInfoLabel('VideoPlayer.Episode'))
+        episode = episode.zfill(2)
+        if not os.path.splitext(filename)[1].lower() in VIDEOFILE_EXTENSIONS:
+            filename = f'{showname}.{season}x{episode}.foo'
+        logger.debug('Using library metadata: %s - %sx%s', showname, season, episode)
+    return EpisodeData(showname, season, episode, filename)
+
+
+def get_search_query(episode_data):
+    """
+    Create a search query string for addic7ed.com
+
+    :param episode_data: :class:`EpisodeData` instance
+    :return: search query
+    """
+    showname = normalize_showname(episode_data.showname)
+    return f'{showname} {episode_data.season}x{episode_data.episode}'
+
+
+def get_search_queries(episode_data):
+    """
+    Create alternative search query strings for addic7ed.com
+
+    Addic7ed.com may list a show without a year that TheTVDB uses
+    to distinguish shows with the same name, so a query without the year
+    is the alternative.
+
+    :param episode_data: :class:`EpisodeData` instance
+    :return: the list of search queries in the order of preference
+    """
+    query = get_search_query(episode_data)
+    showname = normalize_showname(episode_data.showname)
+    base_showname = SHOW_YEAR_RE.sub('', showname)
+    if base_showname == showname or not base_showname:
+        return [query]
+    return [query, f'{base_showname} {episode_data.season}x{episode_data.episode}']
@@ -14,43 +14,115 @@
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 """Exception logger with extended diagnostic info"""
 
-import inspect
+import linecache
 import logging
+import reprlib
 import sys
+import traceback
 from contextlib import contextmanager
 from platform import uname
 from pprint import pformat
-from typing import Any, Dict, Callable, Generator, Iterable, Optional
+from types import FrameType
+from typing import Any, Dict, Callable, Generator, List, Optional, Tuple
 
 import xbmc
 
 logger = logging.getLogger(__name__)
 
+# Diagnostic info limits. Local variables may include whole webpages
+# and parsed HTML trees, so their representations are truncated
+# and the size of a stack trace is limited.
+MAX_VAR_REPR_LENGTH = 1000
+MAX_TRACE_SIZE = 64 * 1024
+MAX_FRAMES = 30
+CONTEXT_LINES = 5
 
-def _format_vars(variables: Dict[str, Any]) -> str:
+
+class _BoundedRepr(reprlib.Repr):  # pylint: disable=too-many-instance-attributes
+    """
+    Representation of objects with limited size
+
+    Objects that can be very large (strings, containers, HTML trees)
+    are truncated before they are formatted, so the cost of formatting
+    does not depend on the size of an object.
+    """
+    def __init__(self):
+        super().__init__()
+        self.maxlevel = 3
+        self.maxtuple = self.maxlist = self.maxarray = self.maxset = self.maxfrozenset = 20
+        self.maxdeque = 20
+        self.maxdict = 20
+        self.maxstring = MAX_VAR_REPR_LENGTH
+        self.maxlong = 100
+        self.maxother = MAX_VAR_REPR_LENGTH
+
+    def repr_instance(self, x: Any, level: int) -> str:
+        if isinstance(x, str):
+            return self.repr_str(x, level)
+        if isinstance(x, bytes):
+            return reprlib.Repr.repr_instance(self, x[:self.maxstring], level)
+        if isinstance(x, tuple) and hasattr(x, '_fields'):
+            if level <= 0:
+                return f'{type(x).__name__}(...)'
+            fields = ', '.join(f'{name}={self.repr1(value, level - 1)}'
+                               for name, value in zip(x._fields, x))
+            return f'{type(x).__name__}({fields})'
+        if type(x).__module__.split('.')[0] == 'bs4' and hasattr(x, 'contents'):
+            # BeautifulSoup objects are rendered as the whole HTML tree by repr()
+            return (f'<{type(x).__name__} {x.name!r} {self.repr1(x.attrs, level - 1)} '
+                    f'with {len(x.contents)} children>')
+        return super().repr_instance(x, level)
+
+
+_bounded_repr = _BoundedRepr()
+
+
+def _format_vars(variables: Dict[str, Any], max_size: int) -> str:
     """
     Format variables dictionary
 
     :param variables: variables dict
+    :param max_size: max size of the formatted string.
+        Variables that do not fit are omitted.
     :return: formatted string with sorted ``var = val`` pairs
     """
     var_list = [(var, val) for var, val in variables.items()
                 if not (var.startswith('__') or var.endswith('__'))]
     var_list.sort(key=lambda i: i[0])
     lines = []
-    for var, val in var_list:
-        lines.append(f'{var} = {pformat(val)}')
+    size = 0
+    for i, (var, val) in enumerate(var_list):
+        try:
+            val_repr = _bounded_repr.repr(val)
+        except Exception as exc:  # pylint: disable=broad-except
+            val_repr = f'<repr() failed: {exc!r}>'
+        if len(val_repr) > MAX_VAR_REPR_LENGTH:
+            val_repr = val_repr[:MAX_VAR_REPR_LENGTH] + '...'
+        line = f'{var} = {val_repr}'
+        size += len(line) + 1
+        if size > max_size:
+            lines.append(f'... {len(var_list) - i} more variables omitted')
+            break
+        lines.append(line)
     return '\n'.join(lines)
 
 
-def _format_code_context(frame_info: inspect.FrameInfo) -> str:
+def _format_code_context(file_path: str, lineno: int) -> str:
+    """
+    Format source lines around the current line of a frame
+
+    Source files are read only for frames that are formatted.
+    """
     context = ''
-    if frame_info.code_context is not None:
-        for i, line in enumerate(frame_info.code_context, frame_info.lineno - frame_info.index):
-            if i == frame_info.lineno:
-                context += f'{str(i).rjust(5)}:>{line}'
-            else:
-                context += f'{str(i).rjust(5)}: {line}'
+    first = max(1, lineno - CONTEXT_LINES // 2)
+    for i in range(first, first + CONTEXT_LINES):
+        line = linecache.getline(file_path, i)
+        if not line:
+            break
+        if i == lineno:
+            context += f'{str(i).rjust(5)}:>{line}'
+        else:
+            context += f'{str(i).rjust(5)}: {line}'
     return context
 
 
@@ -66,12 +138,13 @@ Local variables:
 """
 
 
-def _format_frame_info(frame_info: inspect.FrameInfo) -> str:
+def _format_frame_info(frame: FrameType, lineno: int, max_size: int) -> str:
+    file_path = frame.f_code.co_filename
     return FRAME_INFO_TEMPLATE.format(
-        file_path=frame_info.filename,
-        lineno=frame_info.lineno,
-        code_context=_format_code_context(frame_info),
-        local_vars=_format_vars(frame_info.frame.f_locals)
+        file_path=file_path,
+        lineno=lineno,
+        code_context=_format_code_context(file_path, lineno),
+        local_vars=_format_vars(frame.f_locals, max_size)
     )
 
 
@@ -84,11 +157,28 @@ STACK_TRACE_TEMPLATE = """
 """
 
 
-def _format_stack_trace(frames: Iterable[inspect.FrameInfo]) -> str:
-    stack_trace = ''
-    for frame_info in frames:
-        stack_trace += _format_frame_info(frame_info)
-    return STACK_TRACE_TEMPLATE.format(stack_trace=stack_trace)
+def _format_stack_trace(frames: List[Tuple[FrameType, int]]) -> str:
+    """
+    Format stack frames from the outermost to the innermost
+
+    The innermost frames are the most relevant, so they are formatted first,
+    and outer frames that exceed :data:`MAX_FRAMES` or :data:`MAX_TRACE_SIZE`
+    are omitted.
+
+    :param frames: the list of tuples (frame, line number)
+    """
+    frame_infos = []
+    size = 0
+    for frame, lineno in reversed(frames[-MAX_FRAMES:]):
+        if size >= MAX_TRACE_SIZE:
+            break
+        frame_info = _format_frame_info(frame, lineno, MAX_TRACE_SIZE - size)
+        frame_infos.append(frame_info)
+        size += len(frame_info)
+    omitted = len(frames) - len(frame_infos)
+    if omitted:
+        frame_infos.append(f'... {omitted} outer frames omitted\n' + '=' * 100 + '\n')
+    return STACK_TRACE_TEMPLATE.format(stack_trace=''.join(reversed(frame_infos)))
 
 
 EXCEPTION_TEMPLATE = """
@@ -124,8 +214,9 @@ def format_trace(frames_to_exclude: int = 1) -> str:
         to skip unnecessary info. Since each function call creates a stack frame
         you need to exclude at least this function frame.
     """
-    frames = inspect.stack(5)[frames_to_exclude:]
-    return _format_stack_trace(reversed(frames))
+    frames = list(traceback.walk_stack(sys._getframe(frames_to_exclude)))  # pylint: disable=protected-access
+    frames.reverse()
+    return _format_stack_trace(frames)
 
 
 def format_exception(exc_obj: Optional[Exception] = None) -> str:
@@ -139,11 +230,13 @@ def format_exception(exc_obj: Optional[Exception] = None) -> str:
         _, exc_obj, _ = sys.exc_info()
     if exc_obj is None:
         raise ValueError('No exception is currently being handled')
-    stack_trace = inspect.getinnerframes(exc_obj.__traceback__, context=5)
-    stack_trace_info = _format_stack_trace(stack_trace)
+    stack_trace_info = _format_stack_trace(list(traceback.walk_tb(exc_obj.__traceback__)))
+    exc_message = str(exc_obj)
+    if len(exc_message) > MAX_VAR_REPR_LENGTH:
+        exc_message = exc_message[:MAX_VAR_REPR_LENGTH] + '...'
     message = EXCEPTION_TEMPLATE.format(
         exc_type=exc_obj.__class__.__name__,
-        exc=exc_obj,
+        exc=exc_message,
         system_info=uname(),
         python_version=sys.version.replace('\n', ' '),
         kodi_version=xbmc.getInfoLabel('System.BuildVersion'),
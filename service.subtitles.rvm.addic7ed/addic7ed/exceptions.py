@@ -32,3 +32,7 @@ class Add7ConnectionError(Add7Exception):
 
 class NoSubtitlesReturned(Add7Exception):
     pass
+
+
+class DailyLimitExceeded(NoSubtitlesReturned):
+    pass
@@ -0,0 +1,182 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Matching subtitles versions to the release of the played video"""
+
+import re
+from collections import namedtuple
+from functools import lru_cache
+
+__all__ = [
+    'ReleaseInfo',
+    'ReleaseMatch',
+    'parse_release',
+    'index_version',
+    'match_release',
+    'rank_subs',
+]
+
+ReleaseInfo = namedtuple('ReleaseInfo',
+                         ['group', 'source', 'resolution', 'codec', 'editions'])
+VersionIndex = namedtuple('VersionIndex', ['tokens', 'tags'])
+ReleaseMatch = namedtuple('ReleaseMatch', ['score', 'synced'])
+
+# Spelling variants that are normalized before splitting text into tokens
+ALIASES = (
+    (re.compile(r'web[ ._-]?dl'), 'webdl'),
+    (re.compile(r'blu[ ._-]?ray'), 'bluray'),
+    (re.compile(r'[hx][ .]?26([45])'), r'h26\1'),
+    (re.compile(r'hevc'), 'h265'),
+)
+TOKEN_RE = re.compile(r'[a-z0-9]+')
+# A release group follows the last hyphen and may be followed
+# by a [tag] and a file extension
+GROUP_RE = re.compile(r'-([a-z0-9]+)(?:\[[^\]]*\])?(?:\.[a-z0-9]{2,4})?$')
+EPISODE_TOKEN_RE = re.compile(r's\d+e\d+|\d+x\d+')
+SYNC_RE = re.compile(r'[a-z0-9]*sync')
+SOURCES = {
+    'webdl': 'web', 'web': 'web', 'webrip': 'webrip',
+    'hdtv': 'hdtv', 'pdtv': 'hdtv', 'sdtv': 'hdtv',
+    'bluray': 'bluray', 'bdrip': 'bluray', 'brrip': 'bluray',
+    'dvdrip': 'dvd', 'dvd': 'dvd',
+}
+RESOLUTIONS = {
+    '2160p': '2160p', '4k': '2160p', '1080p': '1080p', '1080i': '1080p',
+    '720p': '720p', '576p': '576p', '480p': '480p',
+}
+CODECS = {'h264': 'h264', 'avc': 'h264', 'h265': 'h265', 'xvid': 'xvid', 'av1': 'av1'}
+EDITIONS = {'proper', 'repack', 'extended', 'internal', 'uncut', 'real'}
+# All release property tokens mapped to normalized values
+TAGS = {**SOURCES, **RESOLUTIONS, **CODECS, **{edition: edition for edition in EDITIONS}}
+# Score weights of matching release properties.
+# A release group match outweighs source, resolution and codec matches combined.
+GROUP_WEIGHT = 10
+SOURCE_WEIGHT = 4
+RESOLUTION_WEIGHT = 2
+CODEC_WEIGHT = 1
+EDITION_WEIGHT = 1
+
+
+def _normalize(text):
+    text = text.lower()
+    for pattern, replacement in ALIASES:
+        text = pattern.sub(replacement, text)
+    return text
+
+
+def _find_tag(tokens, tags):
+    for token in tokens:
+        tag = tags.get(token)
+        if tag is not None:
+            return tag
+    return ''
+
+
+@lru_cache(maxsize=32)
+def parse_release(filename):
+    """
+    Extract release properties from a video filename
+
+    Only the part of the filename after season/episode numbers is checked
+    for release properties, so that words in a show name are not mistaken
+    for them.
+
+    :param filename: the name of the played video file
+    :return: :class:`ReleaseInfo` instance with lowercase release group
+        and normalized source, resolution, codec and editions.
+        Missing properties are empty.
+    """
+    text = _normalize(filename)
+    group_match = GROUP_RE.search(text)
+    group = group_match.group(1) if group_match is not None else ''
+    tokens = TOKEN_RE.findall(text)
+    for i, token in enumerate(tokens):
+        if EPISODE_TOKEN_RE.fullmatch(token) is not None:
+            tokens = tokens[i + 1:]
+            break
+    return ReleaseInfo(
+        group=group,
+        source=_find_tag(tokens, SOURCES),
+        resolution=_find_tag(tokens, RESOLUTIONS),
+        codec=_find_tag(tokens, CODECS),
+        editions=frozenset(token for token in tokens if token in EDITIONS)
+    )
+
+
+def index_version(version):
+    """
+    Index a subtitles version description
+
+    A version description includes "works with" text, e.g.
+    "KILLERS, Works with WEB-DL and 720p". Releases that subs have been
+    re-synced from ("Resync from ION10") are not compatible with the subs,
+    so everything after a "sync" word is ignored.
+
+    :param version: subtitles version description
+    :return: :class:`VersionIndex` with the set of tokens
+        and the set of normalized release properties
+    """
+    text = _normalize(version)
+    sync_match = SYNC_RE.search(text)
+    if sync_match is not None:
+        text = text[:sync_match.start()]
+    tokens = TOKEN_RE.findall(text)
+    tags = frozenset(TAGS[token] for token in tokens if token in TAGS)
+    return VersionIndex(frozenset(tokens), tags)
+
+
+def match_release(release, index):
+    """
+    Score how well subtitles version matches a release
+
+    :param release: :class:`ReleaseInfo` of the played video
+    :param index: :class:`VersionIndex` of subtitles version
+    :return: :class:`ReleaseMatch` where ``synced`` is ``True``
+        if subs are made for the release group
+    """
+    synced = bool(release.group) and release.group in index.tokens
+    score = GROUP_WEIGHT if synced else 0
+    if release.source and release.source in index.tags:
+        score += SOURCE_WEIGHT
+    if release.resolution and release.resolution in index.tags:
+        score += RESOLUTION_WEIGHT
+    if release.codec and release.codec in index.tags:
+        score += CODEC_WEIGHT
+    score += EDITION_WEIGHT * len(release.editions & index.tags)
+    return ReleaseMatch(score, synced)
+
+
+def rank_subs(subs_list, filename):
+    """
+    Rank subtitles by how well they match the played video
+
+    The filename is parsed once and each distinct version description
+    is indexed and scored once, so the cost is linear in the number of subs.
+
+    :param subs_list: the list or generator of :class:`parser.SubsItem`
+    :param filename: the name of the played video file
+    :return: the list of tuples (subs item, :class:`ReleaseMatch`)
+        sorted by match score from the best to the worst. Subs with equal
+        scores keep their order.
+    """
+    release = parse_release(filename)
+    matches = {}
+    ranked = []
+    for item in subs_list:
+        match = matches.get(item.version)
+        if match is None:
+            match = matches[item.version] = match_release(release, index_version(item.version))
+        ranked.append((item, match))
+    ranked.sort(key=lambda i: i[1].score, reverse=True)
+    return ranked
@@ -0,0 +1,199 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Per-invocation timing and counters instrumentation
+
+Phases of an addon invocation (JSON-RPC calls, HTTP requests, HTML parsing,
+subs listing) are timed with :func:`timer` or :func:`timed`, and events
+(cache hits, bytes received, parsed items) are counted with :func:`increment`.
+:func:`invocation` collects them into a summary that is written to the log
+and appended to a rolling JSON-lines file in the addon profile.
+See scripts/metrics_report.py for latency percentiles.
+
+Metrics are kept per invocation in a context variable, so invocations
+that run concurrently in the service process (pre-searches and plugin calls
+forwarded to the worker) do not mix their metrics. Functions that are run
+in thread pools on behalf of an invocation must be wrapped with
+:func:`propagate`. Metrics outside an invocation are not collected.
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+
+from addic7ed.addon import ADDON_VERSION, PROFILE
+
+__all__ = ['timer', 'timed', 'increment', 'invocation', 'propagate', 'get_summary']
+
+logger = logging.getLogger(__name__)
+
+METRICS_PATH = PROFILE / 'metrics.jsonl'
+# The metrics file is rotated to metrics.jsonl.1 when it exceeds this size
+MAX_METRICS_FILE_SIZE = 512 * 1024
+
+
+class _Metrics:
+    """Thread-safe accumulator of phase timings and counters of an invocation"""
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.phases = {}
+        self.counters = {}
+
+    def add_time(self, phase, duration):
+        with self._lock:
+            count, total = self.phases.get(phase, (0, 0.0))
+            self.phases[phase] = (count + 1, total + duration)
+
+    def increment(self, counter, value):
+        with self._lock:
+            self.counters[counter] = self.counters.get(counter, 0) + value
+
+    def snapshot(self):
+        """Get copies of phase timings and counters"""
+        with self._lock:
+            return dict(self.phases), dict(self.counters)
+
+
+_current_metrics = ContextVar('current_metrics', default=None)
+
+
+@contextmanager
+def timer(phase):
+    """
+    Time a phase of the current invocation
+
+    Phases can be nested and timed from multiple threads. Each phase
+    accumulates the number of calls and the total time.
+
+    :param phase: phase name
+    """
+    metrics = _current_metrics.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if metrics is not None:
+            metrics.add_time(phase, time.perf_counter() - start)
+
+
+def timed(phase):
+    """
+    Decorator that times calls of a function as a phase
+
+    :param phase: phase name
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            with timer(phase):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def increment(counter, value=1):
+    """
+    Increment a counter of the current invocation
+
+    :param counter: counter name
+    :param value: increment value
+    """
+    metrics = _current_metrics.get()
+    if metrics is not None:
+        metrics.increment(counter, value)
+
+
+def propagate(func):
+    """
+    Bind a function to the metrics of the current invocation
+
+    Threads do not inherit the invocation context, so functions
+    that are submitted to thread pools must be wrapped.
+
+    :param func: a function to be run in another thread
+    :return: wrapped function
+    """
+    metrics = _current_metrics.get()
+
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        token = _current_metrics.set(metrics)
+        try:
+            return func(*args, **kwargs)
+        finally:
+            _current_metrics.reset(token)
+    return wrapper
+
+
+def get_summary(action, duration):
+    """
+    Get the summary of the current invocation
+
+    :param action: invocation action
+    :param duration: invocation duration in seconds
+    :return: JSON-serializable dict
+    """
+    metrics = _current_metrics.get() or _Metrics()
+    phases, counters = metrics.snapshot()
+    return {
+        'time': round(time.time(), 3),
+        'version': ADDON_VERSION,
+        'action': action,
+        'total_ms': round(duration * 1000, 2),
+        'phases': {
+            phase: {'count': count, 'total_ms': round(total * 1000, 2)}
+            for phase, (count, total) in sorted(phases.items())
+        },
+        'counters': dict(sorted(counters.items())),
+    }
+
+
+def _write_summary(summary):
+    """Append a summary to the metrics file rotating it if it is too big"""
+    try:
+        if not PROFILE.exists():
+            PROFILE.mkdir(parents=True)
+        if METRICS_PATH.exists() and METRICS_PATH.stat().st_size > MAX_METRICS_FILE_SIZE:
+            os.replace(METRICS_PATH, METRICS_PATH.with_name(METRICS_PATH.name + '.1'))
+        with METRICS_PATH.open('a', encoding='utf-8') as fo:
+            fo.write(json.dumps(summary, separators=(',', ':')) + '\n')
+    except OSError:
+        logger.exception('Unable to write metrics to %s', METRICS_PATH)
+
+
+@contextmanager
+def invocation(action):
+    """
+    Collect metrics of an addon invocation, e.g. a plugin call
+
+    When the invocation is finished, its summary is written to the log
+    and to the metrics file.
+
+    :param action: invocation action, e.g. 'search'
+    """
+    token = _current_metrics.set(_Metrics())
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        summary = get_summary(action, time.perf_counter() - start)
+        _current_metrics.reset(token)
+        logger.info('Invocation metrics: %s', json.dumps(summary))
+        _write_summary(summary)
@@ -13,28 +13,52 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import logging
 import re
+import time
 from collections import namedtuple
+from functools import lru_cache, wraps
+from urllib.parse import unquote, urljoin, urlsplit
 
-from bs4 import BeautifulSoup
+from bs4 import BeautifulSoup, SoupStrainer
+from bs4.builder import builder_registry
 
-from addic7ed.exceptions import SubsSearchError, ParseError
+from addic7ed import metrics
+from addic7ed.cache import ResultsCache
+from addic7ed.catalog import ShowCatalog
+from addic7ed.exceptions import Add7ConnectionError, SubsSearchError, ParseError
 from addic7ed.webclient import Session
 
 __all__ = [
     'search_episode',
+    'search_any',
     'get_episode',
+    'get_season',
+    'cache_season',
     'parse_filename',
+    'parse_filenames',
     'normalize_showname',
     'get_languages',
+    'get_listing',
+    'store_listing',
+    'get_versions',
+    'revalidate_episode',
 ]
 
+logger = logging.getLogger(__name__)
+
 session = Session()
+results_cache = ResultsCache()
 
-SubsSearchResult = namedtuple('SubsSearchResult', ['subtitles', 'episode_url'])
+SubsSearchResult = namedtuple('SubsSearchResult', ['subtitles', 'episode_url', 'season_link'],
+                              defaults=(None,))
 EpisodeItem = namedtuple('EpisodeItem', ['title', 'link'])
 SubsItem = namedtuple('SubsItem', ['language', 'version', 'link', 'hi', 'unfinished'])
 LanguageData = namedtuple('LanguageData', ['kodi_lang', 'add7_lang'])
+FilenameInfo = namedtuple('FilenameInfo', ['showname', 'season', 'episodes'])
+SeasonSubsItem = namedtuple('SeasonSubsItem', ['episode', 'episode_link', 'subs'])
+# from_episode_page is False if the results may have been built from a season listing
+StoredListing = namedtuple('StoredListing', ['results', 'from_episode_page'])
 
 serie_re = re.compile(r'^serie')
 version_re = re.compile(r'Version (.*?),')
@@ -42,12 +66,30 @@ original_download_re = re.compile(r'^/original')
 updated_download_re = re.compile(r'^/updated')
 jointranslation_re = re.compile('^/jointranslation')
 spanish_re = re.compile(r'Spanish \(.*?\)')
+season_link_re = re.compile(r'href="(/season/\d+/\d+)"')
+season_re = re.compile(r'^/season/(\d+)/(\d+)$')
+episode_query_re = re.compile(r'^(?P<showname>.+) (?P<season>\d+)x(?P<episode>\d+)$')
 
+# Filename patterns in the order of preference. They are applied to filenames
+# with spaces replaced by dots.
 episode_patterns = (
-    re.compile(r'^(.*?)[ \.](?:\d*?[ \.])?s(\d+)[ \.]?e(\d+)\.', re.I | re.U),
-    re.compile(r'^(.*?)[ \.](?:\d*?[ \.])?(\d+)x(\d+)\.', re.I | re.U),
-    re.compile(r'^(.*?)[ \.](?:\d*?[ \.])?(\d{1,2}?)[ \.]?(\d{2})\.', re.I | re.U),
+    # Show.Name.S01E01, multi-episode Show.Name.S01E01E02, Show.Name.S01E01-E03
+    re.compile(r'^(?P<showname>.*?)[ \.](?:\d*?[ \.])?s(?P<season>\d+)[ \.]?e(?P<episode>\d+)'
+               r'(?P<more>(?:-?e\d+|-\d+)*)\.', re.I | re.U),
+    # Show.Name.1x01, multi-episode Show.Name.1x01-1x02
+    re.compile(r'^(?P<showname>.*?)[ \.](?:\d*?[ \.])?(?P<season>\d+)x(?P<episode>\d+)'
+               r'(?P<more>(?:-\d+x\d+|-\d+)*)\.', re.I | re.U),
+    # Absolute numbering: [Group] Show Name - 123 [1080p], Show.Name.E123
+    re.compile(r'^(?:\[[^\]]*\]\.?)?(?P<showname>.+?)\.(?:-\.(?:ep?)?|ep?)(?P<episode>\d{2,4})'
+               r'(?:v\d)?\.', re.I | re.U),
+    # Show.Name.101
+    re.compile(r'^(?P<showname>.*?)[ \.](?:\d*?[ \.])?(?P<season>\d{1,2}?)[ \.]?'
+               r'(?P<episode>\d{2})\.', re.I | re.U),
 )
+more_episodes_re = re.compile(r'(-)?(?:\d+x|e)?(\d+)', re.I)
+# Max number of episodes in a hyphen range, e.g. "E01-E03". Longer ranges
+# are usually not episode ranges, e.g. "S01E01-2019" has a year.
+MAX_EPISODE_RANGE = 10
 # Convert show names from TheTVDB format to Addic7ed.com format
 # Keys must be all lowercase
 NAME_CONVERSIONS = {
@@ -55,8 +97,237 @@ NAME_CONVERSIONS = {
     'law & order: special victims unit': 'Law and order SVU',
     'bodyguard (2018)': 'bodyguard',
 }
+# BeautifulSoup tree builders in the order of preference.
+# html5lib is the slowest but the most lenient one, so it is the last resort.
+# html.parser is not used because it does not handle omitted end tags
+# the same way as browsers do.
+HTML_PARSERS = ('lxml', 'html5lib')
+AVAILABLE_HTML_PARSERS = tuple(
+    name for name in HTML_PARSERS if builder_registry.lookup(name) is not None
+)
+# Only search results and subtitles tables are needed from addic7ed.com pages
+TABLES_STRAINER = SoupStrainer('table', class_=['tabel95', 'tabel'])
+SEARCH_TABLE_ATTRS = {'class': 'tabel', 'align': 'center', 'width': '80%', 'border': '0'}
+SUBS_TABLE_ATTRS = {'width': '100%', 'border': '0', 'align': 'center', 'class': 'tabel95'}
+# Season listing rows: season, episode, title, language, version, completed, HI,
+# corrected, HD and download cells
+SEASON_ROWS_STRAINER = SoupStrainer('tr')
+SEASON_ROW_CELLS = 10
+# Cache time-to-live for search results, episode pages and failed searches
+SEARCH_CACHE_TTL = 12 * 60 * 60
+EPISODE_CACHE_TTL = 6 * 60 * 60
+NOT_FOUND_CACHE_TTL = 60 * 60
+# Stored listings are kept for the max listing age that can be selected in the settings
+LISTING_TTL = 30 * 24 * 60 * 60
+# Max number of episode pages that are fetched concurrently for multiple search results
+MAX_PREFETCHED_EPISODES = 5
+
+
+def make_cache_key(kind, value, languages):
+    """
+    Create a results cache key
+
+    :param kind: key kind, e.g. 'search' or 'episode'
+    :param value: a search query or an episode link
+    :param languages: the list of languages to search
+    :return: cache key
+    """
+    value = ' '.join(value.lower().split())
+    langs = ','.join(language.kodi_lang for language in languages)
+    return f'{kind}|{value}|{langs}'
+
+
+def _serialize_results(results):
+    if isinstance(results, list):
+        return {'episodes': [list(item) for item in results]}
+    return {
+        'subtitles': [list(item) for item in results.subtitles],
+        'episode_url': results.episode_url,
+        'season_link': results.season_link,
+    }
+
+
+def _deserialize_results(cached):
+    """
+    Restore search results from a cached value
+
+    :param cached: cached value
+    :return: the list of :class:`EpisodeItem` or :class:`SubsSearchResult`
+    :raises SubsSearchError: if a failed search has been cached
+    """
+    if cached.get('not_found'):
+        raise SubsSearchError
+    if 'episodes' in cached:
+        return [EpisodeItem(*item) for item in cached['episodes']]
+    return SubsSearchResult([SubsItem(*item) for item in cached['subtitles']],
+                            cached['episode_url'], cached.get('season_link'))
+
+
+def _cached(kind, ttl):
+    """
+    Cache search results of a decorated function in :data:`results_cache`
+
+    The decorated function must accept a search query or an episode link
+    and the list of languages. Successful results are cached for ``ttl`` seconds,
+    :class:`SubsSearchError` is cached for :data:`NOT_FOUND_CACHE_TTL`.
+
+    :param kind: cache key kind
+    :param ttl: cache time-to-live for successful results
+    """
+    def decorator(func):
+        @wraps(func)
+        def wrapper(value, languages=None):
+            if languages is None:
+                languages = [LanguageData('English', 'English')]
+            key = make_cache_key(kind, value, languages)
+            cached = get_cached_results(key)
+            if cached is not None:
+                return cached
+            try:
+                results = func(value, languages)
+            except SubsSearchError:
+                store_not_found(key)
+                raise
+            store_results(key, results, ttl)
+            return results
+        return wrapper
+    return decorator
+
+
+def get_cached_results(key):
+    """
+    Get search results from :data:`results_cache`
+
+    :param key: cache key
+    :return: the list of :class:`EpisodeItem`, :class:`SubsSearchResult`
+        or ``None`` if results are not cached
+    :raises SubsSearchError: if a failed search has been cached
+    """
+    cached = results_cache.get(key)
+    if cached is None:
+        metrics.increment('results_cache_misses')
+        return None
+    metrics.increment('results_cache_hits')
+    return _deserialize_results(cached)
+
+
+def store_results(key, results, ttl):
+    """
+    Store search results in :data:`results_cache`
+
+    :param key: cache key
+    :param results: the list of :class:`EpisodeItem` or :class:`SubsSearchResult`
+    :param ttl: cache time-to-live
+    """
+    results_cache.set(key, _serialize_results(results), ttl)
+
+
+def store_not_found(key):
+    """
+    Store a failed search in :data:`results_cache`
+
+    :param key: cache key
+    """
+    results_cache.set(key, {'not_found': True}, NOT_FOUND_CACHE_TTL)
+
+
+def get_listing(query, languages, max_age):
+    """
+    Get the stored listing of subs for an episode
+
+    :param query: the preferred search query for the episode
+    :param languages: the list of languages to search
+    :param max_age: the max age of the listing in seconds
+    :return: :class:`StoredListing` or ``None`` if no listing is stored
+        or it is older than ``max_age``
+    """
+    stored = results_cache.get(make_cache_key('listing', query, languages))
+    if stored is None or time.time() - stored['time'] > max_age:
+        return None
+    return StoredListing(_deserialize_results(stored['results']),
+                         stored.get('from_episode_page', False))
+
+
+def store_listing(query, languages, results, from_episode_page=False):
+    """
+    Store the listing of subs for an episode
+
+    Unlike search results, stored listings are displayed
+    when they are older than the results cache TTL.
+
+    :param query: the preferred search query for the episode
+    :param languages: the list of languages to search
+    :param results: :class:`SubsSearchResult` instance
+    :param from_episode_page: ``True`` if the results have been parsed
+        from the episode page, e.g. by :func:`revalidate_episode`.
+        Search results may be built from a season listing that has less
+        info about subs, so they cannot be compared with episode page results.
+    """
+    results_cache.set(make_cache_key('listing', query, languages),
+                      {'time': time.time(), 'results': _serialize_results(results),
+                       'from_episode_page': from_episode_page},
+                      LISTING_TTL)
+
+
+def get_versions(results):
+    """
+    Get the set of displayable subs versions for comparing listings
+
+    :param results: :class:`SubsSearchResult` instance
+    :return: the set of tuples (language, version, HI flag, download link)
+    """
+    return {(item.language, item.version, item.hi, item.link)
+            for item in results.subtitles if not item.unfinished}
+
+
+def make_soup(webpage, html_parser=None, strainer=TABLES_STRAINER):
+    """
+    Parse a webpage with the fastest available HTML parser
+
+    By default the resulting tree contains only tables with search results
+    and subtitles. html5lib does not support partial parsing, so only the part
+    of the page from the 1st opening to the last closing table tag is fed to it.
+
+    :param webpage: webpage content
+    :param html_parser: the name of BeautifulSoup tree builder to use
+    :param strainer: :class:`SoupStrainer` for the parts of the page to parse
+    :return: BeautifulSoup tree
+    """
+    html_parser = html_parser or AVAILABLE_HTML_PARSERS[0]
+    if html_parser == 'html5lib':
+        start = webpage.find('<table')
+        end = webpage.rfind('</table>')
+        if start != -1 and end != -1:
+            webpage = webpage[start:end + len('</table>')]
+        return BeautifulSoup(webpage, html_parser)
+    return BeautifulSoup(webpage, html_parser, parse_only=strainer)
+
+
+@metrics.timed('parse')
+def find_tables(webpage):
+    """
+    Find search results or subtitles tables in a webpage
+
+    If the fastest HTML parser cannot find any tables, e.g. because of broken
+    markup, the page is re-parsed with the next available parsers.
+
+    :param webpage: webpage content
+    :return: a tuple of a search results table (or ``None``)
+        and the list of subtitles tables
+    """
+    for html_parser in AVAILABLE_HTML_PARSERS:
+        soup = make_soup(webpage, html_parser)
+        table = soup.find('table', SEARCH_TABLE_ATTRS)
+        if table is not None:
+            return table, []
+        sub_cells = soup.find_all('table', SUBS_TABLE_ATTRS)
+        if sub_cells:
+            return None, sub_cells
+        logger.debug('No tables found with "%s" HTML parser', html_parser)
+    return None, []
 
 
+@_cached('search', SEARCH_CACHE_TTL)
 def search_episode(query, languages=None):
     """
     Search episode function. Accepts a TV show name, a season #, an episode #
@@ -67,6 +338,11 @@ def search_episode(query, languages=None):
     If search returns only 1 match, addic7ed.com redirects to the found episode
     page. In this case the function returns the list of available subs
     and an episode page URL.
+    Queries in "show name 01x01" format are resolved via the show catalog
+    directly to episode pages, so the search page is loaded only if
+    the show is not found in the catalog.
+    Parsed results are cached in a persistent cache, so repeated searches
+    do not access addic7ed.com.
 
     :param query: subs search query
     :param languages: the list of languages to search
@@ -77,50 +353,466 @@ def search_episode(query, languages=None):
     """
     if languages is None:
         languages = [LanguageData('English', 'English')]
-    webpage = session.load_page('/search.php',
-                                params={'search': query, 'Submit': 'Search'})
-    soup = BeautifulSoup(webpage, 'html5lib')
-    table = soup.find('table',
-                      {'class': 'tabel', 'align': 'center', 'width': '80%',
-                       'border': '0'}
-                      )
+    link = get_catalog_link(query)
+    if link is not None:
+        webpage = session.load_page('/' + link)
+        results = parse_episode_page(webpage, session.last_url, languages)
+        if results is not None:
+            return results
+        logger.debug('No subs on the episode page %s', link)
+    webpage = session.load_page('/search.php', params=get_search_params(query))
+    return parse_search_page(webpage, session.last_url, languages)
+
+
+def search_any(queries, languages=None):
+    """
+    Search alternative queries for an episode one by one
+
+    :param queries: search queries in the order of preference
+    :param languages: the list of languages to search
+    :return: a tuple (query, search results) for the 1st query with results.
+        See :func:`search_episode` for search results.
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if no query has results
+    """
+    for query in queries[:-1]:
+        try:
+            return query, search_episode(query, languages)
+        except SubsSearchError:
+            logger.debug('No results for "%s", trying the next query', query)
+    return queries[-1], search_episode(queries[-1], languages)
+
+
+def get_catalog_link(query):
+    """
+    Get an episode page link for a search query via the show catalog
+
+    :param query: subs search query
+    :return: episode page link or ``None`` if the query is not
+        in "show name 01x01" format or the show is not found in the catalog
+    """
+    match = episode_query_re.match(query)
+    if match is None:
+        return None
+    return ShowCatalog().get_episode_link(match.group('showname'), match.group('season'),
+                                          match.group('episode'))
+
+
+def get_search_params(query):
+    """
+    Get URL query params of the search page
+
+    :param query: subs search query
+    :return: the dict of params
+    """
+    return {'search': query, 'Submit': 'Search'}
+
+
+def parse_search_page(webpage, page_url, languages):
+    """
+    Parse a search page
+
+    :param webpage: search page content
+    :param page_url: the final URL of the page. The site redirects
+        to the episode page if a single episode is found.
+    :param languages: the list of languages to search
+    :return: the list of :class:`EpisodeItem` for multiple matches
+        or :class:`SubsSearchResult` for a single match
+    :raises SubsSearchError: if the page has no results
+    """
+    table, sub_cells = find_tables(webpage)
     if table is not None:
         results = list(parse_search_results(table))
         if results:
             return results
-    else:
-        sub_cells = soup.find_all(
-            'table',
-            {'width': '100%', 'border': '0',
-             'align': 'center', 'class': 'tabel95'}
-        )
-        if sub_cells:
-            return SubsSearchResult(
-                parse_episode(sub_cells, languages), session.last_url
-            )
+    elif sub_cells:
+        return SubsSearchResult(_parse_subs(sub_cells, languages), page_url,
+                                find_season_link(webpage))
     raise SubsSearchError
 
 
+def parse_episode_page(webpage, page_url, languages):
+    """
+    Parse an episode page
+
+    :param webpage: episode page content
+    :param page_url: the final URL of the page
+    :param languages: the list of languages to search
+    :return: :class:`SubsSearchResult` or ``None`` if the page has no subs
+    """
+    _, sub_cells = find_tables(webpage)
+    if not sub_cells:
+        return None
+    return SubsSearchResult(_parse_subs(sub_cells, languages), page_url,
+                            find_season_link(webpage))
+
+
 def parse_search_results(table):
     a_tags = table.find_all('a', href=serie_re)
     for tag in a_tags:
         yield EpisodeItem(tag.text, tag['href'])
 
 
+@_cached('episode', EPISODE_CACHE_TTL)
 def get_episode(link, languages=None):
     if languages is None:
         languages = [LanguageData('English', 'English')]
     webpage = session.load_page('/' + link)
-    soup = BeautifulSoup(webpage, 'html5lib')
-    sub_cells = soup.find_all(
-        'table',
-        {'width': '100%', 'border': '0', 'align': 'center', 'class': 'tabel95'}
-    )
-    if not sub_cells:
+    results = parse_episode_page(webpage, session.last_url, languages)
+    if results is None:
+        raise SubsSearchError
+    return results
+
+
+def revalidate_episode(episode_url, languages):
+    """
+    Get subs from an episode page bypassing the results cache
+
+    The page is requested conditionally if it has been loaded before,
+    so an unchanged page is not downloaded again. The results cache entry
+    for the episode is refreshed.
+
+    :param episode_url: the URL of the episode page
+    :param languages: the list of languages to search
+    :return: :class:`SubsSearchResult` instance
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    :raises SubsSearchError: if the episode has no subs
+    """
+    # Episode links in the cache keys of get_episode are not URL-escaped,
+    # but the page URL may be escaped after a redirect
+    link = unquote(urlsplit(episode_url).path).lstrip('/')
+    key = make_cache_key('episode', link, languages)
+    webpage = session.load_page('/' + link)
+    results = parse_episode_page(webpage, session.last_url, languages)
+    if results is None:
+        store_not_found(key)
         raise SubsSearchError
-    return SubsSearchResult(
-        parse_episode(sub_cells, languages), session.last_url
-    )
+    store_results(key, results, EPISODE_CACHE_TTL)
+    return results
+
+
+def find_season_link(webpage):
+    """
+    Find the link to the season listing of a show on an episode page
+
+    :param webpage: episode page content
+    :return: season link, e.g. "/season/1102/12", or ``None``
+    """
+    match = season_link_re.search(webpage)
+    return match.group(1) if match is not None else None
+
+
+def parse_season(rows, languages):
+    """
+    Parse the season listing of a show
+
+    Each row of the listing is a subtitles file for an episode
+    of the season, so all episodes are parsed in a single pass.
+
+    :param rows: listing table rows
+    :param languages: the list of languages to search
+    :return: generator function that yields :class:`SeasonSubsItem` items
+        where ``subs`` is :class:`SubsItem`
+    """
+    languages_map = LanguagesMap(languages)
+    for row in rows:
+        cells = list(_iter_child_tags(row, 'td'))
+        if len(cells) < SEASON_ROW_CELLS or not cells[1].text.isdigit():
+            continue
+        language = languages_map[cells[3].text]
+        if language is None:
+            continue
+        episode_tag = cells[2].find('a', href=True)
+        link = None
+        for tag in cells[9].find_all('a', href=True):
+            if updated_download_re.search(tag['href']) is not None:
+                link = tag['href']
+                break
+            if link is None and original_download_re.search(tag['href']) is not None:
+                link = tag['href']
+        if episode_tag is None or link is None:
+            continue
+        yield SeasonSubsItem(
+            episode=int(cells[1].text),
+            episode_link=episode_tag['href'],
+            subs=SubsItem(
+                language=language.kodi_lang,
+                version=cells[4].get_text(strip=True),
+                link=link,
+                hi=bool(cells[6].get_text(strip=True)),
+                unfinished=cells[5].get_text(strip=True) != 'Completed'
+            )
+        )
+
+
+def get_season(season_link, languages=None):
+    """
+    Get subs for all episodes of a show season with a single request
+
+    Subs versions in the season listing include only release names
+    without "works with" descriptions.
+
+    :param season_link: season link from an episode page, e.g. "/season/1102/12"
+    :param languages: the list of languages to search
+    :return: the dict of episode numbers to :class:`SubsSearchResult`.
+        Episodes without any subs are not included.
+    :raises Add7ConnectionError: if addic7ed.com cannot be opened
+    """
+    if languages is None:
+        languages = [LanguageData('English', 'English')]
+    webpage = session.load_page('/ajax_loadShow.php', params=get_season_params(season_link))
+    return parse_season_page(webpage, session.last_url, season_link, languages)
+
+
+def get_season_params(season_link):
+    """
+    Get URL query params of the season listing
+
+    :param season_link: season link, e.g. "/season/1102/12"
+    :return: the dict of params
+    """
+    show_id, season = season_re.match(season_link).groups()
+    return {'show': show_id, 'season': season, 'langs': '', 'hd': 'undefined',
+            'hi': 'undefined'}
+
+
+def parse_season_page(webpage, season_url, season_link, languages):
+    """
+    Parse the season listing
+
+    :param webpage: season listing content
+    :param season_url: the final URL of the listing
+    :param season_link: season link
+    :param languages: the list of languages to search
+    :return: the dict of episode numbers to :class:`SubsSearchResult`
+    """
+    episodes = {}
+    with metrics.timer('parse'):
+        soup = make_soup(webpage, strainer=SEASON_ROWS_STRAINER)
+        items = list(parse_season(soup.find_all('tr'), languages))
+    metrics.increment('subs_parsed', len(items))
+    for item in items:
+        result = episodes.get(item.episode)
+        if result is None:
+            result = episodes[item.episode] = SubsSearchResult(
+                [], urljoin(season_url, item.episode_link), season_link)
+        result.subtitles.append(item.subs)
+    return episodes
+
+
+def cache_season(query, results, languages=None):
+    """
+    Cache subs for the other episodes of the season of a found episode
+
+    Subs for the whole season are fetched with a single request
+    and stored in the results cache as search results for each episode,
+    so that searches for the next episodes of the season, e.g. when
+    watching it back-to-back, do not access addic7ed.com. Cached search
+    results are not replaced because episode pages have more detailed
+    subs versions than the season listing. Errors are only logged
+    because subs for the found episode are already available.
+
+    :param query: the search query of the found episode, e.g. "show name 01x01"
+    :param results: :class:`SubsSearchResult` for the found episode
+    :param languages: the list of languages to search
+    """
+    if languages is None:
+        languages = [LanguageData('English', 'English')]
+    if not is_season_cacheable(query, results, languages):
+        return
+    try:
+        episodes = get_season(results.season_link, languages)
+    except Add7ConnectionError:
+        logger.error('Unable to get season listing %s', results.season_link)
+        return
+    store_season(query, results.season_link, episodes, languages)
+
+
+def is_season_cacheable(query, results, languages):
+    """
+    Check if the season of a found episode needs to be cached
+
+    :param query: the search query of the found episode
+    :param results: :class:`SubsSearchResult` for the found episode
+    :param languages: the list of languages to search
+    :return: ``False`` if the query is not in "show name 01x01" format,
+        the episode page has no season link or the season is already cached
+    """
+    if episode_query_re.match(query) is None or results.season_link is None:
+        return False
+    season_key = make_cache_key('season', results.season_link, languages)
+    return results_cache.get(season_key) is None
+
+
+def store_season(query, season_link, episodes, languages):
+    """
+    Store subs for episodes of a season as search results
+
+    :param query: the search query of the found episode
+    :param season_link: season link
+    :param episodes: the dict of episode numbers to :class:`SubsSearchResult`
+    :param languages: the list of languages to search
+    """
+    match = episode_query_re.match(query)
+    season_key = make_cache_key('season', season_link, languages)
+    cached = 0
+    for episode, episode_results in episodes.items():
+        key = make_cache_key(
+            'search', f'{match.group("showname")} {match.group("season")}x{episode:02d}',
+            languages
+        )
+        if results_cache.get(key) is None:
+            results_cache.set(key, _serialize_results(episode_results), EPISODE_CACHE_TTL)
+            cached += 1
+    results_cache.set(season_key, len(episodes),
+                      EPISODE_CACHE_TTL if episodes else NOT_FOUND_CACHE_TTL)
+    logger.debug('Cached subs for %s episodes from season listing %s',
+                 cached, season_link)
+
+
+def prefetch_episodes(executor, episodes, languages=None):
+    """
+    Start fetching pages for multiple found episodes concurrently
+
+    Only the first :data:`MAX_PREFETCHED_EPISODES` episodes are fetched.
+    Fetched results are also stored in the results cache.
+
+    :param executor: :class:`concurrent.futures.Executor` instance
+    :param episodes: the list of :class:`EpisodeItem`
+    :param languages: the list of languages to search
+    :return: the list of futures for :func:`get_episode` results
+        for each episode or ``None`` for episodes that are not fetched
+    """
+    fetch = metrics.propagate(get_episode)
+    futures = [executor.submit(fetch, item.link, languages)
+               for item in episodes[:MAX_PREFETCHED_EPISODES]]
+    futures.extend([None] * (len(episodes) - len(futures)))
+    return futures
+
+
+class LanguagesMap(dict):
+    """
+    Maps language names from addic7ed.com pages to requested languages
+
+    A language cell matches the 1st requested language whose addic7ed.com name
+    is a part of the cell text, e.g. "Spanish" matches both "Spanish (Spain)"
+    and "Spanish (Latin America)". Requested language names are mapped
+    beforehand, other cell texts are matched on the first lookup,
+    so matching a language cell is a dictionary lookup.
+    Not requested languages are mapped to ``None``.
+
+    :param languages: the list of languages to search
+    """
+    def __init__(self, languages):
+        super().__init__()
+        self._languages = languages
+        for language in languages:
+            if language.add7_lang not in self:
+                self[language.add7_lang] = self._match(language.add7_lang)
+
+    def _match(self, text):
+        for language in self._languages:
+            if language.add7_lang in text:
+                return language
+        return None
+
+    def __missing__(self, text):
+        match = self[text] = self._match(text)
+        return match
+
+
+def _iter_child_tags(tag, name):
+    """
+    Iterate child tags with the given name
+
+    Table rows are also looked up in <tbody> that html5lib inserts into tables.
+    It is much faster than BeautifulSoup search methods for direct children.
+    """
+    for child in tag.children:
+        if child.name == name:
+            yield child
+        elif child.name == 'tbody' and name == 'tr':
+            yield from _iter_child_tags(child, name)
+
+
+def _get_download_link(cell):
+    """
+    Get "most updated" subs link if available, else "original" subs link
+
+    :param cell: download cell
+    :return: subs link or ``None``
+    """
+    link = None
+    for tag in cell.descendants:
+        if tag.name != 'a' or 'face-button' not in (tag.get('class') or ()):
+            continue
+        href = tag.get('href', '')
+        if updated_download_re.search(href) is not None:
+            return href
+        if link is None and original_download_re.search(href) is not None:
+            link = href
+    return link
+
+
+def _get_subs_flags(info_row):
+    """
+    Get subs flags from an info row that follows a download row
+
+    :return: a tuple (hearing impaired, unfinished)
+    """
+    hi = unfinished = False
+    for tag in info_row.descendants:
+        if tag.name == 'img' and tag.get('title') == 'Hearing Impaired':
+            hi = True
+        elif tag.name == 'a' and jointranslation_re.search(tag.get('href', '')) is not None:
+            unfinished = True
+    return hi, unfinished
+
+
+def _parse_download_row(cells, languages_map):
+    """
+    Parse a row with a language cell followed by a download cell
+
+    :param cells: row cells
+    :param languages_map: :class:`LanguagesMap` instance
+    :return: a tuple (:class:`LanguageData`, subs link) or ``None``
+        if the row is not a download row for a requested language
+    """
+    cells = iter(cells)
+    for cell in cells:
+        if 'language' in (cell.get('class') or ()):
+            language = languages_map[cell.text]
+            if language is None:
+                return None
+            for download_cell in cells:
+                if download_cell.get('colspan') == '3':
+                    link = _get_download_link(download_cell)
+                    return (language, link) if link is not None else None
+    return None
+
+
+def _parse_version(rows):
+    """
+    Parse a version title row and a "works with" row of a subs table
+
+    :param rows: an iterator over subs table rows. Only the version rows are consumed.
+    :return: subs version description
+    """
+    version = None
+    for row in rows:
+        for cell in _iter_child_tags(row, 'td'):
+            if cell.get('colspan') != '3':
+                continue
+            css_class = cell.get('class') or ()
+            if version is None and 'NewsTitle' in css_class:
+                version = version_re.search(cell.text).group(1)
+                break
+            if version is not None and 'newsDate' in css_class:
+                works_with = cell.get_text(strip=True)
+                if works_with:
+                    version += ', ' + works_with
+                return version
+    return version
 
 
 def parse_episode(sub_cells, languages):
@@ -136,50 +828,100 @@ def parse_episode(sub_cells, languages):
     - ``link``: subtitles link
     - ``hi``: ``True`` for subs for hearing impaired, else ``False``
 
+    Each subs table is parsed in a single pass over its rows: version rows
+    followed by pairs of a download row with a language cell
+    and an info row with subs flags.
+
     :param sub_cell: BS nodes with episode subtitles
     :param languages: the list of languages to search
     :return: generator function that yields :class:`SubsItem` items.
     """
+    languages_map = LanguagesMap(languages)
     for sub_cell in sub_cells:
-        version = version_re.search(
-                            sub_cell.find('td',
-                                          {'colspan': '3',
-                                           'align': 'center',
-                                           'class': 'NewsTitle'}).text
-                            ).group(1)
-        works_with = sub_cell.find(
-            'td', {'class': 'newsDate', 'colspan': '3'}
-        ).get_text(strip=True)
-        if works_with:
-            version += ', ' + works_with
-        lang_cells = sub_cell.find_all('td', {'class': 'language'})
-        for lang_cell in lang_cells:
-            for language in languages:
-                if language.add7_lang in lang_cell.text:
-                    download_cell = lang_cell.find_next('td', {'colspan': '3'})
-                    download_button = download_cell.find(
-                        'a',
-                        class_='face-button',
-                        href=updated_download_re
-                    )
-                    if download_button is None:
-                        download_button = download_cell.find(
-                            'a',
-                            class_='face-button',
-                            href=original_download_re
-                        )
-                    download_row = download_button.parent.parent
-                    info_row = download_row.find_next('tr')
-                    hi = info_row.find('img', title='Hearing Impaired') is not None
-                    unfinished = info_row.find('a', href=jointranslation_re) is not None
-                    yield SubsItem(
-                        language=language.kodi_lang,
-                        version=version,
-                        link=download_button['href'],
-                        hi=hi,
-                        unfinished=unfinished
-                    )
-                    break
+        rows = _iter_child_tags(sub_cell, 'tr')
+        version = _parse_version(rows)
+        for row in rows:
+            download = _parse_download_row(_iter_child_tags(row, 'td'), languages_map)
+            if download is None:
+                continue
+            info_row = next(rows, None)
+            if info_row is None:
+                break
+            hi, unfinished = _get_subs_flags(info_row)
+            yield SubsItem(
+                language=download[0].kodi_lang,
+                version=version,
+                link=download[1],
+                hi=hi,
+                unfinished=unfinished
+            )
+
+
+def _parse_subs(sub_cells, languages):
+    """
+    Parse subs tables of an episode page
+
+    :param sub_cells: BS nodes with episode subtitles
+    :param languages: the list of languages to search
+    :return: the list of :class:`SubsItem`
+    """
+    with metrics.timer('parse'):
+        subs = list(parse_episode(sub_cells, languages))
+    metrics.increment('subs_parsed', len(subs))
+    return subs
+
+
+def _get_episodes(episode, more):
+    """
+    Get episode numbers of a multi-episode file
+
+    Hyphen-separated numbers are treated as a range, e.g. "E01-E03"
+    means episodes 1, 2 and 3. If a range ends before it starts or is longer
+    than :data:`MAX_EPISODE_RANGE`, only the 1st episode is returned.
+
+    :param episode: the 1st episode number
+    :param more: the rest of the episode numbers as they appear in a filename
+    :return: the tuple of 2-digit episode numbers
+    """
+    if not more:
+        return (episode.zfill(2),)
+    episodes = [int(episode)]
+    for hyphen, number in more_episodes_re.findall(more):
+        number = int(number)
+        if hyphen:
+            if not 0 < number - episodes[-1] < MAX_EPISODE_RANGE:
+                return (episode.zfill(2),)
+            episodes.extend(range(episodes[-1] + 1, number + 1))
+        elif number not in episodes:
+            episodes.append(number)
+    return tuple(str(number).zfill(2) for number in episodes)
+
+
+@lru_cache(maxsize=16384)
+def _match_filename(filename, absolute=True):
+    """
+    Match a filename against episode patterns
+
+    :param filename: episode filename
+    :param absolute: if ``False``, absolute numbering without a season
+        is not matched, so that later patterns are tried
+    :return: :class:`FilenameInfo` or ``None`` if the filename
+        does not match any episode patterns
+    """
+    filename = filename.replace(' ', '.')
+    for regexp in episode_patterns:
+        match = regexp.search(filename)
+        if match is not None:
+            groups = match.groupdict()
+            season = groups.get('season')
+            if season is None and not absolute:
+                continue
+            return FilenameInfo(
+                showname=groups['showname'].replace('.', ' '),
+                season=season.zfill(2) if season is not None else None,
+                episodes=_get_episodes(groups['episode'], groups.get('more'))
+            )
+    return None
 
 
 def parse_filename(filename):
@@ -187,19 +929,35 @@ def parse_filename(filename):
     Filename parser for extracting show name, season # and episode # from
     a filename.
 
+    For multi-episode files the 1st episode is returned.
+    Absolute episode numbering is not recognized, e.g. "Show Name - 101"
+    is parsed as season 1, episode 1.
+
     :param filename: episode filename
     :return: parsed showname, season and episode
     :raises ParseError: if the filename does not match any episode patterns
     """
-    filename = filename.replace(' ', '.')
-    for regexp in episode_patterns:
-        episode_data = regexp.search(filename)
-        if episode_data is not None:
-            showname = episode_data.group(1).replace('.', ' ')
-            season = episode_data.group(2).zfill(2)
-            episode = episode_data.group(3).zfill(2)
-            return showname, season, episode
-    raise ParseError
+    info = _match_filename(filename, absolute=False)
+    if info is None:
+        raise ParseError
+    return info.showname, info.season, info.episodes[0]
+
+
+def parse_filenames(filenames):
+    """
+    Parse episode data from multiple filenames, e.g. a directory listing
+
+    Filenames are matched against precompiled patterns and parsing results
+    are memoized, so repeated names are parsed only once.
+
+    :param filenames: an iterable of episode filenames
+    :return: the list of :class:`FilenameInfo` in the same order as filenames
+        or ``None`` for filenames that do not match any episode patterns.
+        ``FilenameInfo.season`` is ``None`` for absolute episode numbering
+        and ``FilenameInfo.episodes`` is the tuple of all episodes
+        in a multi-episode file.
+    """
+    return [_match_filename(filename) for filename in filenames]
 
 
 def normalize_showname(showname):
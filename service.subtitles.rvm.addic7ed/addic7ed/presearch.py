@@ -0,0 +1,121 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""Background subtitles search on playback start"""
+
+import asyncio
+import logging
+import threading
+
+import xbmc
+
+from addic7ed import aio, metrics, parser
+from addic7ed.addon import ADDON
+from addic7ed.episode import extract_episode_data, get_search_queries
+from addic7ed.exceptions import Add7Exception
+from addic7ed.parser import get_languages
+from addic7ed.utils import get_subtitle_languages
+from addic7ed.worker import WorkerServer
+
+__all__ = ['run_service']
+
+logger = logging.getLogger(__name__)
+
+# Streams and add-on items are not pre-searched
+REMOTE_PATH_PREFIXES = ('http://', 'https://', 'plugin://', 'pvr://', 'rtmp://', 'rtsp://',
+                        'udp://')
+
+
+def presearch():
+    """
+    Search subs for the currently played episode
+
+    Alternative search queries are searched concurrently.
+    If multiple episodes are found, their pages are fetched concurrently as well.
+    If a single episode is found, subs for the rest of its season are cached.
+    Parsed search results are stored in the persistent results cache,
+    so the "search" action that is called when the subtitles dialog
+    is opened gets them without accessing addic7ed.com.
+    Pre-search metrics are recorded as a separate invocation.
+    """
+    with metrics.invocation('presearch'):
+        try:
+            episode_data = extract_episode_data()
+        except Add7Exception:
+            logger.debug('The played video is not a TV episode')
+            return
+        languages = get_languages(get_subtitle_languages())
+        queries = get_search_queries(episode_data)
+        logger.info('Pre-searching subs for %s', queries)
+        try:
+            asyncio.run(_presearch(queries, languages))
+        except Add7Exception as exc:
+            logger.info('Pre-search for %s failed: %r', queries, exc)
+            return
+        logger.info('Pre-search for %s completed', queries)
+
+
+async def _presearch(queries, languages):
+    query, results = await aio.search_any(queries, languages)
+    if isinstance(results, list):
+        await aio.get_episodes(results[:parser.MAX_PREFETCHED_EPISODES], languages)
+    else:
+        await aio.cache_season(query, results, languages)
+
+
+class PreSearchPlayer(xbmc.Player):
+    """
+    Player that starts background subs search when video playback starts
+
+    Only local TV episodes are pre-searched.
+    """
+    def __init__(self):
+        super().__init__()
+        self._thread = None
+
+    def _is_local_episode(self):
+        info_tag = self.getVideoInfoTag()
+        if info_tag.getMediaType() != 'episode' and not info_tag.getTVShowTitle():
+            return False
+        return not self.getPlayingFile().startswith(REMOTE_PATH_PREFIXES)
+
+    def onAVStarted(self):
+        if ADDON.getSetting('presearch') != 'true' or not self.isPlayingVideo():
+            return
+        if not self._is_local_episode():
+            logger.debug('The played video is not a local TV episode')
+            return
+        if self._thread is not None and self._thread.is_alive():
+            logger.debug('Previous pre-search is still running')
+            return
+        self._thread = threading.Thread(target=presearch, daemon=True)
+        self._thread.start()
+
+    def join(self, timeout=None):
+        """Wait for a running pre-search to finish"""
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+
+def run_service():
+    """Run the background service until Kodi exits"""
+    logger.debug('Starting the service')
+    monitor = xbmc.Monitor()
+    player = PreSearchPlayer()
+    worker = WorkerServer()
+    worker.start()
+    monitor.waitForAbort()
+    worker.stop()
+    player.join(timeout=1.0)
+    logger.debug('The service stopped')
@@ -0,0 +1,208 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Recording and replaying HTTP exchanges
+
+Exchanges are stored in ZIP archives where each exchange has
+a JSON entry with the request and response metadata and an entry
+with the decompressed response body. Each process records
+to its own archives in an archive folder, so concurrent plugin calls
+and the service do not write to the same file. Archives can be replayed
+to reproduce issues offline and are used as inputs for parser checks
+and benchmarks in "scripts" folder.
+"""
+
+import json
+import logging
+import os
+import threading
+import zipfile
+from collections import namedtuple
+from datetime import datetime, timezone
+from http.client import HTTPMessage
+from urllib.parse import urlencode
+
+from addic7ed.transport import Response, RequestError
+
+__all__ = ['Exchange', 'RecordingPool', 'ReplayPool', 'read_archive']
+
+logger = logging.getLogger(__name__)
+
+Exchange = namedtuple('Exchange',
+                      ['method', 'request_url', 'url', 'status_code', 'headers', 'content'])
+
+# Bodies are stored decompressed, so these headers do not apply to them
+SKIPPED_HEADERS = {'content-encoding', 'content-length', 'transfer-encoding'}
+# Conditional requests are not recorded so that all responses have bodies
+CONDITIONAL_HEADERS = {'if-none-match', 'if-modified-since'}
+# A process starts a new archive when its current archive exceeds this size
+MAX_ARCHIVE_SIZE = 10 * 1024 * 1024
+# The oldest archives are deleted when the archive folder exceeds this size
+MAX_ARCHIVES_TOTAL_SIZE = 50 * 1024 * 1024
+
+
+def _get_request_url(url, params):
+    if params:
+        url += ('&' if '?' in url else '?') + urlencode(params)
+    return url
+
+
+def _make_headers(header_items):
+    headers = HTTPMessage()
+    for name, value in header_items:
+        headers[name] = value
+    return headers
+
+
+def _list_archives(archive_dir):
+    """Get archives in an archive folder from the oldest to the newest"""
+    return sorted(archive_dir.glob('*.zip'))
+
+
+def read_archive(archive_path):
+    """
+    Read recorded HTTP exchanges
+
+    :param archive_path: path to an archive or an archive folder
+    :return: the generator of :class:`Exchange` in the order of recording
+    """
+    if archive_path.is_dir():
+        for path in _list_archives(archive_path):
+            yield from read_archive(path)
+        return
+    with zipfile.ZipFile(archive_path) as archive:
+        for name in sorted(archive.namelist()):
+            if not name.endswith('.json'):
+                continue
+            meta = json.loads(archive.read(name))
+            yield Exchange(
+                meta['method'],
+                meta['request_url'],
+                meta['url'],
+                meta['status_code'],
+                _make_headers(meta['headers']),
+                archive.read(name[:-len('.json')] + '.body')
+            )
+
+
+class RecordingPool:
+    """
+    HTTP client that records exchanges of another client to an archive
+
+    Streamed responses are read completely before they are returned.
+    Archive names start with the creation time in UTC and include the process ID,
+    so archives are ordered by time and are not shared by processes.
+    The total size of the archive folder is capped by deleting
+    the oldest archives.
+
+    :param pool: :class:`transport.ConnectionPool` instance
+    :param archive_dir: path to an archive folder
+    """
+    def __init__(self, pool, archive_dir):
+        self._pool = pool
+        self._archive_dir = archive_dir
+        self._lock = threading.Lock()
+        self._archive_path = None
+        self._count = 0
+
+    def _start_archive(self):
+        """Start a new archive of this process and delete the oldest archives"""
+        if not self._archive_dir.exists():
+            self._archive_dir.mkdir(parents=True)
+        name = f'{datetime.now(timezone.utc):%Y%m%dT%H%M%S.%fZ}-{os.getpid()}.zip'
+        self._archive_path = self._archive_dir / name
+        self._count = 0
+        archives = _list_archives(self._archive_dir)
+        total_size = sum(path.stat().st_size for path in archives)
+        for path in archives:
+            if total_size <= MAX_ARCHIVES_TOTAL_SIZE:
+                break
+            total_size -= path.stat().st_size
+            path.unlink()
+            logger.debug('Deleted the old HTTP archive %s', path)
+
+    def _record(self, method, request_url, response):
+        meta = {
+            'method': method,
+            'request_url': request_url,
+            'url': response.url,
+            'status_code': response.status_code,
+            'headers': [(name, value) for name, value in response.headers.items()
+                        if name.lower() not in SKIPPED_HEADERS],
+        }
+        with self._lock:
+            try:
+                if (self._archive_path is None or (self._archive_path.exists()
+                        and self._archive_path.stat().st_size > MAX_ARCHIVE_SIZE)):
+                    self._start_archive()
+                with zipfile.ZipFile(self._archive_path, 'a', zipfile.ZIP_DEFLATED) as archive:
+                    self._count += 1
+                    name = f'{self._count:05d}'
+                    archive.writestr(name + '.json', json.dumps(meta, indent=1))
+                    archive.writestr(name + '.body', response.content)
+            except (OSError, zipfile.BadZipFile):
+                logger.exception('Unable to record %s to %s', request_url, self._archive_path)
+
+    def request(self, method, url, params=None, headers=None,
+                stream=False):  # pylint: disable=unused-argument
+        """
+        Perform and record a HTTP request
+
+        The signature is the same as :meth:`transport.ConnectionPool.request`.
+        """
+        headers = {name: value for name, value in (headers or {}).items()
+                   if name.lower() not in CONDITIONAL_HEADERS}
+        response = self._pool.request(method, url, params=params, headers=headers)
+        self._record(method, _get_request_url(url, params), response)
+        return response
+
+    def close(self):
+        self._pool.close()
+
+
+class ReplayPool:
+    """
+    HTTP client that serves responses from an archive
+
+    If a request has been recorded several times, the last response is served.
+
+    :param archive_path: path to an archive or an archive folder
+    """
+    def __init__(self, archive_path):
+        self._exchanges = {}
+        try:
+            for exchange in read_archive(archive_path):
+                self._exchanges[(exchange.method, exchange.request_url)] = exchange
+        except (OSError, zipfile.BadZipFile):
+            logger.exception('Unable to read %s', archive_path)
+        logger.debug('Loaded %s recorded requests from %s', len(self._exchanges), archive_path)
+
+    def request(self, method, url, params=None,
+                headers=None, stream=False):  # pylint: disable=unused-argument
+        """
+        Get a recorded response
+
+        The signature is the same as :meth:`transport.ConnectionPool.request`.
+
+        :raises RequestError: if the request has not been recorded
+        """
+        request_url = _get_request_url(url, params)
+        exchange = self._exchanges.get((method, request_url))
+        if exchange is None:
+            raise RequestError(f'{method} {request_url} is not recorded')
+        return Response(exchange.url, exchange.status_code, exchange.headers, exchange.content)
+
+    def close(self):
+        pass
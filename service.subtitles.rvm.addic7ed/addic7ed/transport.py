@@ -0,0 +1,357 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""HTTP transport with persistent connections"""
+
+import gzip
+import http.client
+import logging
+import ssl
+import threading
+import zlib
+from urllib.parse import urlencode, urljoin, urlsplit
+
+__all__ = ['RequestError', 'Response', 'ConnectionPool']
+
+logger = logging.getLogger(__name__)
+
+REDIRECT_STATUSES = {301, 302, 303, 307, 308}
+CHUNK_SIZE = 64 * 1024
+
+
+class RequestError(Exception):
+    """Unable to perform a HTTP request"""
+
+
+def decompress(content, content_encoding):
+    """
+    Decompress a response body
+
+    :param content: raw response body
+    :param content_encoding: the value of Content-Encoding header
+    :return: decompressed response body
+    """
+    content_encoding = (content_encoding or '').strip().lower()
+    if content_encoding == 'gzip':
+        return gzip.decompress(content)
+    if content_encoding == 'deflate':
+        try:
+            return zlib.decompress(content)
+        except zlib.error:
+            # Some servers send raw deflate stream without zlib header
+            return zlib.decompress(content, -zlib.MAX_WBITS)
+    return content
+
+
+class _StreamDecompressor:
+    """
+    Incremental counterpart of :func:`decompress`
+
+    :param content_encoding: the value of Content-Encoding header
+    """
+    def __init__(self, content_encoding):
+        content_encoding = (content_encoding or '').strip().lower()
+        self._raw_deflate_fallback = content_encoding == 'deflate'
+        wbits = 16 + zlib.MAX_WBITS if content_encoding == 'gzip' else zlib.MAX_WBITS
+        self._decompressor = zlib.decompressobj(wbits)
+        self._started = False
+
+    def decompress(self, data):
+        try:
+            result = self._decompressor.decompress(data)
+        except zlib.error:
+            if self._started or not self._raw_deflate_fallback:
+                raise
+            # Some servers send raw deflate stream without zlib header
+            self._decompressor = zlib.decompressobj(-zlib.MAX_WBITS)
+            result = self._decompressor.decompress(data)
+        self._started = True
+        return result
+
+    def flush(self):
+        return self._decompressor.flush()
+
+
+class _BodyStream:
+    """
+    Response body that is read from a connection on demand
+
+    The connection is returned to the pool when the body is read to the end,
+    otherwise it is closed.
+    """
+    def __init__(self, pool, key, connection, response):
+        self._pool = pool
+        self._key = key
+        self._connection = connection
+        self._response = response
+
+    def iter_chunks(self, chunk_size):
+        """
+        Iterate decompressed body chunks
+
+        :param chunk_size: the size of raw chunks read from the connection
+        :raises RequestError: on connection or decompression errors
+        """
+        content_encoding = self._response.getheader('Content-Encoding', '')
+        decompressor = None
+        if content_encoding.strip().lower() in ('gzip', 'deflate'):
+            decompressor = _StreamDecompressor(content_encoding)
+        try:
+            for chunk in iter(lambda: self._response.read(chunk_size), b''):
+                if decompressor is not None:
+                    chunk = decompressor.decompress(chunk)
+                if chunk:
+                    yield chunk
+            if decompressor is not None:
+                chunk = decompressor.flush()
+                if chunk:
+                    yield chunk
+        except (OSError, http.client.HTTPException) as exc:
+            self.close()
+            raise RequestError(f'Unable to read response: {exc!r}') from exc
+        except zlib.error as exc:
+            self.close()
+            raise RequestError('Unable to decompress response') from exc
+        self.close()
+
+    def close(self):
+        if self._response is None:
+            return
+        if self._response.isclosed():
+            self._pool._release(self._key, self._connection,  # pylint: disable=protected-access
+                                self._response)
+        else:
+            self._connection.close()
+        self._response = None
+
+
+class Response:
+    """
+    HTTP response
+
+    A streamed response body is not read until :meth:`iter_content` is called,
+    and :attr:`content` is ``None``. Streamed responses should be closed
+    if the body is not read to the end.
+
+    :param url: the final response URL after redirects
+    :param status_code: HTTP status code
+    :param headers: response headers as :class:`http.client.HTTPMessage`
+    :param content: decompressed response body
+    :param body_stream: :class:`_BodyStream` for a streamed response
+    """
+    def __init__(self, url, status_code, headers, content, body_stream=None):
+        self.url = url
+        self.status_code = status_code
+        self.headers = headers
+        self.content = content
+        self._body_stream = body_stream
+
+    def __repr__(self):
+        return f'<Response [{self.status_code}] {self.url}>'
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def iter_content(self, chunk_size=CHUNK_SIZE):
+        """
+        Iterate the decompressed response body in chunks
+
+        :param chunk_size: chunk size in bytes. Decompressed chunks
+            of a streamed body may have a different size.
+        :raises RequestError: if a streamed body cannot be read
+        """
+        if self._body_stream is not None:
+            yield from self._body_stream.iter_chunks(chunk_size)
+            return
+        for start in range(0, len(self.content), chunk_size):
+            yield self.content[start:start + chunk_size]
+
+    def close(self):
+        """Release the connection of a streamed response"""
+        if self._body_stream is not None:
+            self._body_stream.close()
+
+    @property
+    def ok(self):
+        return self.status_code < 400
+
+    @property
+    def encoding(self):
+        return self.headers.get_content_charset() or 'utf-8'
+
+    @property
+    def text(self):
+        return self.content.decode(self.encoding, errors='replace')
+
+
+class _HTTPSConnection(http.client.HTTPSConnection):
+    """
+    HTTPS connection that resumes TLS sessions of previous connections to the same host
+
+    :param context: :class:`ssl.SSLContext` instance
+    :param tls_sessions: the dict of TLS sessions by host
+    """
+    def __init__(self, host, port=None, *, context, tls_sessions, **kwargs):
+        super().__init__(host, port, context=context, **kwargs)
+        self.ssl_context = context
+        self._tls_sessions = tls_sessions
+
+    def connect(self):
+        http.client.HTTPConnection.connect(self)  # pylint: disable=bad-super-call
+        server_hostname = self._tunnel_host or self.host
+        self.sock = self.ssl_context.wrap_socket(
+            self.sock,
+            server_hostname=server_hostname,
+            session=self._tls_sessions.get(server_hostname)
+        )
+
+
+class ConnectionPool:
+    """
+    HTTP client that keeps idle keep-alive connections for each host
+
+    The pool is thread-safe: each request takes an idle connection
+    or opens a new one and returns it to the pool after a response is read.
+    Requests ask for compressed responses that are decompressed transparently.
+
+    :param timeout: socket timeout in seconds
+    :param verify: verify TLS certificates
+    :param max_redirects: max number of redirects to follow
+    :param max_idle: max number of idle connections per host
+    """
+    def __init__(self, timeout=15.0, verify=True, max_redirects=10, max_idle=4):
+        self._timeout = timeout
+        self._max_redirects = max_redirects
+        self._max_idle = max_idle
+        self._ssl_context = ssl.create_default_context()
+        if not verify:
+            self._ssl_context.check_hostname = False
+            self._ssl_context.verify_mode = ssl.CERT_NONE
+        self._idle = {}
+        self._tls_sessions = {}
+        self._lock = threading.Lock()
+
+    def _new_connection(self, scheme, host, port):
+        if scheme == 'https':
+            return _HTTPSConnection(host, port, tls_sessions=self._tls_sessions,
+                                    timeout=self._timeout, context=self._ssl_context)
+        return http.client.HTTPConnection(host, port, timeout=self._timeout)
+
+    def _acquire(self, key):
+        """
+        Get an idle connection for a host or create a new one
+
+        :return: a tuple (connection, reused)
+        """
+        with self._lock:
+            idle = self._idle.get(key)
+            if idle:
+                return idle.pop(), True
+        return self._new_connection(*key), False
+
+    def _release(self, key, connection, response):
+        if response.will_close or connection.sock is None:
+            connection.close()
+            return
+        if isinstance(connection.sock, ssl.SSLSocket):
+            self._tls_sessions[connection.host] = connection.sock.session
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self._max_idle:
+                idle.append(connection)
+                return
+        connection.close()
+
+    def _send(self, method, url, headers, stream=False):
+        """
+        Send a single HTTP request without following redirects
+
+        A request is retried once over a new connection if a reused
+        keep-alive connection has been closed by the server.
+
+        :return: a tuple (status, headers, raw body). If ``stream`` is ``True``,
+            the body of a response that is not a redirect is not read
+            and :class:`_BodyStream` is returned instead.
+        :raises RequestError: on connection errors
+        """
+        parts = urlsplit(url)
+        key = (parts.scheme, parts.hostname, parts.port)
+        path = parts.path or '/'
+        if parts.query:
+            path += '?' + parts.query
+        while True:
+            connection, reused = self._acquire(key)
+            try:
+                connection.request(method, path, headers=headers)
+                response = connection.getresponse()
+                if stream and not (response.status in REDIRECT_STATUSES
+                                   and response.getheader('Location')):
+                    return (response.status, response.headers,
+                            _BodyStream(self, key, connection, response))
+                body = response.read()
+            except (OSError, http.client.HTTPException) as exc:
+                connection.close()
+                if reused:
+                    logger.debug('Reused connection to %s failed: %r. Retrying...',
+                                  parts.hostname, exc)
+                    continue
+                raise RequestError(f'{method} {url} failed: {exc!r}') from exc
+            self._release(key, connection, response)
+            return response.status, response.headers, body
+
+    def request(self, method, url, params=None, headers=None, stream=False):
+        """
+        Perform a HTTP request following redirects
+
+        :param method: HTTP method
+        :param url: request URL
+        :param params: URL query params
+        :param headers: request headers
+        :param stream: do not read the response body until
+            :meth:`Response.iter_content` is called
+        :return: :class:`Response` instance
+        :raises RequestError: on connection errors or too many redirects
+        """
+        if params:
+            url += ('&' if '?' in url else '?') + urlencode(params)
+        headers = dict(headers or {})
+        headers['Accept-Encoding'] = 'gzip, deflate'
+        for _ in range(self._max_redirects + 1):
+            status, response_headers, body = self._send(method, url, headers, stream)
+            location = response_headers.get('Location')
+            if status not in REDIRECT_STATUSES or not location:
+                break
+            url = urljoin(url, location)
+            if status == 303:
+                method = 'GET'
+        else:
+            raise RequestError(f'Too many redirects for {url}')
+        if isinstance(body, _BodyStream):
+            return Response(url, status, response_headers, None, body)
+        try:
+            content = decompress(body, response_headers.get('Content-Encoding'))
+        except (OSError, EOFError, zlib.error) as exc:
+            raise RequestError(f'Unable to decompress response from {url}') from exc
+        return Response(url, status, response_headers, content)
+
+    def close(self):
+        """Close all idle connections"""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for connection in connections:
+                connection.close()
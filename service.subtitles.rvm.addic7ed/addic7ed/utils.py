@@ -13,22 +13,55 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import atexit
 import json
 import logging
 import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
 
 import xbmc
 
-from addic7ed.addon import ADDON_ID, ADDON_VERSION
+from addic7ed import metrics
+from addic7ed.addon import ADDON, ADDON_ID, ADDON_VERSION
 from addic7ed.exception_logger import format_exception, format_trace
 
 __all__ = [
     'initialize_logging',
+    'shutdown_logging',
     'get_now_played',
+    'get_subtitle_languages',
 ]
 
 logger = logging.getLogger(__name__)
 
+# "log_level" setting values
+LOG_LEVELS = {
+    '0': logging.DEBUG,
+    '1': logging.INFO,
+    '2': logging.WARNING,
+    '3': logging.ERROR,
+}
+DEFAULT_LOG_LEVEL = logging.INFO
+# Longer log messages are truncated
+MAX_LOG_MESSAGE_LENGTH = 4096
+
+_listener = None
+
+
+def _add_trace_info(record, frames_to_exclude):
+    """
+    Replace exception and stack info of a log record with extended trace info
+
+    :param record: log record
+    :param frames_to_exclude: the number of frames between the logging call
+        and this function
+    """
+    if record.exc_info is not None:
+        record.exc_text = format_exception(record.exc_info[1])
+    if record.stack_info is not None:
+        record.stack_info = format_trace(frames_to_exclude + 1)
+
 
 class KodiLogHandler(logging.Handler):
     """
@@ -52,36 +85,95 @@ class KodiLogHandler(logging.Handler):
         record.addon_version = ADDON_VERSION
         extended_trace_info = getattr(self, 'extended_trace_info', False)
         if extended_trace_info:
-            if record.exc_info is not None:
-                record.exc_text = format_exception(record.exc_info[1])
-            if record.stack_info is not None:
-                record.stack_info = format_trace(7)
+            _add_trace_info(record, 7)
         message = self.format(record)
         kodi_log_level = self.LEVEL_MAP.get(record.levelno, xbmc.LOGDEBUG)
         xbmc.log(message, level=kodi_log_level)
 
 
-def initialize_logging(extended_trace_info=True):
+class KodiQueueHandler(QueueHandler):
+    """
+    Logging handler that passes records to a background thread
+
+    Records are prepared in the logging thread: messages are merged
+    with arguments and truncated to :data:`MAX_LOG_MESSAGE_LENGTH`,
+    and extended trace info is collected while the stack and local variables
+    are still available. Formatting and writing to the Kodi log
+    are done by :class:`KodiLogHandler` in a :class:`logging.handlers.QueueListener`
+    thread.
+
+    :param log_queue: the queue of log records
+    :param extended_trace_info: collect extended trace info
+    """
+    def __init__(self, log_queue, extended_trace_info):
+        super().__init__(log_queue)
+        self.extended_trace_info = extended_trace_info
+
+    def prepare(self, record):
+        if self.extended_trace_info:
+            _add_trace_info(record, 8)
+        elif record.exc_info is not None and not record.exc_text:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        message = record.getMessage()
+        if len(message) > MAX_LOG_MESSAGE_LENGTH:
+            message = (f'{message[:MAX_LOG_MESSAGE_LENGTH]}... '
+                       f'[{len(message) - MAX_LOG_MESSAGE_LENGTH} characters truncated]')
+        record.msg = message
+        record.args = None
+        record.exc_info = None
+        return record
+
+
+def get_log_level():
+    """
+    Get the log level from the addon settings
+
+    :return: :mod:`logging` level
+    """
+    return LOG_LEVELS.get(ADDON.getSetting('log_level'), DEFAULT_LOG_LEVEL)
+
+
+def initialize_logging(extended_trace_info=True, queued=True):
     """
     Initialize the root logger that writes to the Kodi log
 
     After initialization, you can use Python logging facilities as usual.
+    The log level is set by "log_level" addon setting.
 
     :param extended_trace_info: write extended trace info when exc_info=True
         or stack_info=True parameters are passed to logging methods.
+    :param queued: write to the Kodi log in a background thread, so that
+        logging calls do not block. :func:`shutdown_logging` must be called
+        to write pending records before exit.
     """
+    global _listener  # pylint: disable=global-statement
+    shutdown_logging()
     handler = KodiLogHandler()
     # pylint: disable=attribute-defined-outside-init
-    handler.extended_trace_info = extended_trace_info
+    handler.extended_trace_info = extended_trace_info and not queued
+    handler.setFormatter(logging.Formatter(KodiLogHandler.LOG_FORMAT, style='{'))
+    if queued:
+        log_queue = queue.SimpleQueue()
+        _listener = QueueListener(log_queue, handler)
+        _listener.start()
+        handler = KodiQueueHandler(log_queue, extended_trace_info)
     logging.basicConfig(
-        format=KodiLogHandler.LOG_FORMAT,
-        style='{',
-        level=logging.DEBUG,
+        level=get_log_level(),
         handlers=[handler],
         force=True
     )
 
 
+@atexit.register
+def shutdown_logging():
+    """Write pending log records and stop the background logging thread"""
+    global _listener  # pylint: disable=global-statement
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+@metrics.timed('jsonrpc')
 def get_now_played():
     """
     Get info about the currently played file via JSON-RPC
@@ -107,3 +199,33 @@ def get_now_played():
     else:
         item['file'] = xbmc.Player().getPlayingFile()  # It provides more correct result
     return item
+
+
+@metrics.timed('jsonrpc')
+def get_subtitle_languages():
+    """
+    Get subtitle languages to download from Kodi settings
+
+    "original" and "default" values are resolved the same way as Kodi does
+    when it calls subtitle addons.
+
+    :return: the list of Kodi language names
+    :rtype: list
+    """
+    request = json.dumps({
+        'jsonrpc': '2.0',
+        'method': 'Settings.GetSettingValue',
+        'params': {'setting': 'subtitles.languages'},
+        'id': '1'
+    })
+    response = xbmc.executeJSONRPC(request)
+    languages = []
+    for language in json.loads(response)['result']['value']:
+        if language == 'original':
+            audio_language = xbmc.getInfoLabel('VideoPlayer.AudioLanguage')
+            language = xbmc.convertLanguage(audio_language, xbmc.ENGLISH_NAME)
+        elif language == 'default':
+            language = xbmc.getLanguage(xbmc.ENGLISH_NAME)
+        if language and language not in languages:
+            languages.append(language)
+    return languages
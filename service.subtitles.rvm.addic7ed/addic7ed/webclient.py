@@ -13,14 +13,22 @@
 # You should have received a copy of the GNU General Public License
 # along with this program.  If not, see <https://www.gnu.org/licenses/>.
 
+import codecs
 import logging
+import os
+import threading
+import time
+from collections import namedtuple
+from itertools import chain
+from urllib.parse import urlencode
 
-import simple_requests as requests
-from xbmcvfs import File
+from addic7ed import metrics
+from addic7ed.addon import ADDON, PROFILE
+from addic7ed.cache import DownloadsLog, ResponseStore, StoredResponse
+from addic7ed.exceptions import Add7ConnectionError, DailyLimitExceeded
+from addic7ed.transport import ConnectionPool, RequestError
 
-from addic7ed.exceptions import Add7ConnectionError, NoSubtitlesReturned
-
-__all__ = ['Session']
+__all__ = ['Session', 'RequestScheduler', 'QuotaStats', 'iter_utf8']
 
 logger = logging.getLogger(__name__)
 
@@ -29,14 +37,291 @@ HEADERS = {
     'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
                   '(KHTML, like Gecko) Chrome/131.0.0.0 Safari/537.36',
     'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
-    'Host': SITE[8:],
     'Accept-Charset': 'UTF-8',
 }
+# Addic7ed.com limits the number of subtitles downloads per rolling 24 hours.
+# The limit depends on the account, so by default downloads are limited
+# only by the site's own "daily limit" replies.
+# A user can set a lower limit in "daily_downloads_limit" setting.
+QUOTA_PERIOD = 24 * 60 * 60
+# Requests to the site are sent at this average rate with bursts
+# of up to REQUESTS_BURST requests
+REQUESTS_PER_SECOND = 1.0
+REQUESTS_BURST = 10
+# HTTP exchanges are recorded to or replayed from archives in this folder
+# depending on "http_archive" setting
+HTTP_ARCHIVE_DIR = PROFILE / 'http_archive'
+HTTP_ARCHIVE_RECORD = '1'
+HTTP_ARCHIVE_REPLAY = '2'
+# Max length of a page excerpt in the debug log
+PAGE_SUMMARY_LENGTH = 200
+
+# The site returns a HTML page instead of subtitles if the daily limit is exceeded
+HTML_SIGNATURE = b'<!doctype'
+# Unicode encodings of subtitles files detected by BOM
+BOM_ENCODINGS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+BOM_MAX_SIZE = 3
+# Subtitles without BOM that are not valid UTF-8 are usually in this encoding
+FALLBACK_ENCODING = 'cp1252'
+DECODING_ERRORS = 'addic7ed-fallback'
+
+# limit and remaining are None if the number of downloads is limited only by the site
+QuotaStats = namedtuple('QuotaStats', ['limit', 'used', 'remaining', 'reset_time'])
+
+
+def _decode_fallback(error):
+    """Decoding error handler that decodes invalid bytes with the fallback encoding"""
+    invalid = error.object[error.start:error.end]
+    return invalid.decode(FALLBACK_ENCODING, errors='replace'), error.end
+
+
+codecs.register_error(DECODING_ERRORS, _decode_fallback)
+
+
+def _get_decoder(encoding, head):
+    """
+    Get an incremental decoder for text
+
+    :param encoding: the declared encoding or ``None``
+    :param head: the first bytes of text
+    """
+    if encoding in (None, 'utf-8'):
+        encoding = next((name for bom, name in BOM_ENCODINGS if head.startswith(bom)), 'utf-8')
+    return codecs.getincrementaldecoder(encoding)(errors=DECODING_ERRORS)
+
+
+def iter_utf8(chunks, charset=None):
+    """
+    Re-encode text chunks to UTF-8 in a single pass
+
+    The source encoding is the charset from the response headers if provided,
+    else it is detected by BOM. Without BOM the text is decoded as UTF-8
+    and byte sequences that are not valid UTF-8 are decoded
+    as :data:`FALLBACK_ENCODING`.
+
+    :param chunks: an iterable of byte strings
+    :param charset: the source encoding
+    :return: the generator of UTF-8 byte strings without BOM
+    """
+    try:
+        encoding = codecs.lookup(charset).name if charset else None
+    except LookupError:
+        encoding = None
+    head = b''
+    decoder = None
+    for chunk in chunks:
+        if decoder is None:
+            head += chunk
+            if len(head) < BOM_MAX_SIZE:
+                continue
+            decoder = _get_decoder(encoding, head)
+            chunk = head
+        text = decoder.decode(chunk)
+        if text:
+            yield text.encode('utf-8')
+    if decoder is None:
+        decoder = _get_decoder(encoding, head)
+        text = decoder.decode(head, final=True)
+    else:
+        text = decoder.decode(b'', final=True)
+    if text:
+        yield text.encode('utf-8')
+
+
+class TokenBucket:  # pylint: disable=too-few-public-methods
+    """
+    Thread-safe token bucket rate limiter
+
+    :param rate: the number of tokens added per second
+    :param capacity: the max number of tokens
+    """
+    def __init__(self, rate, capacity):
+        self._rate = rate
+        self._capacity = capacity
+        self._tokens = capacity
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self):
+        """
+        Take a token waiting until it is available
+
+        Waiting threads are served in order because a token is reserved
+        before waiting.
+
+        :return: the wait time in seconds
+        """
+        with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self._capacity,
+                               self._tokens + (now - self._updated) * self._rate)
+            self._updated = now
+            self._tokens -= 1
+            delay = -self._tokens / self._rate if self._tokens < 0 else 0.0
+        if delay:
+            time.sleep(delay)
+        return delay
+
+
+class RequestScheduler:
+    """
+    Schedules requests to the site within its limits
+
+    Requests are rate-limited with a token bucket, so short bursts
+    (e.g. loading several episode pages concurrently) go out at once
+    and long sequences of requests are deferred to the average rate.
+
+    Subtitles downloads are counted per rolling 24 hours in the addon profile,
+    so the count is shared by the plugin and the service and survives
+    restarts. If a daily limit is set, a download is refused up front
+    when the limit is reached. If the site rejects a download
+    (e.g. other devices share the same IP), downloads are refused until
+    the oldest counted download leaves the 24-hour window.
+
+    :param daily_limit: max number of downloads per 24 hours or ``None``
+        if downloads are limited only by the site
+    :param rate: the average number of requests per second
+    :param burst: max number of requests sent without waiting
+    """
+    def __init__(self, daily_limit=None, rate=REQUESTS_PER_SECOND,
+                 burst=REQUESTS_BURST):
+        self.daily_limit = daily_limit
+        self._bucket = TokenBucket(rate, burst)
+        self._downloads_log = DownloadsLog()
+        self._lock = threading.Lock()
+
+    def wait_for_request(self):
+        """Wait until a request to the site can be sent"""
+        delay = self._bucket.acquire()
+        if delay:
+            logger.debug('Request deferred by %.2fs', delay)
+
+    def get_quota_stats(self):
+        """
+        Get the daily downloads quota
+
+        :return: :class:`QuotaStats` instance where ``reset_time`` is Unix time
+            when the next download becomes available if the quota is exhausted,
+            otherwise ``None``
+        """
+        now = time.time()
+        attempts = self._downloads_log.get_since(now - QUOTA_PERIOD)
+        downloads = [timestamp for timestamp, limited in attempts if not limited]
+        used = len(downloads)
+        reset_time = None
+        if self.daily_limit is not None and used >= self.daily_limit:
+            reset_time = downloads[used - self.daily_limit] + QUOTA_PERIOD
+        rejected = [timestamp for timestamp, limited in attempts if limited]
+        if rejected:
+            # A download slot frees up when the oldest download counted
+            # by the site at the moment of rejection leaves the window
+            last_rejected = rejected[-1]
+            counted = [timestamp for timestamp in downloads if timestamp <= last_rejected]
+            blocked_until = (counted[0] if counted else last_rejected) + QUOTA_PERIOD
+            if blocked_until > now and (reset_time is None or blocked_until > reset_time):
+                reset_time = blocked_until
+        if reset_time is not None:
+            remaining = 0
+        elif self.daily_limit is not None:
+            remaining = self.daily_limit - used
+        else:
+            remaining = None
+        return QuotaStats(self.daily_limit, used, remaining, reset_time)
+
+    def reserve_download(self, link):
+        """
+        Count a subtitles download before it is sent
+
+        :param link: subtitles download link
+        :return: reservation ID
+        :raises DailyLimitExceeded: if the daily downloads limit is reached
+        """
+        with self._lock:
+            stats = self.get_quota_stats()
+            if stats.remaining == 0:
+                logger.warning('Daily downloads limit is reached until %s',
+                               time.ctime(stats.reset_time))
+                raise DailyLimitExceeded
+            key = f'{time.time()}-{os.getpid()}-{threading.get_ident()}'
+            self._downloads_log.add(key, link)
+        return key
+
+    def cancel_download(self, key):
+        """
+        Remove a download that has not reached the site from the count
+
+        :param key: reservation ID
+        """
+        self._downloads_log.delete(key)
+
+    def reject_download(self, key):
+        """
+        Mark a download as rejected by the site because of the daily limit
+
+        :param key: reservation ID
+        """
+        self._downloads_log.set_limited(key)
+
+
+def get_daily_downloads_limit():
+    """
+    Get the daily downloads limit from the addon settings
+
+    :return: max number of downloads per 24 hours or ``None``
+        if downloads are limited only by the site
+    """
+    try:
+        limit = int(ADDON.getSetting('daily_downloads_limit'))
+    except ValueError:
+        return None
+    return limit if limit > 0 else None
+
+
+def _create_pool():
+    """
+    Create the HTTP client for the session
+
+    :return: :class:`transport.ConnectionPool` or its recording
+        or replaying counterpart depending on the addon settings
+    """
+    pool = ConnectionPool(verify=False)
+    mode = ADDON.getSetting('http_archive')
+    if mode not in (HTTP_ARCHIVE_RECORD, HTTP_ARCHIVE_REPLAY):
+        return pool
+    # The archive support is needed only for troubleshooting
+    from addic7ed import recorder  # pylint: disable=import-outside-toplevel
+    if mode == HTTP_ARCHIVE_RECORD:
+        logger.info('Recording HTTP requests to %s', HTTP_ARCHIVE_DIR)
+        return recorder.RecordingPool(pool, HTTP_ARCHIVE_DIR)
+    logger.info('Replaying HTTP requests from %s', HTTP_ARCHIVE_DIR)
+    return recorder.ReplayPool(HTTP_ARCHIVE_DIR)
+
+
+def _summarize_page(response):
+    """
+    Get a bounded summary of a loaded page for the debug log
+
+    :param response: :class:`transport.Response` instance
+    :return: the status, the URL, the size and the excerpt of the page
+    """
+    excerpt = response.content[:PAGE_SUMMARY_LENGTH].decode(response.encoding, errors='replace')
+    excerpt = ' '.join(excerpt.split())
+    return (f'[{response.status_code}] {response.url} ({len(response.content)} bytes): '
+            f'{excerpt}...')
 
 
 class Session:
     """
     Webclient Session class
+
+    The session can be used from multiple threads. :attr:`last_url`
+    is tracked separately for each thread. Connections to the site are kept
+    alive and reused by subsequent requests. All requests go through
+    :attr:`scheduler` that enforces the site limits.
     """
     _instance = None
 
@@ -46,51 +331,143 @@ class Session:
         return cls._instance
 
     def __init__(self):
-        self.last_url = ''
+        if hasattr(self, '_local'):
+            return
+        self._local = threading.local()
+        self._response_store = ResponseStore()
+        self._pool = _create_pool()
+        self.scheduler = RequestScheduler(get_daily_downloads_limit())
+
+    @property
+    def last_url(self):
+        """The final URL of the last loaded page in the current thread"""
+        return getattr(self._local, 'last_url', '')
+
+    @last_url.setter
+    def last_url(self, value):
+        self._local.last_url = value
 
-    def _open_url(self, url, params, referer):
+    def _open_url(self, url, params, referer, extra_headers=None, stream=False):
         logger.debug('Opening URL: %s', url)
         headers = HEADERS.copy()
         headers['Referer'] = referer
+        if extra_headers is not None:
+            headers.update(extra_headers)
+        self.scheduler.wait_for_request()
+        metrics.increment('http_requests')
         try:
-            response = requests.get(url, params=params, headers=headers, verify=False)
-        except requests.RequestException as exc:
+            with metrics.timer('http'):
+                response = self._pool.request('GET', url, params=params, headers=headers,
+                                              stream=stream)
+        except RequestError as exc:
             logger.error('Unable to connect to Addic7ed.com!')
             raise Add7ConnectionError from exc
-        logger.debug('Addic7ed.com returned page:\n%s', response.text)
+        if not stream:
+            metrics.increment('bytes_received', len(response.content))
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug('Addic7ed.com returned page: %s', _summarize_page(response))
         if not response.ok:
             logger.error('Addic7ed.com returned status: %s', response.status_code)
+            response.close()
             raise Add7ConnectionError
         self.last_url = response.url
         return response
 
+    def get_quota_stats(self):
+        """
+        Get the daily downloads quota
+
+        :return: :class:`QuotaStats` instance
+        """
+        return self.scheduler.get_quota_stats()
+
     def load_page(self, path, params=None):
         """
         Load webpage by its relative path on the site
 
+        If a previously loaded page has ``ETag`` or ``Last-Modified`` validators,
+        the page is requested conditionally and the stored copy is returned
+        if the server responds with "304 Not Modified".
+
         :param path: relative path starting from '/'
         :param params: URL query params
         :return: webpage content as a Unicode string
         :raises ConnectionError: if unable to connect to the server
         """
-        response = self._open_url(SITE + path, params, referer=SITE + '/')
+        url = SITE + path
+        store_key = f'{url}?{urlencode(params)}' if params else url
+        stored = self._response_store.get(store_key)
+        conditional_headers = {}
+        if stored is not None:
+            if stored.etag:
+                conditional_headers['If-None-Match'] = stored.etag
+            if stored.last_modified:
+                conditional_headers['If-Modified-Since'] = stored.last_modified
+        response = self._open_url(url, params, referer=SITE + '/',
+                                  extra_headers=conditional_headers)
+        if response.status_code == 304 and stored is not None:
+            logger.debug('Page not modified, using stored copy: %s', store_key)
+            metrics.increment('http_not_modified')
+            self.last_url = stored.url
+            return stored.body.decode('utf-8')
         self.last_url = response.url
+        etag = response.headers.get('ETag')
+        last_modified = response.headers.get('Last-Modified')
+        if etag or last_modified:
+            self._response_store.set(
+                store_key,
+                StoredResponse(response.url, etag, last_modified, response.text.encode('utf-8'))
+            )
+        elif stored is not None:
+            self._response_store.delete(store_key)
         return response.text
 
-    def download_subs(self, path, referer, filename='subtitles.srt'):
+    def download_subs(self, path, referer, filename='subtitles.srt', normalize_encoding=False):
         """
         Download subtitles by their URL
 
+        The download is counted against the daily downloads quota.
+        The response is streamed to a temporary file next to the subtitles
+        file that is renamed to the subtitles file when the download is complete,
+        so the subtitles file is never partially written.
+
         :param path: relative path to .srt starting from '/'
         :param referer: referer page
-        :param filename: subtitles filename
-        :return: subtitles file contents as a byte string
+        :param filename: subtitles file path
+        :param normalize_encoding: re-encode subtitles to UTF-8 while downloading
         :raises ConnectionError: if unable to connect to the server
-        :raises NoSubtitlesReturned: if a HTML page is returned instead of subtitles
-        """
-        response = self._open_url(SITE + path, params=None, referer=referer)
-        subtitles = response.content
-        if subtitles[:9].lower() == b'<!doctype':
-            raise NoSubtitlesReturned
-        with File(filename, 'w') as fo:
-            fo.write(bytearray(subtitles))
+        :raises DailyLimitExceeded: if the daily downloads limit is reached
+            or a HTML page is returned instead of subtitles
+        """
+        key = self.scheduler.reserve_download(path)
+        try:
+            response = self._open_url(SITE + path, params=None, referer=referer, stream=True)
+        except Add7ConnectionError:
+            self.scheduler.cancel_download(key)
+            raise
+        temp_path = f'{filename}.{os.getpid()}-{threading.get_ident()}.tmp'
+        try:
+            with response:
+                chunks = response.iter_content()
+                head = b''
+                for chunk in chunks:
+                    head += chunk
+                    if len(head) >= len(HTML_SIGNATURE):
+                        break
+                if head[:len(HTML_SIGNATURE)].lower() == HTML_SIGNATURE:
+                    self.scheduler.reject_download(key)
+                    raise DailyLimitExceeded
+                chunks = chain((head,), chunks)
+                if normalize_encoding:
+                    chunks = iter_utf8(chunks, response.headers.get_content_charset())
+                with open(temp_path, 'wb') as fo, metrics.timer('http_download'):
+                    for chunk in chunks:
+                        fo.write(chunk)
+                    metrics.increment('bytes_downloaded', fo.tell())
+            os.replace(temp_path, filename)
+        except RequestError as exc:
+            logger.error('Unable to download subtitles from Addic7ed.com!')
+            raise Add7ConnectionError from exc
+        finally:
+            if os.path.exists(temp_path):
+                os.remove(temp_path)
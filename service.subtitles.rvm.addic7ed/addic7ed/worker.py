@@ -0,0 +1,256 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+"""
+Warm worker that runs plugin calls in the background service
+
+Kodi starts a new Python interpreter for every plugin call, so each call
+pays for imports, reading the catalog and opening caches and HTTP connections.
+The service runs a worker that listens on a Unix socket in the addon profile,
+and main.py forwards subtitles search and download calls to it.
+The worker runs :func:`actions.router` with the modules, the HTTP session
+and in-memory caches already initialized and sends back the directory items
+that main.py adds to the Kodi directory. Dialogs and notifications are shown
+by the worker.
+
+If the worker is not available (the option is disabled, the service
+is not running yet or the platform does not support Unix sockets)
+or it runs a different addon version, the call is run in the plugin process.
+
+Protocol: a plugin process sends a JSON line
+``{"version": "<addon version>", "argv": [<sys.argv>]}`` and the worker
+replies with a JSON line ``{"status": "ok", "items": [<DirectoryItem>, ...]}``
+as soon as the directory is ended. Work that is done after that
+(e.g. caching the rest of a season) does not delay the plugin call.
+"""
+
+import json
+import logging
+import os
+import socket
+import threading
+from urllib import parse as urlparse
+
+from addic7ed.actions import DirectoryItem, PluginDirectory, router
+from addic7ed.addon import ADDON, ADDON_VERSION, PROFILE
+from addic7ed.exception_logger import catch_exception
+
+__all__ = ['WorkerServer', 'run_plugin']
+
+logger = logging.getLogger(__name__)
+
+SOCKET_PATH = PROFILE / 'worker.sock'
+# Only these actions benefit from warm caches and connections
+FORWARDED_ACTIONS = {'search', 'manualsearch', 'download'}
+
+STATUS_OK = 'ok'
+STATUS_ERROR = 'error'
+STATUS_UNSUPPORTED = 'unsupported'
+
+CONNECT_TIMEOUT = 1.0
+# Max time in seconds to wait for the worker reply.
+# A search may wait for a user to select an episode.
+REPLY_TIMEOUT = 300.0
+# Max time in seconds to receive a request or send a reply
+REQUEST_TIMEOUT = 5.0
+# The interval in seconds for checking if the server is stopped
+ACCEPT_TIMEOUT = 1.0
+MAX_MESSAGE_SIZE = 1024 * 1024
+
+
+def _send_message(sock, message):
+    sock.sendall(json.dumps(message).encode('utf-8') + b'\n')
+
+
+def _receive_message(sock):
+    with sock.makefile('rb') as fo:
+        line = fo.readline(MAX_MESSAGE_SIZE)
+    if not line.endswith(b'\n'):
+        raise ValueError('Incomplete message')
+    return json.loads(line)
+
+
+class _RemoteDirectory(PluginDirectory):
+    """Directory that sends its items to the plugin process when it is ended"""
+    def __init__(self, argv, connection):
+        super().__init__(argv[0], int(argv[1]))
+        self._connection = connection
+        self._items = []
+        self.is_ended = False
+
+    def add_item(self, item):
+        self._items.append(item)
+
+    def end(self):
+        if self.is_ended:
+            return
+        self.is_ended = True
+        try:
+            _send_message(self._connection, {'status': STATUS_OK, 'items': self._items})
+        except OSError:
+            logger.exception('Unable to send directory items to the plugin process')
+
+
+class WorkerServer:
+    """
+    Server that runs plugin calls forwarded by :func:`run_plugin`
+
+    Each call is handled in a separate thread, so that a call is not
+    delayed by the work that the previous call does after its directory
+    is ended.
+
+    :param socket_path: the path of the server socket
+    """
+    def __init__(self, socket_path=SOCKET_PATH):
+        self._socket_path = socket_path
+        self._socket = None
+        self._thread = None
+        self._stop_event = threading.Event()
+
+    def start(self):
+        """
+        Start accepting plugin calls
+
+        :return: ``True`` if the server has been started
+        """
+        if not hasattr(socket, 'AF_UNIX'):
+            logger.info('Unix sockets are not supported. The worker is disabled.')
+            return False
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            if not self._socket_path.parent.exists():
+                self._socket_path.parent.mkdir(parents=True)
+            # The socket file is left behind if Kodi has been killed
+            if self._socket_path.exists():
+                self._socket_path.unlink()
+            sock.bind(str(self._socket_path))
+            os.chmod(self._socket_path, 0o600)
+            sock.listen()
+        except OSError:
+            logger.exception('Unable to start the worker at %s', self._socket_path)
+            sock.close()
+            return False
+        sock.settimeout(ACCEPT_TIMEOUT)
+        self._socket = sock
+        self._thread = threading.Thread(target=self._serve, name='addic7ed-worker',
+                                        daemon=True)
+        self._thread.start()
+        logger.debug('The worker is listening at %s', self._socket_path)
+        return True
+
+    def stop(self):
+        """Stop accepting plugin calls"""
+        if self._thread is None:
+            return
+        self._stop_event.set()
+        self._thread.join()
+        self._thread = None
+        self._socket.close()
+        try:
+            self._socket_path.unlink()
+        except OSError:
+            pass
+        logger.debug('The worker stopped')
+
+    def _serve(self):
+        while not self._stop_event.is_set():
+            try:
+                connection, _ = self._socket.accept()
+            except socket.timeout:
+                continue
+            except OSError:
+                logger.exception('The worker is unable to accept plugin calls')
+                break
+            threading.Thread(target=self._handle, args=(connection,),
+                             name='addic7ed-worker-call', daemon=True).start()
+
+    @staticmethod
+    def _handle(connection):
+        with connection:
+            connection.settimeout(REQUEST_TIMEOUT)
+            try:
+                request = _receive_message(connection)
+                if request.get('version') != ADDON_VERSION:
+                    # The addon has been updated but the service has not been restarted yet
+                    logger.info('Plugin version %s does not match the worker version %s',
+                                request.get('version'), ADDON_VERSION)
+                    _send_message(connection, {'status': STATUS_UNSUPPORTED})
+                    return
+                argv = request['argv']
+            except (OSError, ValueError, KeyError):
+                logger.exception('Invalid plugin call request')
+                return
+            logger.debug('Running forwarded plugin call: %s', argv)
+            directory = _RemoteDirectory(argv, connection)
+            try:
+                with catch_exception(logger.error):
+                    router(argv[2][1:], directory)
+            except Exception:  # pylint: disable=broad-except
+                # The diagnostic info is already logged
+                pass
+            if not directory.is_ended:
+                try:
+                    _send_message(connection, {'status': STATUS_ERROR})
+                except OSError:
+                    pass
+
+
+def _call_worker(argv):
+    """
+    Forward a plugin call to the worker
+
+    :param argv: plugin call arguments (sys.argv)
+    :return: the worker reply or ``None`` if the worker is not available
+    :raises OSError: if the connection to the worker is broken
+    :raises ValueError: if the worker reply is invalid
+    """
+    if not hasattr(socket, 'AF_UNIX'):
+        return None
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.settimeout(CONNECT_TIMEOUT)
+        try:
+            sock.connect(str(SOCKET_PATH))
+        except OSError as exc:
+            logger.debug('The worker is not available: %s', exc)
+            return None
+        sock.settimeout(REPLY_TIMEOUT)
+        _send_message(sock, {'version': ADDON_VERSION, 'argv': list(argv)})
+        return _receive_message(sock)
+
+
+def run_plugin(argv):
+    """
+    Run a plugin call in the worker if it is available or in this process
+
+    :param argv: plugin call arguments (sys.argv)
+    """
+    paramstring = argv[2][1:]
+    directory = PluginDirectory.from_argv(argv)
+    params = dict(urlparse.parse_qsl(paramstring))
+    reply = None
+    if params.get('action') in FORWARDED_ACTIONS and ADDON.getSetting('worker') == 'true':
+        try:
+            reply = _call_worker(argv)
+        except (OSError, ValueError):
+            # The call may have been executed partially,
+            # so it is not repeated to avoid duplicate downloads.
+            logger.exception('Forwarded plugin call %s failed', argv)
+            reply = {'status': STATUS_ERROR}
+    if reply is None or reply['status'] == STATUS_UNSUPPORTED:
+        router(paramstring, directory)
+        return
+    logger.debug('Plugin call %s is completed by the worker: %s', argv, reply['status'])
+    for item in reply.get('items', []):
+        directory.add_item(DirectoryItem(*item))
+    directory.end()
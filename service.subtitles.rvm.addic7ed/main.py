@@ -15,12 +15,15 @@
 
 import sys
 
-from addic7ed.actions import router
 from addic7ed.exception_logger import catch_exception
-from addic7ed.utils import initialize_logging
+from addic7ed.utils import initialize_logging, shutdown_logging
+from addic7ed.worker import run_plugin
 
 initialize_logging()
 
 if __name__ == '__main__':
-    with catch_exception():
-        router(sys.argv[2][1:])
+    try:
+        with catch_exception():
+            run_plugin(sys.argv)
+    finally:
+        shutdown_logging()
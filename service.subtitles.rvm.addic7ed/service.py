@@ -0,0 +1,26 @@
+# Copyright (C) 2026, Roman Miroshnychenko aka Roman V.M.
+#
+# This program is free software: you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation, either version 3 of the License, or
+# (at your option) any later version.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License
+# along with this program.  If not, see <https://www.gnu.org/licenses/>.
+
+from addic7ed.exception_logger import catch_exception
+from addic7ed.presearch import run_service
+from addic7ed.utils import initialize_logging, shutdown_logging
+
+initialize_logging()
+
+if __name__ == '__main__':
+    with catch_exception():
+        run_service()
+    # Write pending log records before Kodi stops the interpreter
+    shutdown_logging()